@@ -1,23 +1,54 @@
 # src-tauri/python/app/controllers/task_controller.py
 import sys
+from sqlalchemy import text
 from ..services.clients_by_node_service import ClientsByNodeService
-from ..models.database import SessionLocal
+from ..models.database import get_session
+from core.instrumentation import stage
 
 
 class TaskController:
+    def __init__(self):
+        # Una sola instancia del servicio por proceso; en modo worker se reutiliza entre solicitudes.
+        self.service = ClientsByNodeService()
+
+    def warm_up(self):
+        """
+        Abre una conexión de prueba para que el login TDS ocurra antes de la primera solicitud.
+        La conexión vuelve al pool del engine y queda lista para reutilizarse.
+        Un fallo aquí no es fatal: la solicitud real mostrará el error.
+        """
+        with stage('controller.warm_up') as event:
+            db = get_session()
+            try:
+                db.execute(text("SELECT 1"))
+                print("Controlador: Conexión a la base de datos lista.", file=sys.stderr)
+                event.set(connected=True)
+            except Exception as e:
+                print(f"Controlador: No se pudo precalentar la conexión: {e}", file=sys.stderr)
+                event.set(connected=False)
+            finally:
+                db.close()
+
     # 1. La firma del método ahora acepta el nuevo 'ip_filter'
-    def execute_preview(self, cronograma_path: str, ip_filter: str):
+    def execute_preview(self, cronograma_path: str, ip_filter: str, offset: int = 0, limit: int = 20,
+                        sort_by: str = None, sort_desc: bool = False, result_format: str = 'json'):
         """
-        Maneja la solicitud de vista previa, pasando la ruta del cronograma y el filtro de IP.
+        Maneja la solicitud de vista previa, pasando la ruta del cronograma, el filtro de IP,
+        la página pedida (offset, limit y orden) y cómo devolver sus filas (JSON o archivo Arrow).
         """
-        print("Controlador: Iniciando preview...", file=sys.stderr)
-        db = SessionLocal()
-        try:
-            service = ClientsByNodeService()
-            # 2. Pasa el nuevo argumento al servicio
-            return service.get_preview(db, cronograma_path, ip_filter)
-        finally:
-            db.close()
+        print(f"Controlador: Iniciando preview (filas {offset} a {offset + limit})...", file=sys.stderr)
+        with stage('controller.preview', ip_filter=ip_filter) as event:
+            db = get_session()
+            try:
+                # 2. Pasa el nuevo argumento al servicio
+                result = self.service.get_preview(db, cronograma_path, ip_filter, max_rows=limit,
+                                                  offset=offset, sort_by=sort_by, sort_desc=sort_desc,
+                                                  result_format=result_format)
+                rows_out = result["rows_file"]["rows"] if "rows_file" in result else len(result["rows"])
+                event.set(rows_out=rows_out, total_rows=result["total_rows"], result_format=result_format)
+                return result
+            finally:
+                db.close()
 
     # 1. La firma del método ahora acepta el nuevo 'ip_filter'
     def execute_export(self, cronograma_path: str, ip_filter: str, output_path: str):
@@ -25,10 +56,44 @@ class TaskController:
         Maneja la solicitud de exportación, pasando todos los parámetros necesarios.
         """
         print(f"Controlador: Iniciando exportación a {output_path}", file=sys.stderr)
-        db = SessionLocal()
-        try:
-            service = ClientsByNodeService()
-            # 2. Pasa el nuevo argumento al servicio
-            return service.export_to_excel(db, cronograma_path, ip_filter, output_path)
-        finally:
-            db.close()
+        with stage('controller.export', ip_filter=ip_filter) as event:
+            db = get_session()
+            try:
+                # 2. Pasa el nuevo argumento al servicio
+                result = self.service.export_to_excel(db, cronograma_path, ip_filter, output_path)
+                event.set(format=result["format"])
+                return result
+            finally:
+                db.close()
+
+    def execute_batch(self, jobs: list):
+        """
+        Ejecuta un lote de previews y exports con una sola carga de clientes.
+        """
+        print(f"Controlador: Iniciando lote de {len(jobs)} trabajos...", file=sys.stderr)
+        with stage('controller.batch', jobs=len(jobs)) as event:
+            db = get_session()
+            try:
+                result = self.service.run_batch(db, jobs)
+                event.set(errors=sum('error' in job for job in result["jobs"]))
+                return result
+            finally:
+                db.close()
+
+    def invalidate_cache(self):
+        """
+        Descarta los resultados guardados para que la próxima solicitud vuelva a consultar la base.
+        """
+        return self.service.invalidate_cache()
+
+    def refresh_snapshots(self):
+        """
+        Descarga de nuevo las vistas y actualiza las instantáneas locales.
+        """
+        print("Controlador: Actualizando instantáneas locales...", file=sys.stderr)
+        with stage('controller.refresh_snapshots'):
+            db = get_session()
+            try:
+                return self.service.refresh_snapshots(db)
+            finally:
+                db.close()
@@ -1,8 +1,9 @@
 # src-tauri/python/app/models/database.py
 import os
 import sys
-import pytds
+import threading
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -12,19 +13,65 @@ DB_DATABASE = os.environ.get('DB_DATABASE', 'BI_B2B')
 DB_USERNAME = os.environ.get('DB_USERNAME', 'BI_CX')
 DB_PASSWORD = os.environ.get('DB_PASSWORD', 'Telecel123')
 DB_PORT = 1433
+# Segundos de espera para el login y para cada consulta; pasado ese tiempo el servicio
+# puede recurrir a la instantánea local. DB_QUERY_TIMEOUT vacío significa sin límite.
+DB_LOGIN_TIMEOUT = float(os.environ.get('DB_LOGIN_TIMEOUT', '15'))
+DB_QUERY_TIMEOUT = float(os.environ['DB_QUERY_TIMEOUT']) if os.environ.get('DB_QUERY_TIMEOUT') else None
+
+# --- Configuración del pool de conexiones ---
+# Las lecturas concurrentes usan una conexión cada una, así que DB_POOL_SIZE debe cubrirlas.
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', '4'))
+DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', '4'))
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', '30'))
+# pool_pre_ping descarta conexiones que el servidor cerró mientras el worker (main.py --worker) estaba inactivo.
+DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') != '0'
+# Segundos tras los que una conexión se recicla aunque siga viva.
+DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', '1800'))
 
 # --- URL de Conexión ---
-DATABASE_URL = (
+# DATABASE_URL permite apuntar a otra base con las mismas vistas (p. ej. un SQLite de pruebas).
+DATABASE_URL = os.environ.get('DATABASE_URL') or (
     f"mssql+pytds://{DB_USERNAME}:{DB_PASSWORD}@{DB_SERVER}:{DB_PORT}/{DB_DATABASE}"
 )
 
 # --- El resto del archivo se mantiene igual ---
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine_options = {
+    'pool_pre_ping': DB_POOL_PRE_PING,
+    'pool_recycle': DB_POOL_RECYCLE,
+}
+connect_args = {}
+# El tamaño del pool y los tiempos de espera del driver solo aplican a SQL Server;
+# un SQLite de pruebas conserva el pool por defecto de SQLAlchemy.
+if make_url(DATABASE_URL).get_backend_name() == 'mssql':
+    connect_args = {'login_timeout': DB_LOGIN_TIMEOUT, 'timeout': DB_QUERY_TIMEOUT}
+    engine_options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT)
+# El engine (y el driver pytds) se crean en el primer uso de la base, no al importar este
+# módulo: así --help, los errores de argumentos y los modos sin base arrancan más rápido.
+_engine = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
 Base = declarative_base()
 
+
+def get_engine():
+    """Devuelve el engine del proceso, creándolo la primera vez que se pide."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                if make_url(DATABASE_URL).get_backend_name() == 'mssql':
+                    import pytds  # noqa: F401  Falla aquí, con un error claro, si falta el driver.
+                _engine = create_engine(DATABASE_URL, echo=False, connect_args=connect_args, **engine_options)
+    return _engine
+
+
+def get_session():
+    """Abre una sesión nueva sobre el engine compartido."""
+    return _session_factory(bind=get_engine())
+
+
 def get_db():
-    db = SessionLocal()
+    db = get_session()
     try:
         yield db
     finally:
@@ -1,50 +1,287 @@
 # src-tauri/python/app/services/clients_by_node_service.py
+import os
 import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import List, Optional, Tuple
+import numpy as np
 import pandas as pd
+from sqlalchemy import Column, MetaData, String, Table, func, or_, select
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import Session
 # 1. Importamos los dos modelos que ahora necesitamos
 from ..models.clients_by_node_model import CacheCuboCarteras, ClientesIp
+from .incremental_sessions import IncrementalSessions
+from .result_cache import ResultCache
+from .snapshot_store import SnapshotStore
+from .concurrent_reads import cancellable_queries, read_sql_async, read_sql_concurrently
+from core.batch import SharedFrame, run_batch
+from core.dtypes import compact_frame
+from core.excel_utils import ExcelUtils
+from core.export_utils import STREAMING_EXPORT_BATCH_ROWS, STREAMING_EXPORT_ENABLED, ExportUtils, PartitionedWriter
+from core.instrumentation import stage
+from core.jobs import check_cancelled
+from core.join_estimate import (JOIN_CHUNK_ROWS, JOIN_MAX_ROWS, code_groups, date_chunks, estimate_join,
+                                join_row_weights, rows_for_codes)
+from core.node_index import NodeIndex
+from core.node_keys import SQL_WHITESPACE_CHARACTERS, compact_nodo_text, normalize_nodo_key
+from core.result_store import ResultStore
+from core.result_transport import RESULT_TRANSPORT_MAX_ROWS, validate_result_format, write_arrow_result
 import re
 
+# Con más nodos que este límite se usa una tabla temporal en vez de una lista IN
+# (SQL Server admite como mucho 2100 parámetros por consulta).
+PUSHDOWN_IN_LIST_LIMIT = int(os.environ.get('PUSHDOWN_IN_LIST_LIMIT', '500'))
+
+# 'pushdown' filtra los nodos en el servidor; 'stream' lee la vista de clientes por bloques
+# y filtra cada bloque aquí, para servidores donde la consulta filtrada no conviene.
+CLIENTS_FETCH_MODE = os.environ.get('CLIENTS_FETCH_MODE', 'pushdown')
+# Memoria máxima que puede ocupar un bloque en modo 'stream'; de ella sale el tamaño del bloque.
+CLIENTS_FETCH_MEMORY_MB = int(os.environ.get('CLIENTS_FETCH_MEMORY_MB', '64'))
+# Estimación inicial de bytes por fila en memoria, corregida con lo medido en cada bloque.
+ESTIMATED_ROW_BYTES = 1024
+MIN_CHUNK_ROWS = 1000
+
+# Minutos durante los que se reutiliza un resultado ya calculado (en memoria, en disco o como
+# punto de partida de una edición del cronograma). Pasado ese plazo se vuelve a leer la base,
+# así una recarga de las vistas durante el día se ve a más tardar a los tantos minutos.
+RESULT_FRESHNESS_MINUTES = max(1, int(os.environ.get('RESULT_FRESHNESS_MINUTES', '30')))
+
+# Nodos que pide la primera consulta del preview; cada consulta siguiente pide el doble.
+PREVIEW_NODE_BATCH = int(os.environ.get('PREVIEW_NODE_BATCH', '16'))
+# Orden de las filas del preview: por fecha de trabajo y, dentro de cada fecha, por cuenta.
+PREVIEW_SORT_COLUMNS = ['FECHA TRABAJO', 'NRO_CUENTA']
+# Filas máximas por página del preview.
+PREVIEW_MAX_PAGE_ROWS = int(os.environ.get('PREVIEW_MAX_PAGE_ROWS', '500'))
+# Columna del resultado -> nombre con el que sale en el preview; sort_by usa estos nombres.
+PREVIEW_COLUMNS = {
+    'NRO_CUENTA': 'NRO_CUENTA', 'NOMBRE_CLIENTE': 'CLIENTE_NOMBRE_COMPLETO',
+    'NODO': 'ZONA_GRUPO', 'EJECUTIVO_CORPORATE': 'EJECUTIVO_CORPORATE',
+    'CORREO_TITULAR_PYME': 'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO': 'CLIENTE_TELEFONO',
+    'FECHA TRABAJO': 'FECHA_TRABAJO'
+}
+# Columna del resultado -> encabezado en el archivo exportado (una partición por fecha de trabajo).
+EXPORT_COLUMNS = {
+    'NRO_CUENTA': 'NRO_CUENTA', 'NOMBRE_CLIENTE': 'CLIENTE_NOMBRE_COMPLETO',
+    'NODO': 'ZONA_GRUPO', 'EJECUTIVO_CORPORATE': 'EJECUTIVO_CORPORATE',
+    'CORREO_TITULAR_PYME': 'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO': 'CLIENTE_TELEFONO'
+}
+NO_MATCHING_CLIENTS_MESSAGE = \
+    "No se encontraron clientes que coincidan con los nodos del cronograma y el filtro de IP aplicado."
+# Dtypes compactos de los clientes afectados: categóricas para las columnas con pocos valores
+# distintos, enteros para los números de cuenta y strings de Arrow para los textos por cliente.
+CLIENT_CATEGORY_COLUMNS = ['EJECUTIVO_CORPORATE', 'TIPO_PRODUCTO', 'BANDERA_IP', 'NODO', 'NODO_NORMALIZADO']
+CLIENT_ID_COLUMNS = ['NRO_CUENTA', 'CLIENTENRO']
+CLIENT_STRING_COLUMNS = ['NOMBRE_CLIENTE', 'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO']
+
 
 class ClientsByNodeService:
-    def _normalize_nodo(self, nodo_text: str) -> str:
-        """Limpia y estandariza los nombres de los nodos."""
-        if not isinstance(nodo_text, str):
-            return ''
-        return nodo_text.upper().replace('NODO', '').strip()
+    def __init__(self):
+        # El caché vive mientras viva el servicio; el controlador mantiene una sola instancia.
+        self.result_cache = ResultCache()
+        self.snapshot_store = SnapshotStore()
+        # Copia en disco de los resultados paginados, para las páginas que llegan en otro proceso.
+        self.result_store = ResultStore()
+        # Último cronograma procesado de cada archivo, para recalcular solo lo que cambió al editarlo.
+        self.incremental_sessions = IncrementalSessions(self.result_store)
+        # Clientes de la instantánea ordenados por nodo, para leer solo los de los nodos del cronograma.
+        self.client_index = NodeIndex(CacheCuboCarteras.__tablename__)
 
-    def _get_processed_data(self, db_session: Session, cronograma_excel_path: str, ip_filter: str) -> pd.DataFrame:
+    def _get_db_freshness_token(self) -> str:
         """
-        Función central que lee, consulta, une, filtra y cruza todos los datos.
+        Token que cambia cuando los datos de las vistas pueden haber cambiado: el tramo de
+        RESULT_FRESHNESS_MINUTES en curso, porque las vistas pueden recargarse a cualquier
+        hora, más la fecha de la instantánea local para que un refresco manual también cuente.
         """
-        print("Servicio: Iniciando procesamiento.", file=sys.stderr)
+        token = str(int(time.time() // (RESULT_FRESHNESS_MINUTES * 60)))
+        if self.snapshot_store.available:
+            meta = self.snapshot_store.read_meta(CacheCuboCarteras.__tablename__)
+            if meta is not None:
+                token += f"|{meta['created_at']}"
+        return token
 
-        # 1. Leer y normalizar el cronograma
+    def invalidate_cache(self) -> dict:
+        """Descarta todos los resultados guardados en el caché."""
+        self.incremental_sessions.clear()
+        discarded = self.result_cache.invalidate() + self.result_store.clear()
+        print(f"Servicio: Caché invalidado ({discarded} resultados descartados).", file=sys.stderr)
+        return {"status": "success", "discarded": discarded}
+
+    def _cache_key(self, cronograma_excel_path: str, ip_filter: str):
         try:
-            df_cronograma = pd.read_excel(cronograma_excel_path, sheet_name=0)
-            cronograma_node_column = 'NODO_N'
-            fecha_column = 'FECHA TRABAJO'
+            return self.result_cache.make_key(
+                cronograma_excel_path, ip_filter, self._get_db_freshness_token())
+        except OSError as e:
+            raise ValueError(f"No se pudo leer el archivo de Cronograma: {e}")
 
-            if cronograma_node_column not in df_cronograma.columns or fecha_column not in df_cronograma.columns:
-                raise ValueError(
-                    f"Columnas requeridas ('{cronograma_node_column}', '{fecha_column}') no encontradas en el Excel.")
+    def _get_processed_data(self, db_session: Session, cronograma_excel_path: str, ip_filter: str,
+                            persist: bool = False) -> pd.DataFrame:
+        """
+        Devuelve el resultado procesado, reutilizando el del caché si el mismo cronograma
+        ya se procesó con el mismo filtro y los datos de la base no han cambiado.
+        Después del caché en memoria busca el resultado guardado en disco por una página
+        anterior del preview; con persist, un resultado recién calculado también se guarda ahí.
+        """
+        with stage('service.processed_data', ip_filter=ip_filter) as event:
+            cache_key = self._cache_key(cronograma_excel_path, ip_filter)
+            df_cached = self.result_cache.get(cache_key)
+            if df_cached is not None:
+                print(f"Servicio: Reutilizando resultado en caché ({len(df_cached)} clientes afectados).",
+                      file=sys.stderr)
+                event.set(cache='hit', rows_out=len(df_cached))
+                return df_cached
 
-            df_cronograma['NODO_NORMALIZADO'] = df_cronograma[cronograma_node_column].apply(self._normalize_nodo)
-            df_cronograma[fecha_column] = pd.to_datetime(df_cronograma[fecha_column], errors='coerce')
-            df_cronograma.dropna(subset=[fecha_column, 'NODO_NORMALIZADO'], inplace=True)
-        except Exception as e:
-            raise ValueError(f"No se pudo leer el archivo de Cronograma: {e}")
+            store_key = ResultStore.key_for(*cache_key)
+            df_stored = self.result_store.load(store_key)
+            if df_stored is not None:
+                print(f"Servicio: Reutilizando resultado guardado en disco ({len(df_stored)} clientes afectados).",
+                      file=sys.stderr)
+                self.result_cache.put(cache_key, df_stored)
+                event.set(cache='disk', rows_out=len(df_stored))
+                return df_stored
 
-        # 2. Consultar las dos vistas de la base de datos
-        print("Servicio: Consultando datos de clientes y de IP...", file=sys.stderr)
-        query_clientes = db_session.query(CacheCuboCarteras)
-        df_clientes_db = pd.read_sql(query_clientes.statement, db_session.bind)
+            session_key = IncrementalSessions.session_key(cronograma_excel_path, ip_filter, cache_key[-1])
+            df_merged = self._build_processed_data(db_session, cronograma_excel_path, ip_filter,
+                                                   session_key, store_key)
+            self.result_cache.put(cache_key, df_merged)
+            # Con sesiones incrementales la sesión ya lo guardó en disco con esta misma clave.
+            if persist and not self.incremental_sessions.enabled:
+                self.result_store.save(store_key, df_merged)
+            event.set(cache='miss', rows_out=len(df_merged))
+            return df_merged
 
-        query_ip = db_session.query(ClientesIp)
-        df_ip_flags = pd.read_sql(query_ip.statement, db_session.bind)
+    def _sort_order(self, cache_key, df: pd.DataFrame, sort_column: Optional[str], descending: bool) -> np.ndarray:
+        """
+        Posiciones de las filas del resultado en el orden de la página pedida. Sin columna es
+        el orden del preview (PREVIEW_SORT_COLUMNS); con columna, ese orden desempata. Cada
+        orden se calcula una vez por resultado y queda en el caché y en disco.
+        """
+        sort_key = f"{sort_column or ''}|{'desc' if descending else 'asc'}"
+        store_key = ResultStore.key_for(*cache_key)
+        order = self.result_cache.get_order(cache_key, sort_key)
+        if order is None:
+            order = self.result_store.load_order(store_key, sort_key)
+        if order is None:
+            if sort_column is None:
+                order = df[PREVIEW_SORT_COLUMNS].reset_index(drop=True).sort_values(
+                    PREVIEW_SORT_COLUMNS, kind='stable').index.to_numpy()
+            else:
+                base_order = self._sort_order(cache_key, df, None, False)
+                order = ResultStore.sort_positions(df, sort_column, descending, base_order)
+            self.result_store.save_order(store_key, sort_key, order)
+        self.result_cache.put_order(cache_key, sort_key, order)
+        return order
+
+    def _fetch_full_views(self, db_session: Session) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Descarga completas las dos vistas, con las columnas mapeadas en los modelos.
+        Cada vista se lee a la vez en su propia conexión del pool.
+        """
+        frames = read_sql_concurrently(db_session.get_bind(), {
+            'clientes': select(CacheCuboCarteras.__table__),
+            'ip': select(ClientesIp.__table__),
+        })
+        return frames['clientes'], frames['ip']
 
-        # 3. Unir la información de clientes con la bandera de IP
+    def refresh_snapshots(self, db_session: Session) -> dict:
+        """
+        Descarga las vistas de clientes y de IP y reemplaza sus instantáneas locales.
+        """
+        if not self.snapshot_store.available:
+            raise ValueError("Las instantáneas locales requieren pyarrow y SNAPSHOT_ENABLED distinto de 0.")
+
+        print("Servicio: Descargando vistas para actualizar las instantáneas locales...", file=sys.stderr)
+        with stage('service.fetch_full_views') as event:
+            df_clientes_db, df_ip_flags = self._fetch_full_views(db_session)
+            event.set(rows_out=len(df_clientes_db), ip_rows_out=len(df_ip_flags))
+        views, metas = {}, {}
+        with stage('service.save_snapshots', rows_in=len(df_clientes_db) + len(df_ip_flags)):
+            for view_name, df in ((CacheCuboCarteras.__tablename__, df_clientes_db),
+                                  (ClientesIp.__tablename__, df_ip_flags)):
+                metas[view_name] = meta = self.snapshot_store.save(view_name, df)
+                views[view_name] = self.snapshot_store.describe(meta)
+                views[view_name]["rows"] = meta["rows"]
+        # El índice por nodo se arma ahora, con la vista ya en memoria, y no en la primera consulta.
+        self._build_client_index(df_clientes_db, metas[CacheCuboCarteras.__tablename__])
+
+        self.result_cache.invalidate()
+        print(f"Servicio: Instantáneas guardadas en {self.snapshot_store.directory}.", file=sys.stderr)
+        return {"status": "success", "directory": self.snapshot_store.directory, "views": views}
+
+    def _load_snapshot_clients(self, nodos: List[str], ip_filter: str,
+                               fresh_only: bool) -> Optional[Tuple[pd.DataFrame, dict]]:
+        """
+        Hace con las instantáneas lo mismo que _fetch_affected_clients hace en el servidor:
+        clientes de los nodos, con su bandera de IP y el filtro aplicado. Devuelve None si
+        falta alguna instantánea o, con fresh_only, si alguna superó el TTL. El segundo valor
+        etiqueta el origen con su edad.
+
+        Los clientes de los nodos se leen del índice por nodo de la instantánea, sin cargar
+        la vista completa. Si el índice no existe o es de otra instantánea, se carga la vista,
+        se filtra por nodo y se reconstruye el índice para las consultas siguientes. La vista
+        de IP, que solo tiene dos columnas, se carga completa y se cruza con lo que queda.
+        """
+        if not self.snapshot_store.available:
+            return None
+
+        metas = [self.snapshot_store.read_meta(view.__tablename__) for view in (CacheCuboCarteras, ClientesIp)]
+        if any(meta is None for meta in metas):
+            return None
+        if fresh_only and not all(self.snapshot_store.is_fresh(meta) for meta in metas):
+            return None
+
+        loaded_ip = self.snapshot_store.load(ClientesIp.__tablename__)
+        if loaded_ip is None:
+            return None
+        df_ip_flags, ip_meta = loaded_ip
+
+        clientes_meta = metas[0]
+        with stage('service.client_index_lookup', nodes=len(nodos)) as event:
+            df_clientes_nodos = self.client_index.lookup(nodos, clientes_meta['file'])
+            event.set(hit=df_clientes_nodos is not None,
+                      rows_out=len(df_clientes_nodos) if df_clientes_nodos is not None else None)
+        if df_clientes_nodos is None:
+            loaded_clientes = self.snapshot_store.load(CacheCuboCarteras.__tablename__)
+            if loaded_clientes is None:
+                return None
+            df_clientes_db, clientes_meta = loaded_clientes
+            df_clientes_nodos = self._filter_by_nodes(df_clientes_db, nodos)
+            self._build_client_index(df_clientes_db, clientes_meta)
+
+        # La etiqueta corresponde a la más antigua de las dos copias.
+        oldest_meta = min(clientes_meta, ip_meta, key=lambda meta: meta['created_at'])
+        return (self._apply_ip_flags(df_clientes_nodos, df_ip_flags, ip_filter),
+                self.snapshot_store.describe(oldest_meta, stale=not fresh_only))
+
+    def _build_client_index(self, df_clientes_db: pd.DataFrame, clientes_meta: dict) -> None:
+        """Indexa la instantánea de clientes por su NODO normalizado; la firma es su archivo de datos."""
+        if not self.client_index.available:
+            return
+        with stage('service.client_index_build', rows_in=len(df_clientes_db)) as event:
+            df_indexado = df_clientes_db.assign(NODO_NORMALIZADO=normalize_nodo_key(df_clientes_db['NODO']))
+            meta = self.client_index.build(df_indexado, 'NODO_NORMALIZADO', clientes_meta['file'])
+            event.set(rows_out=meta["rows"] if meta else None, nodes=meta["nodes"] if meta else None)
+
+    def _has_fresh_snapshots(self) -> bool:
+        """Indica si hay instantáneas vigentes de ambas vistas, sin cargarlas."""
+        if not self.snapshot_store.available:
+            return False
+        metas = [self.snapshot_store.read_meta(view.__tablename__) for view in (CacheCuboCarteras, ClientesIp)]
+        return all(meta is not None and self.snapshot_store.is_fresh(meta) for meta in metas)
+
+    def _filter_by_nodes(self, df_clientes_db: pd.DataFrame, nodos: List[str]) -> pd.DataFrame:
+        """Normaliza el NODO de cada cliente y conserva solo los de los nodos del cronograma."""
+        nodo_normalizado = normalize_nodo_key(df_clientes_db['NODO'])
+        mask = nodo_normalizado.isin(nodos)
+        # Copia superficial: solo se agrega una columna, no se modifican las leídas.
+        df_clientes_nodos = df_clientes_db[mask].copy(deep=False)
+        df_clientes_nodos['NODO_NORMALIZADO'] = nodo_normalizado[mask]
+        return df_clientes_nodos
+
+    def _apply_ip_flags(self, df_clientes_db: pd.DataFrame, df_ip_flags: pd.DataFrame,
+                        ip_filter: str) -> pd.DataFrame:
+        """Agrega la bandera de IP a cada cliente y aplica el filtro de IP."""
         # Usamos un LEFT JOIN para mantener a todos los clientes, incluso si no están en la lista de IP.
         df_clientes_completo = pd.merge(
             left=df_clientes_db,
@@ -54,60 +291,707 @@ class ClientsByNodeService:
             how='left'
         )
         # Llenamos los valores NaN en 'BANDERA_IP' para clientes que no se encontraron, asumiendo que no tienen IP.
-        df_clientes_completo['BANDERA_IP'].fillna('NO TIENE', inplace=True)
+        df_clientes_completo['BANDERA_IP'] = df_clientes_completo['BANDERA_IP'].fillna('NO TIENE')
+        return self._filter_ip_flag(df_clientes_completo, ip_filter)
+
+    @staticmethod
+    def _filter_ip_flag(df_clientes: pd.DataFrame, ip_filter: str) -> pd.DataFrame:
+        """Aplica el filtro de IP a clientes que ya tienen su BANDERA_IP."""
+        if ip_filter == 'with_ip':
+            return df_clientes[df_clientes['BANDERA_IP'] == 'TIENE']
+        elif ip_filter == 'without_ip':
+            return df_clientes[df_clientes['BANDERA_IP'] != 'TIENE']
+        return df_clientes
+
+    def _load_affected_clients(self, db_session: Session, nodos: List[str],
+                               ip_filter: str) -> Tuple[pd.DataFrame, dict]:
+        """
+        Obtiene los clientes afectados y una etiqueta con el origen de los datos.
+
+        Con una instantánea local vigente no se consulta la base. Si no la hay se usa la
+        consulta filtrada en el servidor, y si el servidor falla o supera DB_QUERY_TIMEOUT
+        se recurre a la última instantánea disponible aunque esté vencida.
+        """
+        snapshots = self._load_snapshot_clients(nodos, ip_filter, fresh_only=True)
+        if snapshots is not None:
+            df_clientes, data_source = snapshots
+            print(f"Servicio: Usando instantánea local ({data_source['age_hours']} h).", file=sys.stderr)
+            return self._compact_clients(df_clientes), data_source
+
+        try:
+            if CLIENTS_FETCH_MODE == 'stream':
+                df_clientes = self._stream_affected_clients(db_session, nodos, ip_filter)
+            else:
+                df_clientes = self._fetch_affected_clients(db_session, nodos, ip_filter)
+            data_source = {"type": "database", "fetched_at": datetime.now().isoformat(timespec='seconds')}
+            return self._compact_clients(df_clientes), data_source
+        except (SQLAlchemyError, OSError) as e:
+            snapshots = self._load_snapshot_clients(nodos, ip_filter, fresh_only=False)
+            if snapshots is None:
+                raise
+            df_clientes, data_source = snapshots
+            print(f"Servicio: La base de datos no respondió ({e}). Usando la última instantánea local "
+                  f"({data_source['age_hours']} h).", file=sys.stderr)
+            return self._compact_clients(df_clientes), data_source
+
+    @staticmethod
+    def _compact_clients(df_clientes: pd.DataFrame) -> pd.DataFrame:
+        """Pasa los clientes afectados a dtypes compactos antes de cruzarlos y guardarlos."""
+        return compact_frame(df_clientes, categories=CLIENT_CATEGORY_COLUMNS, account_ids=CLIENT_ID_COLUMNS,
+                             strings=CLIENT_STRING_COLUMNS)
+
+    def _read_cronograma(self, cronograma_excel_path: str) -> pd.DataFrame:
+        """
+        Lee el cronograma y normaliza sus nodos. Descarta filas sin fecha o sin nodo.
+        """
+        try:
+            cronograma_node_column = 'NODO_N'
+            fecha_column = 'FECHA TRABAJO'
+            # Valida el encabezado antes de parsear y carga solo las dos columnas que se usan.
+            with stage('service.load_cronograma') as event:
+                df_cronograma = ExcelUtils.load_excel(cronograma_excel_path, [cronograma_node_column, fecha_column])
+                event.set(rows_out=len(df_cronograma))
+
+            with stage('service.normalize_cronograma', rows_in=len(df_cronograma)) as event:
+                df_cronograma['NODO_NORMALIZADO'] = normalize_nodo_key(df_cronograma[cronograma_node_column])
+                df_cronograma[fecha_column] = pd.to_datetime(df_cronograma[fecha_column], errors='coerce')
+                df_cronograma.dropna(subset=[fecha_column, 'NODO_NORMALIZADO'], inplace=True)
+                # Un nodo vacío no identifica ningún trabajo; sin este filtro cruzaría con todos los clientes sin NODO.
+                df_cronograma = df_cronograma[df_cronograma['NODO_NORMALIZADO'] != ''].copy(deep=False)
+                df_cronograma['NODO_NORMALIZADO'] = df_cronograma['NODO_NORMALIZADO'].cat.remove_unused_categories()
+                event.set(rows_out=len(df_cronograma), nodes=len(df_cronograma['NODO_NORMALIZADO'].cat.categories))
+        except Exception as e:
+            raise ValueError(f"No se pudo leer el archivo de Cronograma: {e}")
+        return df_cronograma
+
+    def _sql_compact_nodo(self, column):
+        """
+        Equivalente en SQL de compact_nodo_text, para preseleccionar los nodos en el servidor.
+        LTRIM/RTRIM solo quitan espacios, no tabuladores, saltos de línea ni espacios de no
+        separación, así que se quitan todos los de SQL_WHITESPACE_CHARACTERS con REPLACE.
+        """
+        expression = func.replace(func.upper(column), 'NODO', '')
+        for character in SQL_WHITESPACE_CHARACTERS:
+            expression = func.replace(expression, character, '')
+        return expression
+
+    def _create_nodes_temp_table(self, connection, nodos: List[str]) -> Table:
+        """
+        Crea una tabla temporal con los nodos del cronograma y la carga con un solo executemany.
+        En SQL Server usa una tabla '#' de la sesión con la collation de la base para que el JOIN
+        no choque con la collation de tempdb.
+        """
+        if connection.dialect.name == 'mssql':
+            table = Table('#CRONOGRAMA_NODOS', MetaData(),
+                          Column('NODO_NORMALIZADO', String(100, collation='DATABASE_DEFAULT')))
+        else:
+            table = Table('CRONOGRAMA_NODOS', MetaData(), Column('NODO_NORMALIZADO', String(100)),
+                          prefixes=['TEMPORARY'])
+        table.create(connection)
+        connection.execute(table.insert(), [{'NODO_NORMALIZADO': nodo} for nodo in nodos])
+        return table
+
+    def _chunk_rows_for(self, bytes_per_row: float) -> int:
+        """Filas por bloque para que un bloque no supere CLIENTS_FETCH_MEMORY_MB."""
+        ceiling_bytes = CLIENTS_FETCH_MEMORY_MB * 1024 * 1024
+        return max(MIN_CHUNK_ROWS, int(ceiling_bytes // max(bytes_per_row, 1.0)))
+
+    def _stream_affected_clients(self, db_session: Session, nodos: List[str], ip_filter: str) -> pd.DataFrame:
+        """
+        Lee la vista de clientes por bloques y conserva solo las filas de los nodos del cronograma.
+
+        Cada bloque se normaliza y se filtra por nodo antes de leer el siguiente, así la memoria
+        máxima depende del resultado y no del tamaño de la vista. El tamaño del bloque se
+        recalcula con los bytes por fila medidos en el bloque anterior. La vista de IP, que solo
+        tiene dos columnas, se lee completa a la vez en otra conexión del pool y se cruza al final.
+        """
+        connection = db_session.connection()
+        with ThreadPoolExecutor(max_workers=1) as executor, cancellable_queries(connection):
+            ip_future = read_sql_async(executor, db_session.get_bind(), select(ClientesIp.__table__))
+
+            result = connection.execution_options(stream_results=True).execute(select(CacheCuboCarteras.__table__))
+            columns = list(result.keys())
+            chunk_rows = self._chunk_rows_for(ESTIMATED_ROW_BYTES)
+            matches = []
+            rows_read = 0
+            try:
+                while True:
+                    # Una solicitud cancelada deja de leer en el próximo bloque.
+                    check_cancelled()
+                    rows = result.fetchmany(chunk_rows)
+                    if not rows:
+                        break
+                    chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                    rows_read += len(chunk)
+                    chunk_rows = self._chunk_rows_for(chunk.memory_usage(index=False, deep=True).sum() / len(chunk))
+
+                    chunk_matches = self._filter_by_nodes(chunk, nodos)
+                    if not chunk_matches.empty:
+                        matches.append(chunk_matches)
+            finally:
+                result.close()
+            df_ip_flags = ip_future.result()
+
+        print(f"Servicio: Leídas {rows_read} filas por bloques; {sum(len(m) for m in matches)} coinciden.",
+              file=sys.stderr)
+        if matches:
+            df_clientes_nodos = pd.concat(matches, ignore_index=True)
+        else:
+            df_clientes_nodos = pd.DataFrame(columns=columns + ['NODO_NORMALIZADO'])
+        return self._apply_ip_flags(df_clientes_nodos, df_ip_flags, ip_filter)
+
+    def _fetch_affected_clients(self, db_session: Session, nodos: List[str], ip_filter: str) -> pd.DataFrame:
+        """
+        Trae en una sola consulta solo los clientes de los nodos del cronograma.
+
+        El LEFT JOIN con la vista de IP, el valor por defecto 'NO TIENE' y el filtro de IP
+        se resuelven en el servidor. Los nodos viajan como lista IN parametrizada o, si son
+        más de PUSHDOWN_IN_LIST_LIMIT, en una tabla temporal. El servidor filtra por la clave
+        compacta (compact_nodo_text), que puede traer de más pero nunca de menos, y la clave
+        exacta se aplica aquí con normalize_nodo_key, igual que con la instantánea o por bloques.
+        """
+        clientes = CacheCuboCarteras.__table__
+        ips = ClientesIp.__table__
+        nodo_compacto = self._sql_compact_nodo(clientes.c.NODO)
+        nodos_compactos = sorted({compact_nodo_text(nodo) for nodo in nodos})
+
+        query = select(
+            *clientes.columns,
+            ips.c.CLIENTENRO,
+            func.coalesce(ips.c.BANDERA_IP, 'NO TIENE').label('BANDERA_IP'),
+        )
+        joined = clientes.outerjoin(ips, clientes.c.NRO_CUENTA == ips.c.CLIENTENRO)
 
-        # 4. Aplicar el nuevo filtro de IP Pública
         if ip_filter == 'with_ip':
-            df_clientes_filtrados = df_clientes_completo[df_clientes_completo['BANDERA_IP'] == 'TIENE'].copy()
+            query = query.where(ips.c.BANDERA_IP == 'TIENE')
             print("Servicio: Aplicando filtro 'Con IP Pública'.", file=sys.stderr)
         elif ip_filter == 'without_ip':
-            df_clientes_filtrados = df_clientes_completo[df_clientes_completo['BANDERA_IP'] != 'TIENE'].copy()
+            query = query.where(or_(ips.c.BANDERA_IP.is_(None), ips.c.BANDERA_IP != 'TIENE'))
             print("Servicio: Aplicando filtro 'Sin IP Pública'.", file=sys.stderr)
         else:  # 'all'
-            df_clientes_filtrados = df_clientes_completo.copy()
             print("Servicio: Mostrando todos los clientes (Con y Sin IP).", file=sys.stderr)
 
-        # 5. Cruzar con el cronograma
-        df_clientes_filtrados['NODO_NORMALIZADO'] = df_clientes_filtrados['NODO'].apply(self._normalize_nodo)
-        df_merged = pd.merge(
-            left=df_clientes_filtrados,
-            right=df_cronograma,
-            on='NODO_NORMALIZADO',
-            how='inner'
-        )
+        connection = db_session.connection()
+        if len(nodos_compactos) <= PUSHDOWN_IN_LIST_LIMIT:
+            query = query.select_from(joined).where(nodo_compacto.in_(nodos_compactos))
+            with cancellable_queries(connection):
+                df_candidatos = pd.read_sql(query, connection)
+        else:
+            nodes_table = self._create_nodes_temp_table(connection, nodos_compactos)
+            try:
+                query = query.select_from(
+                    joined.join(nodes_table, nodes_table.c.NODO_NORMALIZADO == nodo_compacto))
+                with cancellable_queries(connection):
+                    df_candidatos = pd.read_sql(query, connection)
+            finally:
+                nodes_table.drop(connection)
+        return self._filter_by_nodes(df_candidatos, nodos)
 
-        if df_merged.empty:
+    def _build_processed_data(self, db_session: Session, cronograma_excel_path: str, ip_filter: str,
+                              session_key: Optional[tuple] = None, result_key: Optional[str] = None) -> pd.DataFrame:
+        """
+        Función central que lee, consulta, une, filtra y cruza todos los datos.
+
+        Con session_key, si la sesión ya procesó una versión anterior del cronograma se
+        recalcula solo lo que cambió (_update_incrementally), y el procesamiento queda
+        guardado como punto de partida de la próxima edición; el resultado, en el
+        ResultStore con result_key.
+        """
+        print("Servicio: Iniciando procesamiento.", file=sys.stderr)
+
+        # 1. Leer y normalizar el cronograma
+        df_cronograma = self._read_cronograma(cronograma_excel_path)
+        previous = self.incremental_sessions.get(session_key) if session_key is not None else None
+        if previous is not None:
+            df_clientes_filtrados, df_merged = self._update_incrementally(db_session, previous, df_cronograma, ip_filter)
+        else:
+            nodos = list(df_cronograma['NODO_NORMALIZADO'].cat.categories)
+
+            # 2. Obtener solo los clientes afectados, con la bandera de IP y el filtro ya aplicados
+            print(f"Servicio: Consultando clientes de {len(nodos)} nodos con su bandera de IP...", file=sys.stderr)
+            df_clientes_filtrados, data_source = self._fetch_clients_for_nodes(db_session, nodos, ip_filter)
+
+            # 3. Cruzar con el cronograma para asignar la fecha de trabajo de cada nodo.
+            df_merged = self._merge_with_cronograma(df_clientes_filtrados, df_cronograma, data_source)
+
+        if session_key is not None:
+            self.incremental_sessions.put(session_key, df_cronograma, df_clientes_filtrados, df_merged, result_key)
+        return df_merged
+
+    def _fetch_clients_for_nodes(self, db_session: Session, nodos: List[str], ip_filter: str) -> Tuple[pd.DataFrame, dict]:
+        with stage('service.fetch_clients', nodes=len(nodos), fetch_mode=CLIENTS_FETCH_MODE) as event:
+            if nodos:
+                df_clientes, data_source = self._load_affected_clients(db_session, nodos, ip_filter)
+            else:
+                df_clientes, data_source = pd.DataFrame(columns=['NODO_NORMALIZADO']), {"type": "none"}
+            event.set(rows_out=len(df_clientes), source=data_source["type"])
+        return df_clientes, data_source
+
+    def _update_incrementally(self, db_session: Session, previous: Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame],
+                              df_cronograma: pd.DataFrame, ip_filter: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Recalcula el resultado a partir del procesamiento anterior de la misma sesión.
+
+        Compara los cronogramas nodo por nodo: solo se consultan los clientes de los nodos
+        nuevos y solo se vuelven a cruzar los nodos nuevos o con filas modificadas. Las
+        filas de los nodos quitados se descartan y las de los demás se conservan tal cual.
+        Devuelve (clientes, resultado) como _build_processed_data.
+        """
+        prev_cronograma, prev_clientes, prev_resultado = previous
+        added, changed, removed = IncrementalSessions.diff_nodes(prev_cronograma, df_cronograma)
+        print(f"Servicio: Recalculando solo lo que cambió en el cronograma ({len(added)} nodos nuevos, "
+              f"{len(changed)} modificados, {len(removed)} quitados).", file=sys.stderr)
+
+        with stage('service.incremental', added_nodes=len(added), changed_nodes=len(changed),
+                   removed_nodes=len(removed), rows_in=len(prev_resultado)) as event:
+            nodos = set(df_cronograma['NODO_NORMALIZADO'].cat.categories)
+            df_clientes = prev_clientes[prev_clientes['NODO_NORMALIZADO'].isin(nodos).to_numpy()]
+            if added:
+                df_nuevos, _ = self._fetch_clients_for_nodes(db_session, added, ip_filter)
+                df_clientes = self._compact_clients(pd.concat([df_clientes, df_nuevos], ignore_index=True))
+            else:
+                df_clientes = df_clientes.reset_index(drop=True)
+            # El resultado entero, no solo lo que se vuelve a cruzar, tiene que caber en el máximo.
+            join_estimate = self._estimate_join(df_clientes, df_cronograma)
+
+            recalcular = set(added) | set(changed)
+            node_dtype = df_cronograma['NODO_NORMALIZADO'].dtype
+            df_conservado = prev_resultado[prev_resultado['NODO_NORMALIZADO'].isin(nodos - recalcular).to_numpy()]
+            df_conservado = df_conservado.assign(NODO_NORMALIZADO=df_conservado['NODO_NORMALIZADO'].astype(node_dtype))
+            df_recalculado = self._join_with_cronograma(
+                df_clientes[df_clientes['NODO_NORMALIZADO'].isin(recalcular).to_numpy()],
+                df_cronograma[df_cronograma['NODO_NORMALIZADO'].isin(recalcular).to_numpy()])
+            df_merged = self._compact_clients(
+                pd.concat([df_conservado, df_recalculado[df_conservado.columns]], ignore_index=True))
+            df_merged.attrs['join_estimate'] = {
+                **join_estimate, "strategy": df_recalculado.attrs['join_estimate']['strategy']}
+            event.set(rows_kept=len(df_conservado), rows_joined=len(df_recalculado), rows_out=len(df_merged))
+
+        return df_clientes, self._finish_result(df_merged, prev_resultado.attrs.get('data_source'))
+
+    @staticmethod
+    def _estimate_join(df_clientes: pd.DataFrame, df_cronograma: pd.DataFrame) -> dict:
+        """
+        Filas que dará el cruce por NODO_NORMALIZADO, antes de hacerlo. El cruce es de muchos
+        a muchos: cada cliente se repite por cada fecha en que el cronograma lista su nodo, y
+        la vista puede traer la misma cuenta en varios nodos. Falla con un mensaje claro si
+        el resultado pasaría de JOIN_MAX_ROWS filas.
+        """
+        estimate = estimate_join([df_clientes['NODO_NORMALIZADO']], [df_cronograma['NODO_NORMALIZADO']])
+        if estimate['rows'] > JOIN_MAX_ROWS:
             raise ValueError(
-                "No se encontraron clientes que coincidan con los nodos del cronograma y el filtro de IP aplicado.")
+                f"El cruce del cronograma con los clientes daría {estimate['rows']} filas, más que el máximo "
+                f"permitido ({JOIN_MAX_ROWS}). Un mismo nodo aparece hasta {estimate['max_right_per_key']} veces "
+                f"en el cronograma y tiene hasta {estimate['max_left_per_key']} clientes; revise si hay fechas "
+                f"repetidas o divida el cronograma en varios archivos.")
+        return estimate
+
+    @staticmethod
+    def _join_with_cronograma(df_clientes: pd.DataFrame, df_cronograma: pd.DataFrame) -> pd.DataFrame:
+        """
+        Asigna a cada cliente la fecha de trabajo de su nodo.
+
+        Primero estima las filas del resultado (_estimate_join). Si pasan de JOIN_CHUNK_ROWS
+        se cruza por tandas de días completos del cronograma, así los arreglos intermedios
+        del merge no pasan de una tanda; dentro de cada día las filas quedan en el mismo
+        orden que con un solo merge. La estimación queda en attrs['join_estimate'].
+        """
+        # Ambas claves comparten las categorías del cronograma, así el merge compara códigos.
+        with stage('service.merge', rows_in=len(df_clientes), schedule_rows=len(df_cronograma)) as event:
+            df_clientes = df_clientes.assign(
+                NODO_NORMALIZADO=df_clientes['NODO_NORMALIZADO'].astype(df_cronograma['NODO_NORMALIZADO'].dtype))
+            estimate = ClientsByNodeService._estimate_join(df_clientes, df_cronograma)
+            if estimate['rows'] > JOIN_CHUNK_ROWS:
+                # Filas que aporta cada fila del cronograma: los clientes de su nodo.
+                weights = join_row_weights([df_clientes['NODO_NORMALIZADO']], [df_cronograma['NODO_NORMALIZADO']])
+                chunks = date_chunks(df_cronograma['FECHA TRABAJO'], weights, JOIN_CHUNK_ROWS)
+                print(f"Servicio: El cruce dará unas {estimate['rows']} filas; se cruza por fechas en "
+                      f"{len(chunks)} tandas.", file=sys.stderr)
+                df_merged = pd.concat(
+                    [pd.merge(left=df_clientes, right=df_cronograma.iloc[chunk], on='NODO_NORMALIZADO', how='inner')
+                     for chunk in chunks],
+                    ignore_index=True)
+                estimate['strategy'] = 'chunked'
+                estimate['chunks'] = len(chunks)
+            else:
+                df_merged = pd.merge(
+                    left=df_clientes,
+                    right=df_cronograma,
+                    on='NODO_NORMALIZADO',
+                    how='inner'
+                )
+                estimate['strategy'] = 'single'
+            df_merged.attrs['join_estimate'] = estimate
+            event.set(rows_out=len(df_merged), estimated_rows=estimate['rows'], strategy=estimate['strategy'])
+        return df_merged
+
+    @staticmethod
+    def _finish_result(df_merged: pd.DataFrame, data_source: Optional[dict]) -> pd.DataFrame:
+        """Falla si no quedó ningún cliente y anota en el resultado el origen de los datos."""
+        if df_merged.empty:
+            raise ValueError(NO_MATCHING_CLIENTS_MESSAGE)
 
+        # El origen viaja con el DataFrame para que también lo tengan los resultados servidos desde el caché.
+        df_merged.attrs['data_source'] = data_source
         print(f"Servicio: ¡Éxito! Se encontraron {len(df_merged)} clientes afectados.", file=sys.stderr)
         return df_merged
 
+    @staticmethod
+    def _merge_with_cronograma(df_clientes: pd.DataFrame, df_cronograma: pd.DataFrame,
+                               data_source: dict) -> pd.DataFrame:
+        """
+        Asigna a cada cliente la fecha de trabajo de su nodo. Falla si no queda ningún cliente.
+        """
+        return ClientsByNodeService._finish_result(
+            ClientsByNodeService._join_with_cronograma(df_clientes, df_cronograma), data_source)
+
+    def _preview_top(self, db_session: Session, cronograma_excel_path: str, ip_filter: str,
+                     max_rows: int) -> Tuple[pd.DataFrame, int, bool, dict]:
+        """
+        Calcula solo las primeras max_rows filas del resultado, en el orden del preview.
+
+        Recorre el cronograma por fecha y consulta los clientes de sus nodos en tandas
+        (PREVIEW_NODE_BATCH nodos nuevos y luego el doble cada vez), cerrando cada tanda en un
+        cambio de fecha. Las filas de las fechas ya recorridas son definitivas, así que en
+        cuanto hay max_rows se deja de consultar. Devuelve (filas, total, exacto, origen): el
+        total es exacto si se recorrió todo el cronograma y, si no, una estimación
+        proporcional a las filas del cronograma recorridas.
+        """
+        df_cronograma = self._read_cronograma(cronograma_excel_path).sort_values('FECHA TRABAJO', kind='stable')
+        fechas = df_cronograma['FECHA TRABAJO'].to_numpy()
+        nodos = df_cronograma['NODO_NORMALIZADO'].to_numpy()
+        node_dtype = df_cronograma['NODO_NORMALIZADO'].dtype
+
+        frames, fetched, data_source = [], set(), {"type": "none"}
+        end, batch_nodes, queries = 0, PREVIEW_NODE_BATCH, 0
+        while True:
+            # Avanza por fechas completas hasta juntar batch_nodes nodos todavía no consultados.
+            pending = {}
+            while end < len(df_cronograma) and len(pending) < batch_nodes:
+                fecha_end = end
+                while fecha_end < len(df_cronograma) and fechas[fecha_end] == fechas[end]:
+                    fecha_end += 1
+                pending.update((nodo, None) for nodo in nodos[end:fecha_end] if nodo not in fetched)
+                end = fecha_end
+            if pending:
+                df_clientes, data_source = self._load_affected_clients(db_session, list(pending), ip_filter)
+                frames.append(df_clientes.assign(NODO_NORMALIZADO=df_clientes['NODO_NORMALIZADO'].astype(node_dtype)))
+                fetched.update(pending)
+                queries += 1
+
+            df_clientes = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+                {'NODO_NORMALIZADO': pd.Series(dtype=node_dtype)})
+            self._estimate_join(df_clientes, df_cronograma.iloc[:end])
+            df_merged = pd.merge(left=df_clientes, right=df_cronograma.iloc[:end], on='NODO_NORMALIZADO', how='inner')
+            if len(df_merged) >= max_rows or end >= len(df_cronograma):
+                break
+            batch_nodes *= 2
+
+        if df_merged.empty:
+            raise ValueError(NO_MATCHING_CLIENTS_MESSAGE)
+
+        exact = end >= len(df_cronograma)
+        total = len(df_merged) if exact else round(len(df_merged) * len(df_cronograma) / end)
+        print(f"Servicio: Preview con {len(fetched)} de {len(df_cronograma['NODO_NORMALIZADO'].cat.categories)} "
+              f"nodos en {queries} consultas.", file=sys.stderr)
+        df_top = df_merged.sort_values(PREVIEW_SORT_COLUMNS, kind='stable').head(max_rows)
+        return df_top, total, exact, data_source
+
     # Los métodos get_preview y export_to_excel ahora recibirán el nuevo parámetro ip_filter
-    def get_preview(self, db_session: Session, cronograma_path: str, ip_filter: str, max_rows: int = 20) -> list:
-        df_merged = self._get_processed_data(db_session, cronograma_path, ip_filter)
-        final_columns = {
-            'NRO_CUENTA': 'NRO_CUENTA', 'NOMBRE_CLIENTE': 'CLIENTE_NOMBRE_COMPLETO',
-            'NODO': 'ZONA_GRUPO', 'EJECUTIVO_CORPORATE': 'EJECUTIVO_CORPORATE',
-            'CORREO_TITULAR_PYME': 'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO': 'CLIENTE_TELEFONO',
-            'FECHA TRABAJO': 'FECHA_TRABAJO'
+    def get_preview(self, db_session: Session, cronograma_path: str, ip_filter: str, max_rows: int = 20,
+                    offset: int = 0, sort_by: Optional[str] = None, sort_desc: bool = False,
+                    result_format: str = 'json') -> dict:
+        """
+        Una página del resultado: max_rows filas desde offset, ordenadas por sort_by (un nombre
+        de columna del preview) o, sin él, por fecha de trabajo y cuenta.
+
+        La primera página en el orden por defecto se calcula con _preview_top, que se detiene en
+        cuanto tiene las filas pedidas; total_rows es entonces una estimación
+        (total_rows_exact=False). Las demás páginas, y también la primera si el resultado ya
+        está en caché o si hay una sesión incremental del archivo, se sirven del resultado
+        completo: se calcula una vez por cronograma, filtro y frescura de los datos y se guarda
+        en memoria y en disco junto con cada orden pedido, así las páginas siguientes solo toman
+        sus filas. Con el modo 'stream' o con instantáneas vigentes siempre se usa el resultado
+        completo.
+
+        Con result_format='arrow' las filas no van en la respuesta: se escriben en un archivo
+        Arrow IPC (rows_file) y la página puede tener hasta RESULT_TRANSPORT_MAX_ROWS filas.
+        """
+        validate_result_format(result_format)
+        max_page_rows = RESULT_TRANSPORT_MAX_ROWS if result_format == 'arrow' else PREVIEW_MAX_PAGE_ROWS
+        if offset < 0:
+            raise ValueError("El offset del preview no puede ser negativo.")
+        if not 1 <= max_rows <= max_page_rows:
+            raise ValueError(f"El tamaño de página del preview debe estar entre 1 y {max_page_rows}.")
+        sort_columns = {name: column for column, name in PREVIEW_COLUMNS.items()}
+        if sort_by is not None and sort_by not in sort_columns:
+            raise ValueError(f"Columna de orden desconocida: {sort_by}. Use una de: {', '.join(sort_columns)}")
+        sort_desc = bool(sort_by) and sort_desc
+
+        with stage('service.preview', ip_filter=ip_filter, offset=offset, max_rows=max_rows,
+                   sort_by=sort_by, sort_desc=sort_desc) as event:
+            cache_key = self._cache_key(cronograma_path, ip_filter)
+            # Con una sesión incremental del mismo archivo el resultado completo sale casi sin consultar.
+            use_top_n = (offset == 0 and sort_by is None and CLIENTS_FETCH_MODE != 'stream'
+                         and self.result_cache.get(cache_key) is None
+                         and not self.result_store.contains(ResultStore.key_for(*cache_key))
+                         and not self.incremental_sessions.contains(
+                             IncrementalSessions.session_key(cronograma_path, ip_filter, cache_key[-1]))
+                         and not self._has_fresh_snapshots())
+
+            if use_top_n:
+                df_page, total, exact, data_source = self._preview_top(
+                    db_session, cronograma_path, ip_filter, max_rows)
+                join_estimate = None
+                event.set(path='top_n')
+            else:
+                df_full = self._get_processed_data(db_session, cronograma_path, ip_filter, persist=True)
+                order = self._sort_order(cache_key, df_full, sort_columns.get(sort_by), sort_desc)
+                df_page = df_full.iloc[order[offset:offset + max_rows]]
+                total, exact, data_source = len(df_full), True, df_full.attrs.get('data_source')
+                join_estimate = df_full.attrs.get('join_estimate')
+                event.set(path='full')
+
+            event.set(rows_out=len(df_page), total_rows=total, total_exact=exact)
+        return self._page_response(df_page, offset, max_rows, total, exact, sort_by, sort_desc, data_source,
+                                   result_format, join_estimate=join_estimate)
+
+    @staticmethod
+    def _page_response(df_page: pd.DataFrame, offset: int, max_rows: int, total: int, exact: bool,
+                       sort_by: Optional[str], sort_desc: bool, data_source: Optional[dict],
+                       result_format: str = 'json', join_estimate: Optional[dict] = None) -> dict:
+        existing_columns = [col for col in PREVIEW_COLUMNS.keys() if col in df_page.columns]
+        df_page = df_page[existing_columns].rename(columns=PREVIEW_COLUMNS)
+        if result_format == 'arrow':
+            # Las filas van en un archivo Arrow con sus tipos; la respuesta solo lleva la ruta y el esquema.
+            page = {"rows_file": write_arrow_result(df_page)}
+        else:
+            df_page = df_page.astype(object)
+            # Los nulos salen como null en el JSON, vengan como None, NaN o NaT.
+            page = {"rows": df_page.where(df_page.notna(), None).to_dict(orient='records')}
+        return {
+            **page,
+            "offset": offset,
+            "limit": max_rows,
+            "total_rows": total,
+            "total_rows_exact": exact,
+            "sort_by": sort_by,
+            "sort_desc": sort_desc,
+            "data_source": data_source,
+            # Filas que el cruce estimó antes de hacerse y cómo se hizo; None en la primera página
+            # calculada con _preview_top, donde total_rows ya es la estimación.
+            "join_estimate": join_estimate,
         }
-        existing_columns = [col for col in final_columns.keys() if col in df_merged.columns]
-        df_final = df_merged[existing_columns].rename(columns=final_columns)
-        return df_final.head(max_rows).to_dict(orient='records')
 
     def export_to_excel(self, db_session: Session, cronograma_path: str, ip_filter: str, output_path: str):
+        # El formato sale de la extensión; se valida antes de consultar la base.
+        ExportUtils.detect_format(output_path)
+        if STREAMING_EXPORT_ENABLED and not self._has_processed_data(db_session, cronograma_path, ip_filter):
+            return self._export_by_date(db_session, cronograma_path, ip_filter, output_path)
         df_processed = self._get_processed_data(db_session, cronograma_path, ip_filter)
-        with pd.ExcelWriter(output_path, engine='openpyxl') as writer:
-            grouped = df_processed.groupby(df_processed['FECHA TRABAJO'].dt.date)
-            final_columns_export = {
-                'NRO_CUENTA': 'NRO_CUENTA', 'NOMBRE_CLIENTE': 'CLIENTE_NOMBRE_COMPLETO',
-                'NODO': 'ZONA_GRUPO', 'EJECUTIVO_CORPORATE': 'EJECUTIVO_CORPORATE',
-                'CORREO_TITULAR_PYME': 'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO': 'CLIENTE_TELEFONO'
-            }
-            existing_columns = [col for col in final_columns_export.keys() if col in df_processed.columns]
-            for date, group_df in grouped:
-                sheet_name = date.strftime('%d-%m-%Y')
-                df_to_export = group_df[existing_columns].rename(columns=final_columns_export)
-                df_to_export.to_excel(writer, sheet_name=sheet_name, index=False)
-        return {"status": "success", "path": output_path}
+        return self._export_result(df_processed, output_path)
+
+    def _has_processed_data(self, db_session: Session, cronograma_path: str, ip_filter: str) -> bool:
+        """
+        Indica si _get_processed_data tiene de dónde partir sin procesar todo: el resultado en
+        caché o en disco, o una sesión incremental del mismo archivo. Ese resultado ya ocupa
+        memoria, así que exportarlo cuesta menos que volver a cruzar por fechas.
+        """
+        cache_key = self._cache_key(cronograma_path, ip_filter)
+        session_key = IncrementalSessions.session_key(cronograma_path, ip_filter, cache_key[-1])
+        return (self.result_cache.get(cache_key) is not None
+                or self.result_store.contains(ResultStore.key_for(*cache_key))
+                or self.incremental_sessions.contains(session_key))
+
+    def _export_by_date(self, db_session: Session, cronograma_path: str, ip_filter: str, output_path: str) -> dict:
+        """
+        Exporta sin armar el resultado completo: el mismo archivo que _export_result, escrito
+        una fecha de trabajo por vez.
+
+        Los clientes de todos los nodos se consultan una sola vez (son uno por cliente, no
+        uno por cliente y fecha) y se agrupan por nodo. Luego el cronograma se recorre por
+        días, en tandas de días completos de hasta STREAMING_EXPORT_BATCH_ROWS filas
+        cruzadas: se toman los clientes de los nodos de la tanda, se cruzan con sus filas,
+        cada día se agrega a su partición y la tanda se suelta antes de pasar a la
+        siguiente. La memoria queda acotada por los clientes afectados más la tanda o el día
+        más grande. Los conteos por día salen de la estimación del cruce, así el formato
+        final (XLSX o el de respaldo) se decide antes de escribir.
+        """
+        print("Servicio: Iniciando exportación por fechas.", file=sys.stderr)
+        df_cronograma = self._read_cronograma(cronograma_path)
+        nodos = list(df_cronograma['NODO_NORMALIZADO'].cat.categories)
+        print(f"Servicio: Consultando clientes de {len(nodos)} nodos con su bandera de IP...", file=sys.stderr)
+        df_clientes, data_source = self._fetch_clients_for_nodes(db_session, nodos, ip_filter)
+
+        with stage('service.export', strategy='by_date', rows_in=len(df_clientes),
+                   schedule_rows=len(df_cronograma)) as event:
+            node_dtype = df_cronograma['NODO_NORMALIZADO'].dtype
+            df_clientes = df_clientes.assign(NODO_NORMALIZADO=df_clientes['NODO_NORMALIZADO'].astype(node_dtype))
+            estimate = self._estimate_join(df_clientes, df_cronograma)
+            if estimate['rows'] == 0:
+                raise ValueError(NO_MATCHING_CLIENTS_MESSAGE)
+
+            dias = df_cronograma['FECHA TRABAJO'].dt.normalize()
+            weights = join_row_weights([df_clientes['NODO_NORMALIZADO']], [df_cronograma['NODO_NORMALIZADO']])
+            largest_day = int(pd.Series(weights).groupby(dias.to_numpy()).sum().max())
+            final_path, output_format = ExportUtils.resolve_format(output_path, estimate['rows'], largest_day)
+            print(f"Servicio: Exportando {estimate['rows']} filas por fechas; el día más grande tiene "
+                  f"{largest_day}.", file=sys.stderr)
+
+            sample = pd.merge(left=df_clientes.iloc[:0], right=df_cronograma.iloc[:0], on='NODO_NORMALIZADO',
+                              how='inner')
+            existing_columns = [col for col in EXPORT_COLUMNS if col in sample.columns]
+            clientes_por_nodo = code_groups(df_clientes['NODO_NORMALIZADO'].cat.codes.to_numpy(), len(nodos))
+            with PartitionedWriter(final_path, output_format, sample, existing_columns,
+                                   [EXPORT_COLUMNS[col] for col in existing_columns]) as writer:
+                for tanda in date_chunks(df_cronograma['FECHA TRABAJO'], weights, STREAMING_EXPORT_BATCH_ROWS):
+                    df_tanda = df_cronograma.iloc[tanda]
+                    clientes_tanda = rows_for_codes(clientes_por_nodo, df_tanda['NODO_NORMALIZADO'].cat.codes.to_numpy())
+                    # Cada día queda en el mismo orden que en el cruce completo: por cliente y luego por fila del cronograma.
+                    df_merged = pd.merge(left=df_clientes.iloc[clientes_tanda], right=df_tanda, on='NODO_NORMALIZADO',
+                                         how='inner')
+                    for dia, positions in ExcelUtils.iter_partitions(df_merged['FECHA TRABAJO'].dt.normalize()):
+                        writer.write(dia.strftime('%d-%m-%Y'), df_merged.iloc[positions])
+                    del df_merged
+            event.set(rows_out=writer.rows_written, partitions=writer.partitions, largest_partition_rows=largest_day,
+                      format=output_format)
+
+        print(f"Servicio: ¡Éxito! Se exportaron {writer.rows_written} clientes afectados.", file=sys.stderr)
+        return {
+            "status": "success",
+            "path": final_path,
+            "format": output_format,
+            "data_source": data_source,
+        }
+
+    @staticmethod
+    def _export_result(df_processed: pd.DataFrame, output_path: str) -> dict:
+        existing_columns = [col for col in EXPORT_COLUMNS if col in df_processed.columns]
+        # Una partición (hoja o CSV) por fecha de trabajo, escrita en streaming sin crear un DataFrame por grupo.
+        with stage('service.export', rows_in=len(df_processed)) as event:
+            final_path, output_format = ExportUtils.save_partitioned(
+                df_processed,
+                output_path,
+                partition_keys=df_processed['FECHA TRABAJO'].dt.normalize(),
+                partition_name_for=lambda fecha: fecha.strftime('%d-%m-%Y'),
+                columns=existing_columns,
+                headers=[EXPORT_COLUMNS[col] for col in existing_columns]
+            )
+            event.set(rows_out=len(df_processed), format=output_format)
+        return {
+            "status": "success",
+            "path": final_path,
+            "format": output_format,
+            "data_source": df_processed.attrs.get('data_source'),
+        }
+
+    def run_batch(self, db_session: Session, jobs: List[dict]) -> dict:
+        """
+        Ejecuta varios previews o exports (uno por trabajo: cronograma_path, ip_filter, mode y,
+        para exportar, output_path) con una sola carga de clientes.
+
+        Se leen los cronogramas y se consultan una sola vez los clientes de la unión de sus
+        nodos, con la bandera de IP y sin filtrarla. Ese resultado se comparte con un pool de
+        procesos (SharedFrame) y cada trabajo toma sus nodos, aplica su filtro de IP, cruza con
+        su cronograma y genera su primera página de preview o su archivo. Cada resultado queda
+        guardado en disco, así las páginas siguientes del preview no vuelven a la base.
+        Devuelve {"status", "jobs"} con {"result": ...} o {"error": "..."} por trabajo.
+        """
+        results: List[Optional[dict]] = [None] * len(jobs)
+        cronogramas = {}
+        for index, job in enumerate(jobs):
+            try:
+                self._validate_batch_job(job)
+                path = job['cronograma_path']
+                if path not in cronogramas:
+                    cronogramas[path] = self._read_cronograma(path)
+            except (ValueError, OSError) as e:
+                results[index] = {"error": str(e)}
+        pending = [index for index, result in enumerate(results) if result is None]
+        if not pending:
+            return {"status": "success", "jobs": results}
+
+        print(f"Servicio: Lote de {len(pending)} trabajos sobre {len(cronogramas)} cronogramas.", file=sys.stderr)
+        with stage('service.batch', jobs=len(pending), cronogramas=len(cronogramas)) as event:
+            nodos = sorted(set().union(*(df['NODO_NORMALIZADO'].cat.categories for df in cronogramas.values())))
+            with stage('service.fetch_clients', nodes=len(nodos), fetch_mode=CLIENTS_FETCH_MODE) as fetch_event:
+                if nodos:
+                    # Sin filtro de IP: cada trabajo aplica el suyo sobre la misma carga.
+                    df_clientes, data_source = self._load_affected_clients(db_session, nodos, 'all')
+                else:
+                    df_clientes = pd.DataFrame(columns=['NODO_NORMALIZADO', 'BANDERA_IP'], dtype=object)
+                    data_source = {"type": "none"}
+                fetch_event.set(rows_out=len(df_clientes), source=data_source["type"])
+
+            shared_clientes = SharedFrame.create(df_clientes)
+            del df_clientes
+            try:
+                batch_jobs = [{
+                    **jobs[index],
+                    'cronograma': cronogramas[jobs[index]['cronograma_path']],
+                    'cache_key': self._cache_key(jobs[index]['cronograma_path'], jobs[index]['ip_filter']),
+                } for index in pending]
+                job_results = run_batch(_run_batch_job, batch_jobs, _init_batch_worker,
+                                        (shared_clientes, data_source))
+            finally:
+                shared_clientes.remove()
+            for index, result in zip(pending, job_results):
+                results[index] = result
+            event.set(errors=sum('error' in result for result in results))
+        return {"status": "success", "jobs": results}
+
+    @staticmethod
+    def _validate_batch_job(job: dict) -> None:
+        if not isinstance(job, dict):
+            raise ValueError("Cada trabajo del lote debe ser un objeto JSON.")
+        for key in ("mode", "cronograma_path", "ip_filter"):
+            if not job.get(key):
+                raise ValueError(f"Falta el campo '{key}' en el trabajo.")
+        if job['mode'] not in ('preview', 'export'):
+            raise ValueError(f"Modo desconocido en el lote: {job['mode']}")
+        if job['ip_filter'] not in ('with_ip', 'without_ip', 'all'):
+            raise ValueError(f"Filtro de IP desconocido: {job['ip_filter']}")
+        limit = job.get('limit', 20)
+        if not isinstance(limit, int) or not 1 <= limit <= PREVIEW_MAX_PAGE_ROWS:
+            raise ValueError(f"El tamaño de página del preview debe estar entre 1 y {PREVIEW_MAX_PAGE_ROWS}.")
+        if job['mode'] == 'export':
+            if not job.get('output_path'):
+                raise ValueError("Un trabajo 'export' requiere output_path.")
+            ExportUtils.detect_format(job['output_path'])
+
+
+# --- Trabajos de un lote; corren en los procesos del pool de run_batch ---
+_batch_clientes: Optional[SharedFrame] = None
+_batch_data_source: Optional[dict] = None
+_batch_nodos: Optional[pd.Series] = None
+
+
+def _init_batch_worker(shared_clientes: SharedFrame, data_source: dict) -> None:
+    global _batch_clientes, _batch_data_source, _batch_nodos
+    _batch_clientes, _batch_data_source, _batch_nodos = shared_clientes, data_source, None
+
+
+def _run_batch_job(job: dict) -> dict:
+    global _batch_nodos
+    service = ClientsByNodeService()
+    df_cronograma = job['cronograma']
+    with stage('service.batch_job', mode=job['mode'], ip_filter=job['ip_filter']) as event:
+        # La clave de nodo de la carga compartida se lee una vez por proceso.
+        if _batch_nodos is None:
+            _batch_nodos = _batch_clientes.column('NODO_NORMALIZADO').astype('category')
+        mask = _batch_nodos.isin(df_cronograma['NODO_NORMALIZADO'].cat.categories).to_numpy()
+        df_clientes = service._filter_ip_flag(_batch_clientes.take(mask), job['ip_filter'])
+        df_merged = service._merge_with_cronograma(df_clientes, df_cronograma, _batch_data_source)
+        event.set(rows_out=len(df_merged))
+
+        # Queda en disco con la misma clave que usa get_preview para las páginas siguientes.
+        cache_key = tuple(job['cache_key'])
+        service.result_store.save(ResultStore.key_for(*cache_key), df_merged)
+        if job['mode'] == 'export':
+            return service._export_result(df_merged, job['output_path'])
+
+        max_rows = job.get('limit', 20)
+        order = service._sort_order(cache_key, df_merged, None, False)
+        return service._page_response(df_merged.iloc[order[:max_rows]], 0, max_rows, len(df_merged), True,
+                                      None, False, _batch_data_source,
+                                      join_estimate=df_merged.attrs.get('join_estimate'))
@@ -0,0 +1,75 @@
+# src-tauri/python/app/services/concurrent_reads.py
+import contextlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, Optional
+
+import pandas as pd
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine
+
+from core.jobs import CancelToken, current_token, job_scope
+
+
+@contextlib.contextmanager
+def cancellable_queries(connection: Connection):
+    """
+    Si el trabajo en curso (core.jobs) se cancela mientras dura el bloque, interrumpe en el
+    servidor las consultas que esta conexión esté ejecutando: cancela sus cursores (pytds
+    envía la señal de atención de TDS) o, en SQLite, interrumpe la conexión. La consulta
+    interrumpida falla en su hilo y el bloque lanza JobCancelled en su lugar. Fuera del
+    planificador no hace nada.
+    """
+    token = current_token()
+    if token is None:
+        yield
+        return
+
+    cursors = []
+
+    def remember_cursor(conn, cursor, statement, parameters, context, executemany):
+        cursors.append(cursor)
+
+    def interrupt():
+        for cursor in list(cursors):
+            if hasattr(cursor, 'cancel'):
+                cursor.cancel()
+        dbapi_connection = connection.connection.dbapi_connection
+        if hasattr(dbapi_connection, 'interrupt'):
+            dbapi_connection.interrupt()
+
+    event.listen(connection, 'before_cursor_execute', remember_cursor)
+    try:
+        with token.on_cancel(interrupt):
+            yield
+    except Exception:
+        token.check()
+        raise
+    finally:
+        event.remove(connection, 'before_cursor_execute', remember_cursor)
+    token.check()
+
+
+def _read_sql_on_own_connection(engine: Engine, query: Any, token: Optional[CancelToken]) -> pd.DataFrame:
+    # Cada lectura toma su propia conexión del pool y la devuelve al terminar; si la lanzó un
+    # trabajo del planificador, corre bajo ese mismo trabajo y se interrumpe si se cancela.
+    with job_scope(token) if token is not None else contextlib.nullcontext():
+        with engine.connect() as connection, cancellable_queries(connection):
+            return pd.read_sql(query, connection)
+
+
+def read_sql_async(executor: ThreadPoolExecutor, engine: Engine, query: Any) -> "Future[pd.DataFrame]":
+    """Lanza la consulta en otro hilo, sobre una conexión propia del pool."""
+    return executor.submit(_read_sql_on_own_connection, engine, query, current_token())
+
+
+def read_sql_concurrently(engine: Engine, queries: Dict[str, Any]) -> Dict[str, pd.DataFrame]:
+    """
+    Ejecuta varias consultas a la vez, cada una en su conexión del pool, y devuelve
+    los DataFrames con las mismas claves. El tiempo total es aproximadamente el de la
+    consulta más lenta. El pool debe admitir al menos len(queries) conexiones.
+    """
+    if not queries:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(queries)) as executor:
+        futures = {name: read_sql_async(executor, engine, query) for name, query in queries.items()}
+        return {name: future.result() for name, future in futures.items()}
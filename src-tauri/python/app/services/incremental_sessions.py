@@ -0,0 +1,136 @@
+# src-tauri/python/app/services/incremental_sessions.py
+import os
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import pandas as pd
+
+from core.result_store import ResultStore
+
+# --- Configuración del recálculo incremental ---
+INCREMENTAL_ENABLED = os.environ.get('INCREMENTAL_ENABLED', '1') != '0'
+INCREMENTAL_MAX_SESSIONS = int(os.environ.get('INCREMENTAL_MAX_SESSIONS', '4'))
+
+# Partes de una sesión que se guardan como resultados aparte en el ResultStore. El resultado
+# cruzado no se copia: la sesión guarda la clave con que ya está en el ResultStore.
+_PARTS = ('cronograma', 'clientes')
+# Atributo del cronograma guardado con la clave del resultado de la sesión.
+_RESULT_KEY_ATTR = 'incremental_result_key'
+
+
+class IncrementalSessions:
+    """
+    Último procesamiento de cada sesión: el cronograma normalizado, los clientes afectados
+    (ya con la bandera y el filtro de IP) y el resultado cruzado.
+
+    Una sesión es un archivo de cronograma (por su ruta, no por su contenido) con un filtro
+    de IP y una frescura de los datos. Cuando el planificador edita unas filas del archivo,
+    el contenido cambia pero la sesión es la misma, y el servicio puede partir del
+    procesamiento anterior en lugar de repetirlo. Las sesiones se guardan en memoria (para
+    main.py --worker) y en el ResultStore (para el proceso que lanza la siguiente solicitud);
+    en disco el resultado es el mismo archivo que sirve las páginas del preview.
+    """
+
+    def __init__(self, store: ResultStore, enabled: bool = INCREMENTAL_ENABLED,
+                 max_sessions: int = INCREMENTAL_MAX_SESSIONS):
+        self.store = store
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[str, ...], Tuple[pd.DataFrame, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(cronograma_path: str, ip_filter: str, freshness_token: str) -> Tuple[str, ...]:
+        return (os.path.abspath(cronograma_path), ip_filter, freshness_token)
+
+    def _store_key(self, key: Tuple[str, ...], part: str) -> str:
+        return ResultStore.key_for('incremental', *key, part)
+
+    def contains(self, key: Tuple[str, ...]) -> bool:
+        """
+        Indica si hay una sesión guardada, sin cargarla. Si su resultado ya se borró del
+        ResultStore, get() devuelve None igual.
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if key in self._sessions:
+                return True
+        return all(self.store.contains(self._store_key(key, part)) for part in _PARTS)
+
+    def get(self, key: Tuple[str, ...]) -> Optional[Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]]:
+        """Devuelve (cronograma, clientes, resultado) de la sesión, o None si no hay."""
+        if not self.enabled:
+            return None
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                self._sessions.move_to_end(key)
+                return session
+        df_cronograma = self.store.load(self._store_key(key, 'cronograma'))
+        if df_cronograma is None or _RESULT_KEY_ATTR not in df_cronograma.attrs:
+            return None
+        result_key = df_cronograma.attrs.pop(_RESULT_KEY_ATTR)
+        df_clientes = self.store.load(self._store_key(key, 'clientes'))
+        df_resultado = self.store.load(result_key)
+        if df_clientes is None or df_resultado is None:
+            return None
+        return df_cronograma, df_clientes, df_resultado
+
+    def put(self, key: Tuple[str, ...], df_cronograma: pd.DataFrame, df_clientes: pd.DataFrame,
+            df_resultado: pd.DataFrame, result_key: str) -> None:
+        """
+        Guarda el procesamiento de la sesión. El resultado se guarda una sola vez, con
+        result_key: la misma clave con que el servicio lo busca en el ResultStore.
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            self._sessions[key] = (df_cronograma, df_clientes, df_resultado)
+            self._sessions.move_to_end(key)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        self.store.save(result_key, df_resultado)
+        self.store.save(self._store_key(key, 'clientes'), df_clientes)
+        # El cronograma va último: con él la sesión queda completa para otros procesos.
+        df_cronograma = df_cronograma.copy(deep=False)
+        df_cronograma.attrs = {**df_cronograma.attrs, _RESULT_KEY_ATTR: result_key}
+        self.store.save(self._store_key(key, 'cronograma'), df_cronograma)
+
+    def clear(self) -> None:
+        """Olvida las sesiones en memoria; las de disco se borran con el ResultStore."""
+        with self._lock:
+            self._sessions.clear()
+
+    @staticmethod
+    def _node_signatures(df_cronograma: pd.DataFrame) -> pd.DataFrame:
+        """
+        Por nodo, la cantidad de filas y una firma de su contenido (NODO_N y fecha) que no
+        depende del orden de las filas: la suma de los hashes de cada fila.
+        """
+        # Misma resolución de fecha en ambos lados: el hash de un datetime depende de su unidad.
+        hashes = pd.util.hash_pandas_object(pd.DataFrame({
+            'NODO_N': df_cronograma['NODO_N'],
+            'FECHA TRABAJO': df_cronograma['FECHA TRABAJO'].astype('datetime64[ns]'),
+        }), index=False)
+        grouped = pd.DataFrame({
+            'nodo': df_cronograma['NODO_NORMALIZADO'].astype(object).to_numpy(),
+            'hash': hashes.to_numpy(),
+        }).groupby('nodo')['hash']
+        return pd.DataFrame({'rows': grouped.size(), 'hash': grouped.sum()})
+
+    @staticmethod
+    def diff_nodes(previous: pd.DataFrame, current: pd.DataFrame) -> Tuple[List[str], List[str], List[str]]:
+        """
+        Compara dos cronogramas normalizados por nodo y devuelve (nuevos, modificados,
+        quitados): los nodos que solo están en current, los que están en ambos con otras
+        filas y los que solo estaban en previous.
+        """
+        before = IncrementalSessions._node_signatures(previous)
+        after = IncrementalSessions._node_signatures(current)
+        added = after.index.difference(before.index)
+        removed = before.index.difference(after.index)
+        common = after.index.intersection(before.index)
+        changed = common[(after.loc[common] != before.loc[common]).any(axis=1).to_numpy()]
+        return list(added), list(changed), list(removed)
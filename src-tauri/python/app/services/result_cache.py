@@ -0,0 +1,103 @@
+# src-tauri/python/app/services/result_cache.py
+import os
+import sys
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# --- Configuración del caché de resultados ---
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get('RESULT_CACHE_MAX_ENTRIES', '4'))
+RESULT_CACHE_MAX_MB = int(os.environ.get('RESULT_CACHE_MAX_MB', '512'))
+
+
+class ResultCache:
+    """
+    Caché en memoria de los DataFrames ya procesados por ClientsByNodeService.
+
+    La clave combina el hash del contenido del cronograma, el filtro de IP y un
+    token de frescura de la base de datos. Se desalojan primero las entradas
+    usadas hace más tiempo hasta respetar el número máximo de entradas y el tamaño
+    total. Solo sirve dentro de un proceso de larga duración (main.py --worker).
+
+    Cada entrada guarda además los órdenes de filas ya calculados para paginar el preview
+    (uno por criterio de orden); se descartan junto con su entrada.
+    """
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, max_mb: int = RESULT_CACHE_MAX_MB):
+        self.max_entries = max_entries
+        self.max_bytes = max_mb * 1024 * 1024
+        self._entries: "OrderedDict[Tuple[str, ...], Tuple[pd.DataFrame, int]]" = OrderedDict()
+        self._orders: Dict[Tuple[str, ...], Dict[str, np.ndarray]] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def file_hash(file_path: str) -> str:
+        """Calcula el SHA-256 del contenido del archivo, leyendo por bloques."""
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def make_key(self, cronograma_path: str, ip_filter: str, freshness_token: str) -> Tuple[str, ...]:
+        return (self.file_hash(cronograma_path), ip_filter, freshness_token)
+
+    def get(self, key: Tuple[str, ...]) -> Optional[pd.DataFrame]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def put(self, key: Tuple[str, ...], df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(index=True, deep=True).sum())
+        if self.max_entries <= 0 or size > self.max_bytes:
+            print("Caché: Resultado demasiado grande, no se guarda.", file=sys.stderr)
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._total_bytes -= previous[1]
+                self._orders.pop(key, None)
+            self._entries[key] = (df, size)
+            self._total_bytes += size
+
+            while len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes:
+                evicted_key, (_, evicted_size) = self._entries.popitem(last=False)
+                self._total_bytes -= evicted_size
+                self._orders.pop(evicted_key, None)
+
+    def get_order(self, key: Tuple[str, ...], sort_key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            return self._orders.get(key, {}).get(sort_key)
+
+    def put_order(self, key: Tuple[str, ...], sort_key: str, positions: np.ndarray) -> None:
+        """Guarda un orden de filas del resultado de esa clave, si el resultado sigue en caché."""
+        with self._lock:
+            if key in self._entries:
+                self._orders.setdefault(key, {})[sort_key] = positions
+
+    def invalidate(self) -> int:
+        """Vacía el caché y devuelve cuántas entradas se descartaron."""
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._orders.clear()
+            self._total_bytes = 0
+        return count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "size_mb": round(self._total_bytes / (1024 * 1024), 2),
+                "max_entries": self.max_entries,
+                "max_mb": self.max_bytes // (1024 * 1024),
+            }
@@ -0,0 +1,106 @@
+# src-tauri/python/app/services/snapshot_store.py
+import os
+import sys
+import json
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+import pandas as pd
+
+from core.file_utils import FileUtils
+
+# --- Configuración de las instantáneas ---
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR') or FileUtils.get_app_data_dir('snapshots')
+SNAPSHOT_TTL_HOURS = float(os.environ.get('SNAPSHOT_TTL_HOURS', '24'))
+SNAPSHOT_ENABLED = os.environ.get('SNAPSHOT_ENABLED', '1') != '0'
+
+
+class SnapshotStore:
+    """
+    Guarda copias locales de las vistas en formato Feather (Arrow IPC) sin comprimir,
+    una por vista, para poder cargarlas con memory mapping.
+
+    Cada vista tiene un archivo de metadatos '<vista>.json' que apunta al archivo de
+    datos vigente. Cada refresco escribe un archivo de datos nuevo y luego actualiza los
+    metadatos, así nunca se sobrescribe un archivo que otro proceso tenga mapeado.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, ttl_hours: float = SNAPSHOT_TTL_HOURS,
+                 enabled: bool = SNAPSHOT_ENABLED):
+        self.directory = directory
+        self.ttl_seconds = ttl_hours * 3600
+        self.enabled = enabled
+
+    @property
+    def available(self) -> bool:
+        """Las instantáneas requieren pyarrow; sin él el servicio trabaja solo contra la base."""
+        if not self.enabled:
+            return False
+        try:
+            import pyarrow.feather  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _meta_path(self, view_name: str) -> str:
+        return os.path.join(self.directory, f"{view_name}.json")
+
+    def read_meta(self, view_name: str) -> Optional[dict]:
+        try:
+            with open(self._meta_path(view_name), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def age_seconds(self, meta: dict) -> float:
+        return max(0.0, time.time() - meta['created_at'])
+
+    def is_fresh(self, meta: dict) -> bool:
+        return self.age_seconds(meta) < self.ttl_seconds
+
+    def describe(self, meta: dict, stale: bool = False) -> dict:
+        """Etiqueta legible del origen de los datos para mostrarla junto al resultado."""
+        return {
+            "type": "snapshot",
+            "created_at": datetime.fromtimestamp(meta['created_at']).isoformat(timespec='seconds'),
+            "age_hours": round(self.age_seconds(meta) / 3600, 2),
+            "stale": stale or not self.is_fresh(meta),
+        }
+
+    def save(self, view_name: str, df: pd.DataFrame) -> dict:
+        from pyarrow import feather
+
+        os.makedirs(self.directory, exist_ok=True)
+        created_at = time.time()
+        data_file = f"{view_name}-{int(created_at * 1000)}.arrow"
+        data_path = os.path.join(self.directory, data_file)
+
+        # Sin compresión para que la lectura con memory_map no tenga que descomprimir.
+        feather.write_feather(df.reset_index(drop=True), data_path, compression='uncompressed')
+
+        meta = {"view": view_name, "file": data_file, "created_at": created_at, "rows": len(df)}
+        FileUtils.write_atomic(self._meta_path(view_name), lambda f: f.write(json.dumps(meta).encode('utf-8')))
+
+        for old_file in os.listdir(self.directory):
+            if old_file.startswith(f"{view_name}-") and old_file.endswith('.arrow') and old_file != data_file:
+                try:
+                    os.remove(os.path.join(self.directory, old_file))
+                except OSError:
+                    # En Windows falla si otro proceso aún lo tiene mapeado; se reintenta en el próximo refresco.
+                    pass
+        return meta
+
+    def load(self, view_name: str) -> Optional[Tuple[pd.DataFrame, dict]]:
+        """Carga la última instantánea de la vista, sin importar su edad, o None si no existe."""
+        meta = self.read_meta(view_name)
+        if meta is None:
+            return None
+        from pyarrow import feather
+
+        try:
+            table = feather.read_table(os.path.join(self.directory, meta['file']), memory_map=True)
+        except (OSError, KeyError) as e:
+            print(f"Instantáneas: No se pudo leer la copia local de {view_name}: {e}", file=sys.stderr)
+            return None
+        return table.to_pandas(), meta
@@ -0,0 +1,395 @@
+"""
+Benchmark de los dos pipelines con datos sintéticos.
+
+Uso (desde src-tauri/python):
+
+    python -m benchmarks.run_benchmarks --sizes 1000,100000,1000000
+    python -m benchmarks.run_benchmarks --sizes 1000,100000 --save-baseline
+
+Para cada tamaño genera (o reutiliza) el cronograma, el reporte de clientes y una base
+SQLite con las vistas, y mide tiempo y pico de memoria (RSS) de cada etapa. Cada pipeline
+y tamaño corre en su propio proceso, así la memoria de una corrida no se suma a la siguiente:
+
+- tarea (ClientsByNodeTask): load, normalize, merge, preview, export
+- servicio (ClientsByNodeService): load, normalize, db_fetch, merge, preview, export
+
+Cada corrida se compara con la línea base (por defecto benchmarks/baseline.json, que está en
+el repositorio, medida con los tamaños por defecto): falla si cambia el resultado, si una etapa
+tarda más que la línea base por encima de --tolerance (y al menos MIN_REGRESSION_SECONDS más),
+si falta la línea base o si un caso medido no está en ella. Los tiempos dependen de la
+máquina: para comparar en otra, guarde allí su propia línea base con --save-baseline (y
+--baseline para no pisar la del repositorio).
+"""
+import argparse
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import pandas as pd
+
+from core.instrumentation import current_rss_bytes
+
+DEFAULT_WORKDIR = os.path.join(tempfile.gettempdir(), 'db_client_benchmarks')
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# Las etapas más cortas que esto no se comparan; su ruido supera cualquier regresión.
+MIN_COMPARABLE_SECONDS = 0.05
+# Una etapa más lenta cuenta como regresión solo si además tarda al menos esto más que la línea base.
+MIN_REGRESSION_SECONDS = 0.05
+# Clave de la línea base con los datos de la máquina que la midió; no es un caso.
+MACHINE_KEY = '_machine'
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+class StageRecorder:
+    """
+    Acumula tiempo y pico de RSS por etapa. Un hilo muestrea la memoria mientras haya
+    etapas abiertas, así el pico incluye los temporales que se liberan antes de terminar.
+    """
+
+    def __init__(self):
+        self.seconds: Dict[str, float] = {}
+        self.peak_rss: Dict[str, int] = {}
+        self._open: Dict[int, int] = {}
+        self._tokens = itertools.count()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+
+    def _sample(self):
+        while not self._stop.wait(RSS_SAMPLE_INTERVAL):
+            rss = current_rss_bytes()
+            if rss is None:
+                return
+            with self._lock:
+                for token in self._open:
+                    self._open[token] = max(self._open[token], rss)
+
+    def close(self):
+        self._stop.set()
+        self._sampler.join()
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        with self._lock:
+            token = next(self._tokens)
+            self._open[token] = current_rss_bytes() or 0
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                peak = max(self._open.pop(token), current_rss_bytes() or 0)
+            self.seconds[name] = self.seconds.get(name, 0.0) + elapsed
+            self.peak_rss[name] = max(self.peak_rss.get(name, 0), peak)
+
+    @contextlib.contextmanager
+    def wrapped(self, owner, attribute: str, name: str):
+        """Mide cada llamada a owner.attribute como parte de la etapa `name` mientras dure el bloque."""
+        missing = object()
+        # Se guarda el atributo tal como está definido (p. ej. el staticmethod) para restaurarlo igual.
+        defined = vars(owner).get(attribute, missing)
+        original = getattr(owner, attribute)
+
+        def measured(*args, **kwargs):
+            with self.stage(name):
+                return original(*args, **kwargs)
+
+        setattr(owner, attribute, staticmethod(measured) if isinstance(defined, staticmethod) else measured)
+        try:
+            yield
+        finally:
+            if defined is missing:
+                # Era un método de la clase: basta con quitar el atributo de la instancia.
+                delattr(owner, attribute)
+            else:
+                setattr(owner, attribute, defined)
+
+    def report(self, stages: List[str],
+               derived: Dict[str, Tuple[Callable[[Dict[str, float]], float], str]]) -> dict:
+        """
+        Arma el reporte en el orden de `stages`. `derived` calcula las etapas que no se pueden
+        envolver por separado (p. ej. merge = total - normalize) a partir de los tiempos medidos,
+        junto con la etapa medida de la que se toma el pico de memoria.
+        """
+        result = {}
+        for name in stages:
+            if name in derived:
+                seconds_for, peak_stage = derived[name]
+                seconds, peak = seconds_for(self.seconds), self.peak_rss.get(peak_stage)
+            elif name in self.seconds:
+                seconds, peak = self.seconds[name], self.peak_rss.get(name)
+            else:
+                result[name] = None
+                continue
+            result[name] = {
+                'seconds': round(seconds, 4),
+                'peak_rss_mb': round(peak / (1024 * 1024), 1) if peak else None,
+            }
+        return result
+
+
+def result_signature(df: pd.DataFrame) -> dict:
+    """Filas y huella del resultado, independiente del orden de las filas y del tipo de las columnas."""
+    hashes = pd.util.hash_pandas_object(df.astype(str), index=False)
+    return {'rows': len(df), 'hash': format(int(hashes.sum()) & 0xFFFFFFFFFFFFFFFF, '016x')}
+
+
+def prepare_inputs(workdir: str, size: int, regenerate: bool) -> dict:
+    """Genera los archivos de entrada del tamaño pedido, o reutiliza los de una corrida anterior."""
+    from benchmarks import synthetic_data
+    from core.export_utils import EXCEL_MAX_DATA_ROWS
+
+    os.makedirs(workdir, exist_ok=True)
+    paths = {
+        'cronograma': os.path.join(workdir, f'cronograma-{size}.xlsx'),
+        'clientes': os.path.join(workdir, f'clientes-{size}.xlsx'),
+        'database': os.path.join(workdir, f'vistas-{size}.sqlite'),
+    }
+    if regenerate or not os.path.exists(paths['cronograma']):
+        synthetic_data.write_workbook(
+            synthetic_data.build_cronograma(synthetic_data.schedule_rows_for(size)), paths['cronograma'])
+    if size > EXCEL_MAX_DATA_ROWS:
+        # No cabe en una hoja: la tarea recibe el DataFrame directamente y no se mide 'load'.
+        paths['clientes'] = None
+    elif regenerate or not os.path.exists(paths['clientes']):
+        synthetic_data.write_workbook(synthetic_data.build_clientes(size), paths['clientes'])
+    if regenerate or not os.path.exists(paths['database']):
+        synthetic_data.build_sqlite_standin(paths['database'], size)
+    return paths
+
+
+def run_task(paths: dict, size: int, workdir: str) -> dict:
+    from benchmarks import synthetic_data
+    import tasks.clients_by_node as task_module
+
+    recorder = StageRecorder()
+    try:
+        task = task_module.ClientsByNodeTask()
+        with recorder.stage('load'):
+            task.load_schedule(paths['cronograma'])
+            if paths['clientes']:
+                task.load_clients(paths['clientes'])
+        if not paths['clientes']:
+            task.clients_df = synthetic_data.build_clientes(size)
+
+        with contextlib.ExitStack() as stack:
+            for function in ('clean_text_key', 'extract_node_code', 'unify_categories'):
+                stack.enter_context(recorder.wrapped(task_module, function, 'normalize'))
+            with recorder.stage('_merge'):
+                task.process(filter_b2b='all')
+        with recorder.stage('preview'):
+            task.get_preview(20)
+        with recorder.stage('export'):
+            task.export_result(os.path.join(workdir, f'tarea-{size}.xlsx'))
+
+        stages = recorder.report(['load', 'normalize', 'merge', 'preview', 'export'], {
+            'merge': (lambda s: s['_merge'] - s.get('normalize', 0.0), '_merge'),
+        })
+        if not paths['clientes']:
+            stages['load'] = None
+        return {
+            'stages': stages,
+            'result': result_signature(task.result_df),
+        }
+    finally:
+        recorder.close()
+
+
+def run_service(paths: dict, size: int, workdir: str) -> dict:
+    from app.services.clients_by_node_service import ClientsByNodeService
+    from app.models.database import get_session
+    from core.excel_utils import ExcelUtils
+
+    recorder = StageRecorder()
+    db = get_session()
+    try:
+        service = ClientsByNodeService()
+        with contextlib.ExitStack() as stack:
+            stack.enter_context(recorder.wrapped(ExcelUtils, 'load_excel', 'load'))
+            stack.enter_context(recorder.wrapped(service, '_read_cronograma', '_read_cronograma'))
+            stack.enter_context(recorder.wrapped(service, '_load_affected_clients', 'db_fetch'))
+            with recorder.stage('_total'):
+                df_processed = service._get_processed_data(db, paths['cronograma'], 'all')
+        # El preview y el export reutilizan el resultado en caché, como en la aplicación.
+        with recorder.stage('preview'):
+            service.get_preview(db, paths['cronograma'], 'all')
+        with recorder.stage('export'):
+            service.export_to_excel(db, paths['cronograma'], 'all', os.path.join(workdir, f'servicio-{size}.xlsx'))
+
+        return {
+            'stages': recorder.report(['load', 'normalize', 'db_fetch', 'merge', 'preview', 'export'], {
+                'normalize': (lambda s: s['_read_cronograma'] - s['load'], '_read_cronograma'),
+                'merge': (lambda s: s['_total'] - s['_read_cronograma'] - s.get('db_fetch', 0.0), '_total'),
+            }),
+            'result': result_signature(df_processed.drop(columns=['NODO_NORMALIZADO'])),
+        }
+    finally:
+        db.close()
+        recorder.close()
+
+
+def machine_info() -> dict:
+    return {'platform': platform.platform(), 'python': platform.python_version(), 'cpus': os.cpu_count()}
+
+
+def compare_with_baseline(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    Devuelve la lista de regresiones respecto de la línea base (vacía si no hay). Un caso que
+    no está en la línea base también cuenta, porque no se pudo comparar.
+    """
+    problems = []
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if previous is None:
+            problems.append(f"{key}: not in the baseline; save one with --save-baseline")
+            continue
+        if current['result'] != previous['result']:
+            problems.append(f"{key}: result changed {previous['result']} -> {current['result']}")
+        for stage, measured in current['stages'].items():
+            before = (previous['stages'] or {}).get(stage)
+            if not measured or not before or before['seconds'] < MIN_COMPARABLE_SECONDS:
+                continue
+            if (measured['seconds'] > before['seconds'] * (1 + tolerance)
+                    and measured['seconds'] - before['seconds'] >= MIN_REGRESSION_SECONDS):
+                problems.append(f"{key}/{stage}: {measured['seconds']:.3f}s vs baseline {before['seconds']:.3f}s")
+    return problems
+
+
+def print_table(results: dict):
+    for key, current in results.items():
+        print(f"\n{key}  ({current['result']['rows']} filas, hash {current['result']['hash']})")
+        for stage, measured in current['stages'].items():
+            if measured is None:
+                print(f"  {stage:<10} {'-':>10}")
+            else:
+                rss = '-' if measured['peak_rss_mb'] is None else f"{measured['peak_rss_mb']:.1f} MB"
+                print(f"  {stage:<10} {measured['seconds']:>9.3f}s {rss:>12}")
+
+
+RUNNERS = {'task': run_task, 'service': run_service}
+
+
+def run_in_subprocess(pipeline: str, size: int, paths: dict, workdir: str) -> dict:
+    """Corre un pipeline y tamaño en un proceso nuevo y devuelve su reporte."""
+    env = dict(os.environ)
+    # Mediciones en frío: sin caché de Excel, instantáneas ni índice por nodo, para que cada corrida lea y consulte todo.
+    env.setdefault('EXCEL_CACHE_ENABLED', '0')
+    env.setdefault('SNAPSHOT_ENABLED', '0')
+    env.setdefault('NODE_INDEX_ENABLED', '0')
+    # Sin partir del procesamiento de una corrida anterior con el mismo cronograma.
+    env.setdefault('INCREMENTAL_ENABLED', '0')
+    # El recorder de esta herramienta ya mide cada etapa; los eventos JSON solo agregarían ruido.
+    env.setdefault('STAGE_EVENTS_ENABLED', '0')
+    env['DATABASE_URL'] = f"sqlite:///{paths['database']}"
+    command = [sys.executable, '-m', 'benchmarks.run_benchmarks', '--run-one', pipeline, str(size),
+               '--workdir', workdir, '--paths', json.dumps(paths)]
+    completed = subprocess.run(command, env=env, stdout=subprocess.PIPE, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark {pipeline}/{size} failed with exit code {completed.returncode}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def best_of(runs: List[dict]) -> dict:
+    """Combina varias corridas del mismo caso quedándose con el menor tiempo y pico de cada etapa."""
+    signatures = {json.dumps(run['result'], sort_keys=True) for run in runs}
+    if len(signatures) > 1:
+        raise RuntimeError(f"Repeated runs returned different results: {sorted(signatures)}")
+    stages = {}
+    for name, measured in runs[0]['stages'].items():
+        if measured is None:
+            stages[name] = None
+            continue
+        samples = [run['stages'][name] for run in runs]
+        peaks = [sample['peak_rss_mb'] for sample in samples if sample['peak_rss_mb'] is not None]
+        stages[name] = {
+            'seconds': min(sample['seconds'] for sample in samples),
+            'peak_rss_mb': min(peaks) if peaks else None,
+        }
+    return {'stages': stages, 'result': runs[0]['result']}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark de la tarea y del servicio con datos sintéticos.")
+    parser.add_argument("--sizes", default="1000,10000,100000",
+                        help="Cantidades de clientes separadas por coma (de 1000 a 5000000).")
+    parser.add_argument("--pipelines", default="task,service", help="Pipelines a medir: task, service o ambos.")
+    parser.add_argument("--workdir", default=DEFAULT_WORKDIR, help="Carpeta para los datos generados y los exports.")
+    parser.add_argument("--regenerate", action="store_true", help="Vuelve a generar los datos aunque existan.")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="Archivo JSON con la línea base.")
+    parser.add_argument("--save-baseline", action="store_true", help="Guarda esta corrida como línea base.")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="Aumento de tiempo permitido por etapa antes de marcar una regresión (0.25 = 25%%); "
+                             f"además debe tardar al menos {MIN_REGRESSION_SECONDS}s más.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Corridas por caso; se informa la mejor de cada etapa para reducir el ruido.")
+    parser.add_argument("--json", action="store_true", help="Imprime los resultados como JSON.")
+    # Uso interno: corrida de un solo pipeline y tamaño dentro del proceso hijo.
+    parser.add_argument("--run-one", nargs=2, metavar=("PIPELINE", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--paths", help=argparse.SUPPRESS)
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+
+    if args.run_one:
+        pipeline, size = args.run_one[0], int(args.run_one[1])
+        print(json.dumps(RUNNERS[pipeline](json.loads(args.paths), size, args.workdir)))
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    pipelines = [name.strip() for name in args.pipelines.split(',') if name.strip()]
+    unknown = set(pipelines) - set(RUNNERS)
+    if unknown:
+        build_parser().error(f"Pipelines desconocidos: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for size in sizes:
+        paths = prepare_inputs(args.workdir, size, args.regenerate)
+        for pipeline in pipelines:
+            print(f"Benchmark: Midiendo {pipeline} con {size} clientes...", file=sys.stderr)
+            runs = [run_in_subprocess(pipeline, size, paths, args.workdir) for _ in range(max(1, args.repeat))]
+            results[f"{pipeline}/{size}"] = best_of(runs)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({MACHINE_KEY: machine_info(), **results}, f, indent=2)
+            f.write('\n')
+        print(f"\nLínea base guardada en {args.baseline}", file=sys.stderr)
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo existe la línea base {args.baseline}; guárdela con --save-baseline.", file=sys.stderr)
+        sys.exit(1)
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get(MACHINE_KEY) != machine_info():
+        print(f"\nLa línea base se midió en otra máquina ({baseline.get(MACHINE_KEY)}); los tiempos pueden no "
+              f"ser comparables.", file=sys.stderr)
+    problems = compare_with_baseline(results, baseline, args.tolerance)
+    if problems:
+        print(f"\nRegresiones respecto de la línea base (tolerancia {args.tolerance:.0%}):", file=sys.stderr)
+        for problem in problems:
+            print(f"  {problem}", file=sys.stderr)
+        sys.exit(1)
+    print("\nSin regresiones respecto de la línea base.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
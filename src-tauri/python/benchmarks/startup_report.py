@@ -0,0 +1,137 @@
+"""
+Reporte de tiempo de arranque del backend, desde el código fuente o desde el build de PyInstaller.
+
+Uso (desde src-tauri/python):
+
+    python -m benchmarks.startup_report
+    python -m benchmarks.startup_report --exe dist/python_backend/python_backend.exe
+
+Mide el tiempo de reloj de:
+
+- help: main.py --help
+- usage_error: main.py sin argumentos (termina con error de uso)
+- worker_ready: main.py --worker hasta la línea {"status": "ready"}; incluye importar el
+  controlador y precalentar la conexión (usar DATABASE_URL para apuntar a una base local)
+
+Desde el código fuente además corre el arranque del worker con -X importtime y lista los
+módulos que más tardan en importarse, y comprueba que help y usage_error no carguen
+pandas ni SQLAlchemy.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN_SCRIPT = os.path.join(PYTHON_DIR, 'main.py')
+# Módulos que no deberían cargarse para responder --help ni un error de uso.
+HEAVY_MODULES = ('pandas', 'sqlalchemy', 'numpy', 'pyarrow', 'openpyxl')
+
+
+def _timed_run(command: List[str]) -> float:
+    start = time.perf_counter()
+    subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=PYTHON_DIR)
+    return time.perf_counter() - start
+
+
+def _time_worker_ready(command: List[str], timeout: float) -> Optional[float]:
+    """Segundos hasta que el worker anuncia que está listo, o None si no lo hace a tiempo."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command + ['--worker'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                               stderr=subprocess.DEVNULL, text=True, cwd=PYTHON_DIR)
+    try:
+        line = process.stdout.readline()
+        elapsed = time.perf_counter() - start
+        ready = line and json.loads(line).get('result', {}).get('status') == 'ready'
+        process.stdin.write(json.dumps({"id": 0, "mode": "shutdown"}) + "\n")
+        process.stdin.flush()
+        process.wait(timeout=timeout)
+        return elapsed if ready else None
+    except (ValueError, subprocess.TimeoutExpired):
+        return None
+    finally:
+        if process.poll() is None:
+            process.kill()
+
+
+def _imported_heavy_modules(args: List[str]) -> List[str]:
+    """Módulos pesados que importa `python main.py <args>`, según -X importtime."""
+    completed = subprocess.run([sys.executable, '-X', 'importtime', MAIN_SCRIPT] + args,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, cwd=PYTHON_DIR)
+    imported = {line.rsplit('|', 1)[-1].strip() for line in completed.stderr.splitlines() if '|' in line}
+    return [module for module in HEAVY_MODULES if module in imported]
+
+
+def _slowest_imports(limit: int, max_depth: int) -> List[dict]:
+    """Imports con mayor tiempo acumulado al arrancar el worker, hasta max_depth niveles de anidamiento."""
+    process = subprocess.Popen([sys.executable, '-X', 'importtime', MAIN_SCRIPT, '--worker'],
+                               stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                               text=True, cwd=PYTHON_DIR)
+    _, stderr = process.communicate(json.dumps({"id": 0, "mode": "shutdown"}) + "\n")
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        # Cada nivel de anidamiento agrega dos espacios de sangría al nombre.
+        depth = (len(name) - len(name.lstrip()) - 1) // 2 + 1
+        if depth <= max_depth:
+            imports.append({'module': name.strip(), 'depth': depth,
+                            'cumulative_ms': round(int(cumulative) / 1000, 1)})
+    return sorted(imports, key=lambda item: item['cumulative_ms'], reverse=True)[:limit]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Reporte de tiempo de arranque del backend.")
+    parser.add_argument("--exe", help="Ejecutable del build de PyInstaller; sin él se mide main.py.")
+    parser.add_argument("--repeat", type=int, default=3, help="Corridas por escenario; se informa la mejor.")
+    parser.add_argument("--timeout", type=float, default=60, help="Espera máxima del worker, en segundos.")
+    parser.add_argument("--top", type=int, default=15, help="Cantidad de imports a listar.")
+    parser.add_argument("--depth", type=int, default=3,
+                        help="Niveles de imports anidados a considerar (1 = solo los de main.py).")
+    parser.add_argument("--json", action="store_true", help="Imprime el reporte como JSON.")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    command = [args.exe] if args.exe else [sys.executable, MAIN_SCRIPT]
+    repeat = max(1, args.repeat)
+
+    worker_runs = [_time_worker_ready(command, args.timeout) for _ in range(repeat)]
+    report = {
+        'target': args.exe or MAIN_SCRIPT,
+        'seconds': {
+            'help': round(min(_timed_run(command + ['--help']) for _ in range(repeat)), 3),
+            'usage_error': round(min(_timed_run(command) for _ in range(repeat)), 3),
+            'worker_ready': round(min(run for run in worker_runs if run is not None), 3)
+            if any(run is not None for run in worker_runs) else None,
+        },
+    }
+    if not args.exe:
+        report['heavy_modules'] = {
+            'help': _imported_heavy_modules(['--help']),
+            'usage_error': _imported_heavy_modules([]),
+        }
+        report['slowest_imports'] = _slowest_imports(args.top, args.depth)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Arranque de {report['target']}")
+    for scenario, seconds in report['seconds'].items():
+        print(f"  {scenario:<13} {'-' if seconds is None else f'{seconds:.3f}s':>9}")
+    if 'heavy_modules' in report:
+        for scenario, modules in report['heavy_modules'].items():
+            print(f"  módulos pesados en {scenario}: {', '.join(modules) or 'ninguno'}")
+        print("  imports más lentos al arrancar el worker:")
+        for item in report['slowest_imports']:
+            print(f"    {item['cumulative_ms']:>9.1f} ms  {'  ' * (item['depth'] - 1)}{item['module']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import sys
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from core.excel_utils import ExcelUtils
+from core.export_utils import EXCEL_MAX_DATA_ROWS
+
+# Prefijos de nodo por departamento, como aparecen en ZONA_GRUPO y en la vista de clientes.
+DEPARTAMENTOS: Dict[str, str] = {
+    'SCZ': 'SANTA CRUZ', 'LPZ': 'LA PAZ', 'CBB': 'COCHABAMBA', 'SRE': 'CHUQUISACA',
+    'EAL': 'EL ALTO', 'PTS': 'POTOSI', 'TRJ': 'TARIJA',
+}
+# Nodos distintos por prefijo; los clientes se reparten entre ellos.
+NODOS_POR_PREFIJO = 400
+# Días hábiles sobre los que se reparte el cronograma.
+DIAS_CRONOGRAMA = 60
+
+CLIENT_VIEW_COLUMNS = ['NRO_CUENTA', 'NOMBRE_CLIENTE', 'NODO', 'EJECUTIVO_CORPORATE',
+                       'CORREO_TITULAR_PYME', 'TELEFONO_CONTACTO', 'TIPO_PRODUCTO']
+
+
+def schedule_rows_for(n_clients: int) -> int:
+    """Filas del cronograma para una cantidad de clientes: un nodo cada ~1000 clientes, al menos 50."""
+    return max(50, n_clients // 1000)
+
+
+def _node_codes(rng: np.random.Generator, n: int):
+    """Devuelve (código de nodo, departamento) para n filas al azar."""
+    prefijo = rng.integers(0, len(DEPARTAMENTOS), size=n)
+    numeros = rng.integers(1, NODOS_POR_PREFIJO + 1, size=n)
+    codes = np.char.add(np.array(list(DEPARTAMENTOS))[prefijo], np.char.zfill(numeros.astype(str), 3))
+    return codes, np.array(list(DEPARTAMENTOS.values()), dtype=object)[prefijo]
+
+
+def _decorate(rng: np.random.Generator, codes: np.ndarray, formats) -> np.ndarray:
+    """Escribe cada código con una de las variantes de `formats` (p. ej. 'Nodo {}'), como en los datos reales."""
+    choice = rng.integers(0, len(formats), size=len(codes))
+    result = np.empty(len(codes), dtype=object)
+    for i, fmt in enumerate(formats):
+        mask = choice == i
+        result[mask] = [None if fmt is None else fmt.format(code) for code in codes[mask]]
+    return result
+
+
+def build_cronograma(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Cronograma con las columnas que leen ambos pipelines (NODO_N, FECHA TRABAJO, DEPARTAMENTO).
+    Incluye nodos escritos con 'Nodo', en minúsculas y con espacios, y alguna fila sin fecha.
+    """
+    rng = np.random.default_rng(seed)
+    codes, departamento = _node_codes(rng, n_rows)
+    fechas = pd.Timestamp('2025-06-02') + pd.to_timedelta(rng.integers(0, DIAS_CRONOGRAMA, size=n_rows), unit='D')
+    fechas = pd.Series(fechas.strftime('%Y-%m-%d'), dtype=object)
+    fechas[rng.random(n_rows) < 0.01] = 'SIN FECHA'
+    return pd.DataFrame({
+        'NODO_N': _decorate(rng, codes, ['{}', 'Nodo {}', ' {} ']),
+        'FECHA TRABAJO': fechas,
+        'DEPARTAMENTO': departamento,
+    })
+
+
+def build_clientes(n_rows: int, seed: int = 1) -> pd.DataFrame:
+    """Reporte de clientes con las columnas que pide ClientsByNodeTask.load_clients."""
+    rng = np.random.default_rng(seed)
+    codes, departamento = _node_codes(rng, n_rows)
+    # Algunos departamentos llegan en minúsculas o con espacios; la tarea los limpia.
+    sucio = rng.random(n_rows) < 0.1
+    departamento[sucio] = [f" {d.lower()} " for d in departamento[sucio]]
+    es_b2b = np.array([1, 0, 'SI', 'NO', None], dtype=object)[rng.integers(0, 5, size=n_rows)]
+    return pd.DataFrame({
+        'CLIENTENRO': np.arange(1, n_rows + 1),
+        'CLIENTE_NOMBRE_COMPLETO': np.char.add('CLIENTE ', np.arange(1, n_rows + 1).astype(str)).astype(object),
+        'ZONA_GRUPO': _decorate(rng, codes, ['ZONA {} NORTE', '{}', 'GRUPO {} - SUR', 'SIN NODO', None]),
+        'DEPARTAMENTO': departamento,
+        'PRODUCTO_IP': np.array(['IP FIJA', 'SIN IP'], dtype=object)[rng.integers(0, 2, size=n_rows)],
+        'ES_B2B': es_b2b,
+        'CLIENTE_TELEFONO': np.char.add('7', rng.integers(1000000, 9999999, size=n_rows).astype(str)).astype(object),
+    })
+
+
+def build_client_view(n_rows: int, seed: int = 2) -> pd.DataFrame:
+    """Filas de VISTAS_CACHE_CUBO_CARTERAS con NODO escrito de varias formas y algunos nulos."""
+    rng = np.random.default_rng(seed)
+    codes, _ = _node_codes(rng, n_rows)
+    cuentas = np.arange(1, n_rows + 1)
+    return pd.DataFrame({
+        'NRO_CUENTA': cuentas,
+        'NOMBRE_CLIENTE': np.char.add('CLIENTE ', cuentas.astype(str)).astype(object),
+        'NODO': _decorate(rng, codes, ['{}', 'NODO {}', ' nodo {} ', None]),
+        'EJECUTIVO_CORPORATE': np.array(['ANA', 'LUIS', 'MARIA', None], dtype=object)[rng.integers(0, 4, size=n_rows)],
+        'CORREO_TITULAR_PYME': np.char.add(cuentas.astype(str), '@correo.bo').astype(object),
+        'TELEFONO_CONTACTO': np.char.add('7', rng.integers(1000000, 9999999, size=n_rows).astype(str)).astype(object),
+        'TIPO_PRODUCTO': np.array(['INTERNET', 'TV', 'TELEFONIA'], dtype=object)[rng.integers(0, 3, size=n_rows)],
+    })
+
+
+def write_workbook(df: pd.DataFrame, file_path: str) -> bool:
+    """
+    Escribe el DataFrame en una sola hoja con el exportador en streaming.
+    Devuelve False sin escribir si no cabe en una hoja de Excel.
+    """
+    if len(df) > EXCEL_MAX_DATA_ROWS:
+        return False
+    ExcelUtils.save_partitioned_excel(df, file_path, partition_keys=pd.Series(0, index=df.index),
+                                      sheet_name_for=lambda _: 'Hoja1', columns=list(df.columns))
+    return True
+
+
+def build_sqlite_standin(db_path: str, n_clients: int, seed: int = 2) -> None:
+    """
+    Crea una base SQLite con VISTAS_CACHE_CUBO_CARTERAS y VISTA_TIENE_IP como vistas sobre
+    tablas locales, con las mismas columnas que los modelos ORM. Un tercio de los clientes
+    tiene IP pública.
+    """
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    connection = sqlite3.connect(db_path)
+    try:
+        clientes = build_client_view(n_clients, seed)
+        clientes.to_sql('CUBO_CARTERAS', connection, index=False, chunksize=100000)
+        ip = pd.DataFrame({'CLIENTENRO': clientes['NRO_CUENTA'].iloc[::3], 'BANDERA_IP': 'TIENE'})
+        ip.to_sql('CLIENTES_IP', connection, index=False, chunksize=100000)
+        connection.executescript(
+            f"""
+            CREATE VIEW VISTAS_CACHE_CUBO_CARTERAS AS SELECT {', '.join(CLIENT_VIEW_COLUMNS)} FROM CUBO_CARTERAS;
+            CREATE VIEW VISTA_TIENE_IP AS SELECT CLIENTENRO, BANDERA_IP FROM CLIENTES_IP;
+            """
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    print(f"Benchmark: Base SQLite de prueba creada en {db_path} ({n_clients} clientes).", file=sys.stderr)
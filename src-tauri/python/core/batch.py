@@ -0,0 +1,136 @@
+import os
+import pickle
+import sys
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Procesos para repartir los trabajos de un lote; 0 usa uno por trabajo, hasta la cantidad de CPUs.
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', '0'))
+
+
+class SharedFrame:
+    """
+    DataFrame de solo lectura que comparten los procesos de un lote. Se escribe una vez en un
+    archivo Feather sin comprimir y cada proceso lo abre con memory mapping, así los datos se
+    leen de las mismas páginas del sistema y cada trabajo convierte a pandas solo las filas
+    que usa. Sin pyarrow se guarda con pickle y cada proceso carga una copia.
+
+    Al enviarse a otro proceso solo viaja la ruta del archivo.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._table = None
+        self._df: Optional[pd.DataFrame] = None
+
+    @classmethod
+    def create(cls, df: pd.DataFrame, directory: Optional[str] = None) -> 'SharedFrame':
+        handle, path = tempfile.mkstemp(prefix='batch-', suffix='.arrow', dir=directory)
+        os.close(handle)
+        try:
+            from pyarrow import feather
+
+            feather.write_feather(df.reset_index(drop=True), path, compression='uncompressed')
+        except Exception:
+            with open(path, 'wb') as f:
+                pickle.dump(df.reset_index(drop=True), f, protocol=pickle.HIGHEST_PROTOCOL)
+        return cls(path)
+
+    def __getstate__(self):
+        return {'path': self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state['path'])
+
+    def _open(self):
+        if self._table is not None or self._df is not None:
+            return
+        try:
+            from pyarrow import feather
+
+            self._table = feather.read_table(self.path, memory_map=True)
+        except Exception:
+            with open(self.path, 'rb') as f:
+                self._df = pickle.load(f)
+
+    def __len__(self) -> int:
+        self._open()
+        return self._table.num_rows if self._table is not None else len(self._df)
+
+    def column(self, name: str) -> pd.Series:
+        """Una columna completa como serie de pandas (p. ej. la clave por la que se filtra)."""
+        self._open()
+        if self._table is not None:
+            return self._table.column(name).to_pandas()
+        return self._df[name]
+
+    def take(self, mask: np.ndarray) -> pd.DataFrame:
+        """Las filas marcadas en mask, como un DataFrame nuevo."""
+        self._open()
+        if self._table is not None:
+            import pyarrow as pa
+
+            return self._table.filter(pa.array(np.asarray(mask, dtype=bool))).to_pandas()
+        return self._df[np.asarray(mask, dtype=bool)].reset_index(drop=True)
+
+    def slice(self, start: int, stop: int) -> pd.DataFrame:
+        """Las filas [start, stop), como un DataFrame nuevo; solo se convierten esas filas."""
+        self._open()
+        if self._table is not None:
+            return self._table.slice(start, stop - start).to_pandas()
+        return self._df.iloc[start:stop].reset_index(drop=True)
+
+    def remove(self) -> None:
+        self._table, self._df = None, None
+        try:
+            os.remove(self.path)
+        except OSError:
+            # En Windows falla si un proceso aún lo tiene mapeado; queda en la carpeta temporal.
+            pass
+
+
+def _run_job(job_fn: Callable[[Any], Any], job: Any) -> dict:
+    try:
+        return {"result": job_fn(job)}
+    except Exception as e:
+        print(f"Lote: Error en un trabajo: {e}", file=sys.stderr)
+        return {"error": str(e)}
+
+
+def batch_workers(job_count: int, max_workers: int = BATCH_MAX_WORKERS) -> int:
+    """Procesos a usar para job_count trabajos, según max_workers (0: uno por CPU) y las CPUs disponibles."""
+    limit = max_workers if max_workers > 0 else (os.cpu_count() or 1)
+    return max(1, min(job_count, limit))
+
+
+def run_batch(job_fn: Callable[[Any], Any], jobs: Sequence[Any],
+              initializer: Optional[Callable[..., None]] = None, initargs: tuple = (),
+              max_workers: int = BATCH_MAX_WORKERS) -> List[dict]:
+    """
+    Ejecuta job_fn sobre cada trabajo en un pool de procesos y devuelve, en el orden de
+    jobs, {"result": ...} o {"error": "..."} por trabajo; un trabajo que falla no detiene
+    a los demás. initializer corre una vez por proceso (p. ej. para abrir un SharedFrame).
+    Con un solo proceso todo corre aquí mismo, sin el costo de arrancar el pool.
+    job_fn, initializer y los trabajos deben poder enviarse a otro proceso (pickle).
+    """
+    workers = batch_workers(len(jobs), max_workers)
+    if workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [_run_job(job_fn, job) for job in jobs]
+
+    print(f"Lote: Repartiendo {len(jobs)} trabajos en {workers} procesos.", file=sys.stderr)
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        futures = [pool.submit(_run_job, job_fn, job) for job in jobs]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BrokenProcessPool as e:
+                results.append({"error": f"El proceso del trabajo terminó inesperadamente: {e}"})
+        return results
@@ -0,0 +1,70 @@
+from typing import Iterable, Optional
+
+import pandas as pd
+
+
+def arrow_string_dtype() -> Optional[str]:
+    """Dtype de texto respaldado por Arrow, o None si pyarrow no está instalado."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return 'string[pyarrow]'
+
+
+def to_account_ids(values: pd.Series) -> pd.Series:
+    """
+    Convierte números de cuenta a enteros: int64, o Int64 si hay nulos. Solo cambia columnas
+    de números (p. ej. floats por celdas vacías u objetos con enteros); las de texto se dejan
+    como están, porque un código como '00123' perdería sus ceros a la izquierda. Si algún
+    valor no es entero la columna también se devuelve sin cambios.
+    """
+    if pd.api.types.is_integer_dtype(values.dtype) or pd.api.types.is_bool_dtype(values.dtype):
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('integer', 'floating', 'mixed-integer-float'):
+        return values
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.isna().sum() != values.isna().sum() or (numeric.dropna() % 1 != 0).any():
+        return values
+    return numeric.astype('Int64' if numeric.isna().any() else 'int64')
+
+
+def to_compact_strings(values: pd.Series) -> pd.Series:
+    """
+    Pasa una columna de textos a strings de Arrow, que guardan todos los textos en un solo
+    buffer en vez de un objeto de Python por fila. Las columnas que mezclan textos con
+    números u otros valores no se tocan, para no cambiar cómo se exportan.
+    """
+    dtype = arrow_string_dtype()
+    if dtype is None or values.dtype == dtype or isinstance(values.dtype, pd.CategoricalDtype):
+        return values
+    if pd.api.types.infer_dtype(values, skipna=True) not in ('string', 'empty'):
+        return values
+    return values.astype(dtype)
+
+
+def compact_frame(df: pd.DataFrame, categories: Iterable[str] = (), account_ids: Iterable[str] = (),
+                  strings: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Cambia en el mismo DataFrame el dtype de las columnas indicadas (las que no existen se
+    ignoran): categóricas para las de pocos valores distintos, enteros para los números de
+    cuenta y strings de Arrow para nombres, correos y teléfonos. Solo reemplaza columnas;
+    no copia el resto del DataFrame. Devuelve el mismo DataFrame.
+    """
+    for column in categories:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+    for column in account_ids:
+        if column in df.columns:
+            df[column] = to_account_ids(df[column])
+    for column in strings:
+        if column in df.columns:
+            df[column] = to_compact_strings(df[column])
+    return df
+
+
+def frame_memory_bytes(df: Optional[pd.DataFrame]) -> int:
+    """Memoria que ocupa el DataFrame, incluidos los textos, o 0 si no hay DataFrame."""
+    if df is None:
+        return 0
+    return int(df.memory_usage(index=True, deep=True).sum())
@@ -1,26 +1,137 @@
+import numpy as np
 import pandas as pd
-from typing import List, Optional
+from typing import Any, Callable, List, Optional
 import os
+import sys
+import time
+import hashlib
+
+from core.file_utils import FileUtils
+
+# 'auto' usa calamine si python-calamine está instalado; cualquier otro valor se pasa tal cual a pandas.
+EXCEL_READER_ENGINE = os.environ.get('EXCEL_READER_ENGINE', 'auto')
+# Copias ya parseadas de los Excel, para no volver a leer el XLSX si el archivo no cambió.
+EXCEL_CACHE_DIR = os.environ.get('EXCEL_CACHE_DIR') or FileUtils.get_app_data_dir('excel_cache')
+EXCEL_CACHE_ENABLED = os.environ.get('EXCEL_CACHE_ENABLED', '1') != '0'
+EXCEL_CACHE_MAX_AGE_DAYS = float(os.environ.get('EXCEL_CACHE_MAX_AGE_DAYS', '7'))
+# Filas que se convierten a valores de Python a la vez al escribir una hoja en streaming.
+EXCEL_EXPORT_CHUNK_ROWS = int(os.environ.get('EXCEL_EXPORT_CHUNK_ROWS', '50000'))
 
 
 class ExcelUtils:
     @staticmethod
-    def load_excel(file_path: str, required_columns: Optional[List[str]] = None) -> pd.DataFrame:
+    def get_reader_engine() -> Optional[str]:
         """
-        Carga un archivo Excel y valida que contenga las columnas requeridas.
-        Devuelve un DataFrame de pandas.
+        Motor de lectura para pd.read_excel. None deja que pandas elija el suyo por defecto.
+        """
+        if EXCEL_READER_ENGINE != 'auto':
+            return EXCEL_READER_ENGINE or None
+        try:
+            import python_calamine  # noqa: F401
+        except ImportError:
+            return None
+        return 'calamine'
+
+    @staticmethod
+    def read_header(file_path: str) -> List[str]:
+        """
+        Lee solo la fila de encabezados de la primera hoja.
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
         try:
-            df = pd.read_excel(file_path)
+            df = pd.read_excel(file_path, nrows=0, engine=ExcelUtils.get_reader_engine())
         except Exception as e:
             raise ValueError(f"Could not read Excel file: {e}")
+        return list(df.columns)
+
+    @staticmethod
+    def _sidecar_path(file_path: str, usecols: Optional[List[str]]) -> str:
+        # La clave cambia si el archivo se modifica (mtime o tamaño) o si se piden otras columnas.
+        stat = os.stat(file_path)
+        key = f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}|{sorted(usecols or [])}"
+        return os.path.join(EXCEL_CACHE_DIR, hashlib.sha1(key.encode('utf-8')).hexdigest())
+
+    @staticmethod
+    def _read_sidecar(sidecar_path: str) -> Optional[pd.DataFrame]:
+        try:
+            if os.path.exists(sidecar_path + '.arrow'):
+                return pd.read_feather(sidecar_path + '.arrow')
+            if os.path.exists(sidecar_path + '.pkl'):
+                return pd.read_pickle(sidecar_path + '.pkl')
+        except Exception as e:
+            print(f"ExcelUtils: Ignoring unreadable cache {sidecar_path}: {e}", file=sys.stderr)
+        return None
+
+    @staticmethod
+    def _write_sidecar(sidecar_path: str, df: pd.DataFrame) -> None:
+        """
+        Guarda el DataFrame en Feather; si pyarrow no está o no puede representar alguna
+        columna (p. ej. números y textos mezclados), lo guarda con pickle.
+        """
+        try:
+            os.makedirs(EXCEL_CACHE_DIR, exist_ok=True)
+            ExcelUtils._prune_sidecars()
+        except OSError:
+            return
+        # Se escribe en un temporal y se reemplaza: una copia truncada (por otro trabajo que escribe
+        # la misma o por un cierre a medias) tendría la misma clave y se leería hasta expirar.
+        try:
+            FileUtils.write_atomic(sidecar_path + '.arrow', df.to_feather)
+            return
+        except Exception:
+            pass
+        try:
+            FileUtils.write_atomic(sidecar_path + '.pkl', df.to_pickle)
+        except Exception as e:
+            print(f"ExcelUtils: Could not cache parsed Excel: {e}", file=sys.stderr)
+
+    @staticmethod
+    def _prune_sidecars() -> None:
+        # Los Excel suelen llegar a la carpeta temporal; las copias viejas no se volverán a usar.
+        limit = time.time() - EXCEL_CACHE_MAX_AGE_DAYS * 86400
+        for name in os.listdir(EXCEL_CACHE_DIR):
+            path = os.path.join(EXCEL_CACHE_DIR, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def load_excel(file_path: str, required_columns: Optional[List[str]] = None,
+                   use_cache: bool = EXCEL_CACHE_ENABLED) -> pd.DataFrame:
+        """
+        Carga un archivo Excel y valida que contenga las columnas requeridas.
+        Devuelve un DataFrame de pandas.
+
+        Las columnas se validan leyendo solo el encabezado y, si se indican columnas
+        requeridas, solo esas se cargan. El resultado se guarda en una copia columnar
+        junto a la clave (ruta, mtime, tamaño) para que volver a cargar el mismo archivo
+        no tenga que parsear el XLSX.
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+
+        sidecar_path = ExcelUtils._sidecar_path(file_path, required_columns) if use_cache else None
+        if sidecar_path:
+            df = ExcelUtils._read_sidecar(sidecar_path)
+            if df is not None:
+                return df
 
         if required_columns:
-            missing = [col for col in required_columns if col not in df.columns]
+            header = ExcelUtils.read_header(file_path)
+            missing = [col for col in required_columns if col not in header]
             if missing:
                 raise ValueError(f"Missing columns in '{file_path}': {', '.join(missing)}")
+
+        try:
+            df = pd.read_excel(file_path, usecols=required_columns or None, engine=ExcelUtils.get_reader_engine())
+        except Exception as e:
+            raise ValueError(f"Could not read Excel file: {e}")
+
+        if sidecar_path:
+            ExcelUtils._write_sidecar(sidecar_path, df)
         return df
 
     @staticmethod
@@ -33,6 +144,81 @@ class ExcelUtils:
         except Exception as e:
             raise ValueError(f"Could not save to Excel: {e}")
 
+    @staticmethod
+    def _iter_rows(block: pd.DataFrame):
+        # Convierte columna por columna a objetos de Python; los nulos (NaN, NaT, None) quedan como celdas vacías.
+        columns = []
+        for _, values in block.items():
+            array = values.to_numpy(dtype=object, copy=True)
+            array[pd.isna(array)] = None
+            columns.append(array.tolist())
+        return zip(*columns)
+
+    @staticmethod
+    def iter_partitions(partition_keys: pd.Series):
+        """
+        Recorre las particiones en orden ascendente de clave (como groupby) y devuelve
+        (clave, posiciones) para cada una. Ordena una sola vez con un orden estable, así las
+        filas de cada partición conservan su orden original. Las claves nulas se omiten.
+        """
+        codes, uniques = pd.factorize(partition_keys, sort=True)
+        order = np.argsort(codes, kind='stable')
+        sorted_codes = codes[order]
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(sorted_codes)) + 1))
+        ends = np.append(starts[1:], len(sorted_codes))
+        for start, end in zip(starts, ends):
+            if start == end or sorted_codes[start] < 0:
+                continue
+            yield uniques[sorted_codes[start]], order[start:end]
+
+    @staticmethod
+    def add_header_sheet(workbook, title: str, headers: List[str]):
+        """Agrega a un libro de solo escritura una hoja con la fila de encabezados en negrita."""
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font
+
+        worksheet = workbook.create_sheet(title=title)
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            cell.font = Font(bold=True)
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+        return worksheet
+
+    @staticmethod
+    def save_partitioned_excel(df: pd.DataFrame, file_path: str, partition_keys: pd.Series,
+                               sheet_name_for: Callable[[Any], str], columns: List[str],
+                               headers: Optional[List[str]] = None, empty_sheet_name: str = "Resultado") -> None:
+        """
+        Guarda el DataFrame en un Excel con una hoja por valor de partition_keys, escribiendo
+        las filas en streaming sobre hojas de solo escritura de openpyxl.
+
+        Las particiones salen de iter_partitions y cada hoja se escribe desde su rango de
+        posiciones, en bloques de EXCEL_EXPORT_CHUNK_ROWS filas. Así la memoria no crece con
+        el tamaño del archivo y el tiempo es lineal en las filas escritas.
+        """
+        from openpyxl import Workbook
+
+        headers = headers or columns
+        # Se toman solo las filas y columnas de cada bloque; nunca se copia el DataFrame completo.
+        column_positions = df.columns.get_indexer(columns)
+
+        try:
+            workbook = Workbook(write_only=True)
+            for key, positions in ExcelUtils.iter_partitions(partition_keys):
+                worksheet = ExcelUtils.add_header_sheet(workbook, sheet_name_for(key), headers)
+                for chunk_start in range(0, len(positions), EXCEL_EXPORT_CHUNK_ROWS):
+                    chunk_positions = positions[chunk_start:chunk_start + EXCEL_EXPORT_CHUNK_ROWS]
+                    for row in ExcelUtils._iter_rows(df.iloc[chunk_positions, column_positions]):
+                        worksheet.append(row)
+
+            if not workbook.worksheets:
+                ExcelUtils.add_header_sheet(workbook, empty_sheet_name, headers)
+            workbook.save(file_path)
+        except Exception as e:
+            raise ValueError(f"Could not save to Excel: {e}")
+
     @staticmethod
     def preview_dataframe(df: pd.DataFrame, max_rows: int = 10) -> pd.DataFrame:
         """
@@ -45,10 +231,4 @@ class ExcelUtils:
         """
         Lista las columnas de un archivo Excel.
         """
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"File not found: {file_path}")
-        try:
-            df = pd.read_excel(file_path, nrows=0)
-        except Exception as e:
-            raise ValueError(f"Could not read Excel file: {e}")
-        return list(df.columns)
+        return ExcelUtils.read_header(file_path)
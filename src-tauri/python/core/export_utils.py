@@ -0,0 +1,244 @@
+import gzip
+import io
+import os
+import sys
+import zipfile
+from typing import Any, Callable, List, Optional, Tuple
+
+import pandas as pd
+
+from core.excel_utils import ExcelUtils, EXCEL_EXPORT_CHUNK_ROWS
+
+# Con más filas que esto, un export pedido como XLSX se escribe en el formato de respaldo.
+EXPORT_STREAMING_THRESHOLD_ROWS = int(os.environ.get('EXPORT_STREAMING_THRESHOLD_ROWS', '500000'))
+EXPORT_FALLBACK_FORMAT = os.environ.get('EXPORT_FALLBACK_FORMAT', 'zip')
+# Con 1 los exports que no parten de un resultado ya calculado se escriben partición por
+# partición (PartitionedWriter), sin armar el resultado completo; con 0 se arma y se guarda entero.
+STREAMING_EXPORT_ENABLED = os.environ.get('STREAMING_EXPORT_ENABLED', '1') != '0'
+# Filas que se cruzan a la vez en esos exports: los días con pocas filas se juntan hasta este
+# tope para no pagar un cruce por día; un día más grande se cruza solo.
+STREAMING_EXPORT_BATCH_ROWS = int(os.environ.get('STREAMING_EXPORT_BATCH_ROWS', '200000'))
+# Límite de filas por hoja de Excel, sin contar el encabezado.
+EXCEL_MAX_DATA_ROWS = 1048575
+# Nombre de la columna que indica la partición (hoja) en los formatos de un solo archivo.
+PARTITION_COLUMN = 'PARTICION'
+
+
+class ExportUtils:
+    # Extensión -> formato. '.csv.gz' va antes que '.csv' para que gane la coincidencia más larga.
+    OUTPUT_FORMATS = {
+        '.xlsx': 'xlsx',
+        '.csv.gz': 'csv.gz',
+        '.csv': 'csv',
+        '.parquet': 'parquet',
+        '.zip': 'zip',
+    }
+
+    @staticmethod
+    def detect_format(file_path: str) -> str:
+        """
+        Devuelve el formato de salida según la extensión del archivo.
+        """
+        lower_path = file_path.lower()
+        for extension, output_format in ExportUtils.OUTPUT_FORMATS.items():
+            if lower_path.endswith(extension):
+                return output_format
+        supported = ', '.join(ExportUtils.OUTPUT_FORMATS)
+        raise ValueError(f"Unsupported output extension for '{file_path}'. Use one of: {supported}")
+
+    @staticmethod
+    def replace_format(file_path: str, output_format: str) -> str:
+        """Cambia la extensión de la ruta por la del formato indicado."""
+        current = ExportUtils.detect_format(file_path)
+        base = file_path[:len(file_path) - len(current) - 1]
+        return f"{base}.{output_format}"
+
+    @staticmethod
+    def resolve_format(file_path: str, total_rows: int, largest_partition_rows: int) -> Tuple[str, str]:
+        """
+        Ruta y formato finales de un export. Si se pidió XLSX y el resultado supera
+        EXPORT_STREAMING_THRESHOLD_ROWS filas, o su partición más grande no cabe en una hoja,
+        se cambia a EXPORT_FALLBACK_FORMAT con la misma ruta base. Recibe solo los conteos,
+        así sirve también para un export que todavía no tiene sus filas.
+        """
+        output_format = ExportUtils.detect_format(file_path)
+        if output_format == 'xlsx' and (total_rows > EXPORT_STREAMING_THRESHOLD_ROWS
+                                        or largest_partition_rows > EXCEL_MAX_DATA_ROWS):
+            file_path = ExportUtils.replace_format(file_path, EXPORT_FALLBACK_FORMAT)
+            output_format = EXPORT_FALLBACK_FORMAT
+            print(f"ExportUtils: {total_rows} rows exceed the XLSX limits, writing {file_path} instead.",
+                  file=sys.stderr)
+        return file_path, output_format
+
+    @staticmethod
+    def save_partitioned(df: pd.DataFrame, file_path: str, partition_keys: pd.Series,
+                         partition_name_for: Callable[[Any], str], columns: List[str],
+                         headers: Optional[List[str]] = None) -> Tuple[str, str]:
+        """
+        Guarda el DataFrame particionado en el formato que indica la extensión:
+
+        - .xlsx: una hoja por partición.
+        - .zip: un CSV por partición dentro del ZIP.
+        - .csv / .csv.gz: un solo CSV ordenado por partición, con la columna PARTICION.
+        - .parquet: bloques ordenados por partición, con la columna PARTICION.
+
+        Si se pidió XLSX y el resultado supera EXPORT_STREAMING_THRESHOLD_ROWS filas, o una
+        partición no cabe en una hoja, se escribe en EXPORT_FALLBACK_FORMAT con la misma
+        ruta base. Devuelve (ruta final, formato final).
+        """
+        largest = int(partition_keys.value_counts().max()) if len(df) else 0
+        file_path, output_format = ExportUtils.resolve_format(file_path, len(df), largest)
+        with PartitionedWriter(file_path, output_format, df.iloc[:0], columns, headers) as writer:
+            for name, chunk in ExportUtils._iter_chunks(df, partition_keys, partition_name_for,
+                                                        columns, writer.headers):
+                writer.write_chunk(name, chunk)
+        return file_path, output_format
+
+    @staticmethod
+    def _iter_chunks(df: pd.DataFrame, partition_keys: pd.Series, partition_name_for: Callable[[Any], str],
+                     columns: List[str], headers: List[str]):
+        """
+        Devuelve (nombre de partición, bloque) con como mucho EXCEL_EXPORT_CHUNK_ROWS filas,
+        partición por partición. Cada bloque es una copia nueva con los encabezados finales;
+        nunca se copia el DataFrame completo.
+        """
+        column_positions = df.columns.get_indexer(columns)
+        for key, positions in ExcelUtils.iter_partitions(partition_keys):
+            name = partition_name_for(key)
+            for start in range(0, len(positions), EXCEL_EXPORT_CHUNK_ROWS):
+                chunk = df.iloc[positions[start:start + EXCEL_EXPORT_CHUNK_ROWS], column_positions]
+                chunk.columns = headers
+                yield name, chunk
+
+
+class PartitionedWriter:
+    """
+    Escribe un export particionado a medida que llegan sus filas, en los mismos formatos que
+    ExportUtils.save_partitioned. Sirve para exportar sin tener el resultado completo en
+    memoria: quien escribe arma una partición (o una parte de ella), la pasa a write() y la
+    suelta antes de armar la siguiente.
+
+    Las llamadas seguidas con el mismo nombre se agregan a la misma partición (hoja, CSV
+    del ZIP o bloque con el mismo valor de PARTICION); cada partición se escribe de una vez,
+    sin volver a ella después de empezar otra. sample es un DataFrame (puede estar vacío)
+    con las columnas y dtypes de lo que se va a escribir; el esquema del Parquet sale de él.
+    Los errores al escribir se informan como ValueError, igual que save_partitioned.
+    """
+
+    def __init__(self, file_path: str, output_format: str, sample: pd.DataFrame, columns: List[str],
+                 headers: Optional[List[str]] = None, empty_sheet_name: str = "Resultado"):
+        if output_format not in ExportUtils.OUTPUT_FORMATS.values():
+            raise ValueError(f"Unsupported output format: {output_format}")
+        self.file_path = file_path
+        self.output_format = output_format
+        self.columns = columns
+        self.headers = headers or columns
+        self.empty_sheet_name = empty_sheet_name
+        self.rows_written = 0
+        self.partitions = 0
+        self._sample = sample
+        self._current_name = None
+        self._target = None
+        self._stream = None
+        self._schema = None
+        self._text_columns: List[str] = []
+
+    def __enter__(self) -> 'PartitionedWriter':
+        try:
+            self._open()
+        except Exception as e:
+            raise ValueError(f"Could not save {self.output_format} export: {e}")
+        return self
+
+    def __exit__(self, exc_type, exc, traceback) -> None:
+        try:
+            self._close(save=exc_type is None)
+        except Exception as e:
+            if exc_type is None:
+                raise ValueError(f"Could not save {self.output_format} export: {e}")
+
+    def write(self, name: str, df: pd.DataFrame) -> None:
+        """Agrega las filas de df (con las columnas de origen) a la partición name."""
+        column_positions = df.columns.get_indexer(self.columns)
+        for start in range(0, len(df), EXCEL_EXPORT_CHUNK_ROWS):
+            chunk = df.iloc[start:start + EXCEL_EXPORT_CHUNK_ROWS, column_positions]
+            chunk.columns = self.headers
+            self.write_chunk(name, chunk)
+
+    def write_chunk(self, name: str, chunk: pd.DataFrame) -> None:
+        """Agrega un bloque que ya tiene solo las columnas de salida, con sus encabezados."""
+        try:
+            if name != self._current_name:
+                self._start_partition(name)
+                self._current_name = name
+                self.partitions += 1
+            self._write(chunk)
+        except ValueError:
+            raise
+        except Exception as e:
+            raise ValueError(f"Could not save {self.output_format} export: {e}")
+        self.rows_written += len(chunk)
+
+    def _open(self) -> None:
+        if self.output_format == 'xlsx':
+            from openpyxl import Workbook
+
+            self._target = Workbook(write_only=True)
+        elif self.output_format == 'zip':
+            self._target = zipfile.ZipFile(self.file_path, 'w', compression=zipfile.ZIP_DEFLATED)
+        elif self.output_format in ('csv', 'csv.gz'):
+            opener = gzip.open if self.output_format == 'csv.gz' else open
+            self._stream = opener(self.file_path, 'wt', encoding='utf-8-sig', newline='')
+            pd.DataFrame(columns=[PARTITION_COLUMN] + self.headers).to_csv(self._stream, index=False)
+        elif self.output_format == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            # Las columnas de texto (object) pueden mezclar números y textos, que no tienen tipo Arrow
+            # común; se guardan como texto. El esquema se fija antes para que todos los bloques coincidan.
+            sample = self._sample
+            self._text_columns = [header for column, header in zip(self.columns, self.headers)
+                                  if sample[column].dtype == object]
+            sample = sample.iloc[:0, sample.columns.get_indexer(self.columns)].set_axis(self.headers, axis=1)
+            sample = sample.astype({column: 'string' for column in self._text_columns})
+            sample.insert(0, PARTITION_COLUMN, pd.Series(dtype='string'))
+            self._schema = pa.Schema.from_pandas(sample, preserve_index=False)
+            self._target = pq.ParquetWriter(self.file_path, self._schema)
+
+    def _start_partition(self, name: str) -> None:
+        if self.output_format == 'xlsx':
+            self._stream = ExcelUtils.add_header_sheet(self._target, name, self.headers)
+        elif self.output_format == 'zip':
+            if self._stream is not None:
+                self._stream.close()
+            self._stream = io.TextIOWrapper(self._target.open(f"{name}.csv", 'w'), encoding='utf-8-sig',
+                                            newline='')
+            pd.DataFrame(columns=self.headers).to_csv(self._stream, index=False)
+
+    def _write(self, chunk: pd.DataFrame) -> None:
+        if self.output_format == 'xlsx':
+            for row in ExcelUtils._iter_rows(chunk):
+                self._stream.append(row)
+        elif self.output_format == 'zip':
+            chunk.to_csv(self._stream, index=False, header=False)
+        elif self.output_format in ('csv', 'csv.gz'):
+            chunk.insert(0, PARTITION_COLUMN, self._current_name)
+            chunk.to_csv(self._stream, index=False, header=False)
+        elif self.output_format == 'parquet':
+            import pyarrow as pa
+
+            chunk = chunk.astype({column: 'string' for column in self._text_columns})
+            chunk.insert(0, PARTITION_COLUMN, self._current_name)
+            self._target.write_table(pa.Table.from_pandas(chunk, schema=self._schema, preserve_index=False))
+
+    def _close(self, save: bool) -> None:
+        if self.output_format == 'xlsx':
+            if save:
+                if not self._target.worksheets:
+                    ExcelUtils.add_header_sheet(self._target, self.empty_sheet_name, self.headers)
+                self._target.save(self.file_path)
+            return
+        if self._stream is not None:
+            self._stream.close()
+        if self._target is not None:
+            self._target.close()
@@ -1,11 +1,13 @@
 import os
+import sys
 import shutil
 import tempfile
-from typing import Optional
+from typing import BinaryIO, Callable, Optional
 
 
 class FileUtils:
     SUPPORTED_EXTENSIONS = ['.xlsx', '.xls']
+    APP_NAME = 'DBClientTigoHelper'
 
     @staticmethod
     def file_exists(file_path: str) -> bool:
@@ -49,6 +51,37 @@ class FileUtils:
         import os
         return os.path.join(tempfile.gettempdir(), file_name)
 
+    @staticmethod
+    def get_app_data_dir(*subdirs: str) -> str:
+        """
+        Devuelve la carpeta de datos de la aplicación del usuario (o una subcarpeta),
+        según el sistema operativo. No crea la carpeta.
+        """
+        if os.name == 'nt':
+            base = os.environ.get('LOCALAPPDATA') or os.environ.get('APPDATA') or os.path.expanduser('~')
+        elif sys.platform == 'darwin':
+            base = os.path.join(os.path.expanduser('~'), 'Library', 'Application Support')
+        else:
+            base = os.environ.get('XDG_DATA_HOME') or os.path.join(os.path.expanduser('~'), '.local', 'share')
+        return os.path.join(base, FileUtils.APP_NAME, *subdirs)
+
+    @staticmethod
+    def write_atomic(path: str, write: Callable[[BinaryIO], None]) -> None:
+        """
+        Escribe un archivo llamando write(stream) sobre un temporal único en la misma carpeta
+        y lo reemplaza al terminar, así otro hilo o proceso nunca lee un archivo a medias y
+        dos escrituras simultáneas de la misma ruta no se pisan.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or None,
+                                        prefix=os.path.basename(path) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
     @staticmethod
     def delete_file(file_path: str) -> None:
         """
@@ -0,0 +1,186 @@
+import contextlib
+import json
+import os
+import sys
+import threading
+import time
+from typing import Callable, Optional
+
+# Los eventos de etapa salen por stderr como una línea JSON cada uno: {"event": "stage", ...}.
+STAGE_EVENTS_ENABLED = os.environ.get('STAGE_EVENTS_ENABLED', '1') != '0'
+
+_MB = 1024 * 1024
+_local = threading.local()
+
+
+def _windows_memory_counter(field: str) -> Optional[int]:
+    import ctypes
+    from ctypes import wintypes
+
+    class ProcessMemoryCounters(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+            ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+            ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t),
+        ]
+
+    kernel32, psapi = ctypes.windll.kernel32, ctypes.windll.psapi
+    kernel32.GetCurrentProcess.restype = wintypes.HANDLE
+    psapi.GetProcessMemoryInfo.argtypes = [wintypes.HANDLE, ctypes.POINTER(ProcessMemoryCounters), wintypes.DWORD]
+    counters = ProcessMemoryCounters()
+    counters.cb = ctypes.sizeof(counters)
+    if not psapi.GetProcessMemoryInfo(kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb):
+        return None
+    return getattr(counters, field)
+
+
+def current_rss_bytes() -> Optional[int]:
+    """
+    Memoria residente (RSS) actual del proceso: con psutil si está instalado, con la API de
+    Windows o con /proc en Linux. Devuelve None si no se puede medir.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        if os.name == 'nt':
+            return _windows_memory_counter('WorkingSetSize')
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss_bytes() -> Optional[int]:
+    """
+    Memoria residente máxima que alcanzó el proceso desde que arrancó: PeakWorkingSetSize en
+    Windows, VmHWM de /proc en Linux o ru_maxrss en otros sistemas. None si no se puede medir.
+    """
+    try:
+        if os.name == 'nt':
+            return _windows_memory_counter('PeakWorkingSetSize')
+        if os.path.exists('/proc/self/status'):
+            with open('/proc/self/status') as status:
+                for line in status:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+            return None
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # macOS informa bytes; los demás Unix, kilobytes.
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except (OSError, ValueError, AttributeError, ImportError):
+        return None
+
+
+def emit_event(event: str, **fields) -> None:
+    """Escribe un evento como una línea JSON en stderr."""
+    if not STAGE_EVENTS_ENABLED:
+        return
+    print(json.dumps({"event": event, **fields}, ensure_ascii=False, default=str), file=sys.stderr, flush=True)
+
+
+class StageEvent:
+    """Campos del evento de una etapa; el bloque medido los completa con `set` (p. ej. rows_out)."""
+
+    def __init__(self, name: str, fields: dict):
+        self.name = name
+        self.fields = fields
+
+    def set(self, **fields) -> None:
+        self.fields.update(fields)
+
+
+@contextlib.contextmanager
+def stage_listener(callback: Callable[[str, str, dict], None]):
+    """
+    Mientras dura el bloque, cada etapa de este hilo llama a callback('start', nombre, campos)
+    antes de empezar y a callback('end', nombre, evento) al terminar, con los mismos campos
+    del evento que emite. Si el callback lanza una excepción en 'start' la etapa no corre:
+    así core.jobs corta un trabajo cancelado en su próxima etapa. En 'end' no debe lanzar.
+    """
+    previous = getattr(_local, 'listener', None)
+    _local.listener = callback
+    try:
+        yield
+    finally:
+        _local.listener = previous
+
+
+@contextlib.contextmanager
+def stage(name: str, **fields):
+    """
+    Mide un bloque y al terminar emite {"event": "stage", "stage": name, ...} con la duración,
+    la RSS al final y su variación, el estado (ok/error), la etapa que la contiene (parent)
+    y los campos recibidos o agregados con `event.set(...)`, como rows_in y rows_out.
+    """
+    listener = getattr(_local, 'listener', None)
+    if listener is not None:
+        listener('start', name, dict(fields))
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    parent = stack[-1] if stack else None
+    event = StageEvent(name, dict(fields))
+    stack.append(name)
+    rss_before = current_rss_bytes()
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield event
+    except BaseException as e:
+        status = 'error'
+        event.set(error=str(e))
+        raise
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        stack.pop()
+        rss_after = current_rss_bytes()
+        record = dict(
+            stage=name,
+            parent=parent,
+            status=status,
+            duration_ms=round(duration_ms, 1),
+            rss_mb=round(rss_after / _MB, 1) if rss_after is not None else None,
+            rss_delta_mb=round((rss_after - rss_before) / _MB, 1) if None not in (rss_before, rss_after) else None,
+            **event.fields
+        )
+        emit_event('stage', **record)
+        if listener is not None:
+            listener('end', name, record)
+
+
+@contextlib.contextmanager
+def profiled(output_path: Optional[str]):
+    """
+    Perfila con cProfile todo lo que corra dentro del bloque y lo guarda en output_path:
+    un reporte de texto ordenado por tiempo acumulado si termina en .txt, o el archivo
+    binario de pstats (para snakeviz, pstats, etc.) en otro caso. Sin ruta no hace nada.
+    cProfile solo ve el hilo principal; las lecturas en hilos aparecen como esperas.
+    """
+    if not output_path:
+        yield
+        return
+
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        try:
+            if output_path.lower().endswith('.txt'):
+                with open(output_path, 'w', encoding='utf-8') as report:
+                    pstats.Stats(profiler, stream=report).sort_stats('cumulative').print_stats(80)
+            else:
+                profiler.dump_stats(output_path)
+            emit_event('profile', path=output_path)
+        except OSError as e:
+            print(f"Instrumentación: No se pudo guardar el perfil en {output_path}: {e}", file=sys.stderr)
@@ -0,0 +1,279 @@
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from core.instrumentation import stage_listener
+
+# Trabajos que corren a la vez en el worker; los demás esperan en cola. Cada uno usa una
+# conexión del pool (más una para la vista de IP), así que DB_POOL_SIZE debe cubrirlos.
+JOB_MAX_CONCURRENT = int(os.environ.get('JOB_MAX_CONCURRENT', '2'))
+
+CANCELLED_MESSAGE = "Solicitud cancelada."
+
+_local = threading.local()
+
+
+class JobCancelled(Exception):
+    """El trabajo en curso fue cancelado; se lanza en el siguiente punto de control."""
+
+
+class CancelToken:
+    """
+    Marca de cancelación de un trabajo. Quien hace algo que no puede cortarse desde adentro
+    (una consulta, un subproceso) registra con on_cancel cómo interrumpirlo; cancel() lo
+    llama desde el hilo que cancela.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Trabajos: No se pudo interrumpir el trabajo cancelado: {e}", file=sys.stderr)
+
+    def check(self) -> None:
+        if self.cancelled:
+            raise JobCancelled(CANCELLED_MESSAGE)
+
+    @contextlib.contextmanager
+    def on_cancel(self, callback: Callable[[], None]):
+        """Llama a callback si el trabajo se cancela mientras dura el bloque (o si ya lo estaba)."""
+        with self._lock:
+            self._callbacks.append(callback)
+            already_cancelled = self.cancelled
+        if already_cancelled:
+            callback()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._callbacks.remove(callback)
+
+
+class _JobContext:
+    def __init__(self, token: CancelToken, report: Callable[[dict], None]):
+        self.token = token
+        self.report = report
+
+
+def current_token() -> Optional[CancelToken]:
+    """Token del trabajo que corre en este hilo, o None fuera del planificador."""
+    context = getattr(_local, 'context', None)
+    return context.token if context is not None else None
+
+
+def check_cancelled() -> None:
+    """Punto de control: lanza JobCancelled si el trabajo de este hilo fue cancelado."""
+    token = current_token()
+    if token is not None:
+        token.check()
+
+
+def report_progress(**fields) -> None:
+    """Informa un evento de progreso a quienes esperan el trabajo de este hilo."""
+    context = getattr(_local, 'context', None)
+    if context is not None:
+        context.report(fields)
+
+
+@contextlib.contextmanager
+def job_scope(token: CancelToken, report: Callable[[dict], None] = lambda fields: None):
+    """
+    Corre el bloque como parte de un trabajo: check_cancelled, current_token y
+    report_progress lo ven en este hilo. Sirve también para que un hilo auxiliar (p. ej.
+    una lectura concurrente) quede bajo el mismo trabajo.
+    """
+    previous = getattr(_local, 'context', None)
+    _local.context = _JobContext(token, report)
+    try:
+        yield
+    finally:
+        _local.context = previous
+
+
+def run_subprocess_job(command: List[str], env: Optional[dict] = None) -> str:
+    """
+    Ejecuta un comando como parte del trabajo en curso y devuelve su stdout. Las líneas de
+    stderr que son eventos de etapa en JSON ({"event": "stage", ...}) se informan como
+    progreso; si el trabajo se cancela, el proceso se termina. Si el comando falla se lanza
+    ValueError con el "error" de su última línea JSON de stderr o, si no la hay, con su stderr.
+    """
+    process = subprocess.Popen(command, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, encoding='utf-8', errors='replace', env=env)
+    # stdout se lee en otro hilo para que ninguna de las dos tuberías se llene y bloquee al proceso.
+    stdout_parts: List[str] = []
+    reader = threading.Thread(target=lambda: stdout_parts.append(process.stdout.read()), daemon=True)
+    reader.start()
+
+    error_message, stderr_tail = None, []
+    token = current_token()
+    with token.on_cancel(process.terminate) if token is not None else contextlib.nullcontext():
+        for line in process.stderr:
+            try:
+                message = json.loads(line)
+            except ValueError:
+                message = None
+            if isinstance(message, dict) and message.get('event') == 'stage':
+                report_progress(**{key: value for key, value in message.items() if key != 'event'})
+            elif isinstance(message, dict) and 'error' in message:
+                error_message = message['error']
+            else:
+                stderr_tail = (stderr_tail + [line.rstrip()])[-20:]
+        process.wait()
+    reader.join()
+
+    check_cancelled()
+    if process.returncode != 0:
+        raise ValueError(error_message or "\n".join(stderr_tail)
+                         or f"El proceso terminó con código {process.returncode}")
+    return "".join(stdout_parts)
+
+
+class _Job:
+    def __init__(self, key: Optional[Hashable]):
+        self.key = key
+        self.token = CancelToken()
+        # (id de la solicitud, si pidió eventos de progreso), en el orden en que llegaron.
+        self.subscribers: List[tuple] = []
+        self.future = None
+
+
+class JobScheduler:
+    """
+    Planificador de las solicitudes del worker (main.py --worker):
+
+    - Single-flight: una solicitud con la misma clave que un trabajo en curso o en cola no
+      se ejecuta otra vez; se suma a ese trabajo y recibe su mismo resultado.
+    - Concurrencia acotada: como mucho max_concurrent trabajos corren a la vez, en un pool
+      de hilos; los demás esperan en cola en el orden en que llegaron.
+    - Progreso: cada etapa (core.instrumentation.stage) del trabajo se informa al empezar y
+      al terminar a las solicitudes que pidieron progreso, como {"id", "event": "progress", ...}.
+    - Cancelación: cancel(id) responde de inmediato a esa solicitud con un error de
+      cancelación. Si el trabajo se queda sin solicitudes que lo esperen se cancela su token:
+      si estaba en cola no llega a correr, y si ya corría se corta al empezar su próxima
+      etapa, en cada bloque de una lectura por bloques o interrumpiendo en el servidor la
+      consulta en curso (app.services.concurrent_reads.cancellable_queries).
+
+    Las respuestas ({"id", "result"} o {"id", "error"}) y los eventos salen por respond, que
+    se llama desde varios hilos y debe escribir cada mensaje completo de una vez.
+    """
+
+    def __init__(self, respond: Callable[[dict], None], max_concurrent: int = JOB_MAX_CONCURRENT):
+        self.respond = respond
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_concurrent), thread_name_prefix='job')
+        self._lock = threading.Lock()
+        self._jobs_by_key: Dict[Hashable, _Job] = {}
+        self._job_of: Dict[Any, _Job] = {}
+
+    def submit(self, request_id: Any, key: Optional[Hashable], fn: Callable[[], Any],
+               progress: bool = False) -> None:
+        """
+        Encola fn para responder a request_id. Con la misma key que un trabajo pendiente (no
+        cancelado) la solicitud se suma a ese trabajo; con key None siempre corre aparte.
+        """
+        with self._lock:
+            duplicate, coalesced = request_id is not None and request_id in self._job_of, False
+            if not duplicate:
+                job = self._jobs_by_key.get(key) if key is not None else None
+                coalesced = job is not None
+                if job is None:
+                    job = _Job(key)
+                    if key is not None:
+                        self._jobs_by_key[key] = job
+                job.subscribers.append((request_id, progress))
+                if request_id is not None:
+                    self._job_of[request_id] = job
+                if not coalesced:
+                    job.future = self._executor.submit(self._run, job, fn)
+        if duplicate:
+            self.respond({"id": request_id, "error": f"Ya hay una solicitud en curso con el id {request_id}."})
+        elif progress:
+            self.respond({"id": request_id, "event": "progress", "status": "coalesced" if coalesced else "queued"})
+
+    def cancel(self, request_id: Any) -> bool:
+        """
+        Cancela la solicitud request_id. Devuelve False si no hay una solicitud pendiente con
+        ese id (p. ej. porque ya terminó).
+        """
+        with self._lock:
+            job = self._job_of.pop(request_id, None)
+            if job is None:
+                return False
+            job.subscribers = [entry for entry in job.subscribers if entry[0] != request_id]
+            abandoned = not job.subscribers
+            if abandoned and self._jobs_by_key.get(job.key) is job:
+                # Una solicitud idéntica que llegue después empieza un trabajo nuevo.
+                del self._jobs_by_key[job.key]
+        self.respond({"id": request_id, "error": CANCELLED_MESSAGE, "cancelled": True})
+        if abandoned:
+            job.future.cancel()
+            job.token.cancel()
+        return True
+
+    def shutdown(self) -> None:
+        """Cancela las solicitudes pendientes y espera a que terminen los trabajos que ya corrían."""
+        with self._lock:
+            request_ids = list(self._job_of)
+        for request_id in request_ids:
+            self.cancel(request_id)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _report(self, job: _Job, fields: dict) -> None:
+        with self._lock:
+            listeners = [request_id for request_id, progress in job.subscribers if progress]
+        for request_id in listeners:
+            self.respond({"id": request_id, "event": "progress", **fields})
+
+    def _on_stage(self, job: _Job, phase: str, name: str, fields: dict) -> None:
+        if phase == 'start':
+            # Cada etapa que empieza es un punto de control de la cancelación.
+            job.token.check()
+            self._report(job, {"status": "started", "stage": name})
+        else:
+            self._report(job, fields)
+
+    def _run(self, job: _Job, fn: Callable[[], Any]) -> None:
+        response = None
+        try:
+            if not job.token.cancelled:
+                self._report(job, {"status": "running"})
+                with job_scope(job.token, lambda fields: self._report(job, fields)), \
+                        stage_listener(lambda phase, name, fields: self._on_stage(job, phase, name, fields)):
+                    response = {"result": fn()}
+        except Exception as e:
+            # Un error después de cancelar (p. ej. la consulta interrumpida) es la cancelación misma.
+            if not job.token.cancelled:
+                response = {"error": str(e)}
+        finally:
+            with self._lock:
+                if self._jobs_by_key.get(job.key) is job:
+                    del self._jobs_by_key[job.key]
+                subscribers, job.subscribers = job.subscribers, []
+                for request_id, _ in subscribers:
+                    if self._job_of.get(request_id) is job:
+                        del self._job_of[request_id]
+
+        if response is None:
+            return
+        if "error" in response:
+            ids = ", ".join(str(request_id) for request_id, _ in subscribers)
+            print(f"Trabajos: Error en la solicitud {ids}: {response['error']}", file=sys.stderr)
+        for request_id, _ in subscribers:
+            self.respond({"id": request_id, **response})
@@ -0,0 +1,125 @@
+import os
+from typing import List, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Filas estimadas de un cruce a partir de las cuales se cruza por tandas de fechas en vez de
+# en un solo merge, y a partir de las cuales se rechaza el cruce antes de hacerlo.
+JOIN_CHUNK_ROWS = int(os.environ.get('JOIN_CHUNK_ROWS', '5000000'))
+JOIN_MAX_ROWS = int(os.environ.get('JOIN_MAX_ROWS', '50000000'))
+
+
+def _joint_codes(left: pd.Series, right: pd.Series):
+    """
+    Códigos enteros de una clave en ambos lados del cruce, con el mismo código para el mismo
+    valor y los nulos como un valor más (pd.merge también cruza nulo con nulo). Con dos
+    categóricas de iguales categorías se usan sus códigos; si no, se factorizan juntas.
+    Devuelve (códigos izquierda, códigos derecha, cantidad de códigos).
+    """
+    if (isinstance(left.dtype, pd.CategoricalDtype) and isinstance(right.dtype, pd.CategoricalDtype)
+            and left.cat.categories.equals(right.cat.categories)):
+        return (left.cat.codes.to_numpy(np.int64) + 1, right.cat.codes.to_numpy(np.int64) + 1,
+                len(left.cat.categories) + 1)
+    codes, uniques = pd.factorize(pd.concat([left.astype(object), right.astype(object)], ignore_index=True),
+                                  use_na_sentinel=False)
+    return codes[:len(left)].astype(np.int64), codes[len(left):].astype(np.int64), len(uniques)
+
+
+def _composite_codes(left_keys: Sequence[pd.Series], right_keys: Sequence[pd.Series]):
+    """
+    Un código entero por combinación de claves, igual en ambos lados. Devuelve (códigos
+    izquierda, códigos derecha, cantidad de códigos).
+    """
+    left_codes = np.zeros(len(left_keys[0]), dtype=np.int64)
+    right_codes = np.zeros(len(right_keys[0]), dtype=np.int64)
+    size = 1
+    for left, right in zip(left_keys, right_keys):
+        left_part, right_part, part_size = _joint_codes(left, right)
+        left_codes = left_codes * part_size + left_part
+        right_codes = right_codes * part_size + right_part
+        size *= part_size
+        if size > 4 * (len(left_codes) + len(right_codes)) + 1024:
+            # Se renumeran las combinaciones presentes, así los conteos ocupan según las filas y
+            # no según todas las combinaciones posibles.
+            uniques, inverse = np.unique(np.concatenate([left_codes, right_codes]), return_inverse=True)
+            left_codes, right_codes, size = inverse[:len(left_codes)], inverse[len(left_codes):], len(uniques)
+    return left_codes, right_codes, size
+
+
+def estimate_join(left_keys: Sequence[pd.Series], right_keys: Sequence[pd.Series]) -> dict:
+    """
+    Filas que dará un inner join por esas claves, sin hacerlo: por cada clave, las filas de
+    la izquierda por las de la derecha. Solo cuenta filas por clave en cada lado (con los
+    códigos enteros de las claves), así que su costo no depende del tamaño del resultado.
+
+    Devuelve {rows, keys, max_left_per_key, max_right_per_key}: el total (exacto para un
+    inner join por igualdad), las claves presentes en ambos lados y las filas máximas por
+    clave de cada lado, que muestran de dónde viene la multiplicación.
+    """
+    left_codes, right_codes, size = _composite_codes(left_keys, right_keys)
+    left_counts = np.bincount(left_codes, minlength=size)
+    right_counts = np.bincount(right_codes, minlength=size)
+    both = (left_counts > 0) & (right_counts > 0)
+    return {
+        "rows": int((left_counts[both] * right_counts[both]).sum()),
+        "keys": int(both.sum()),
+        "max_left_per_key": int(left_counts[both].max()) if both.any() else 0,
+        "max_right_per_key": int(right_counts[both].max()) if both.any() else 0,
+    }
+
+
+def join_row_weights(left_keys: Sequence[pd.Series], right_keys: Sequence[pd.Series]) -> np.ndarray:
+    """
+    Filas que aporta al inner join cada fila de la derecha: las de la izquierda con su misma
+    clave. Sumadas por tanda o por partición dan sus filas sin hacer el cruce.
+    """
+    left_codes, right_codes, size = _composite_codes(left_keys, right_keys)
+    return np.bincount(left_codes, minlength=size)[right_codes]
+
+
+def date_chunks(dates: pd.Series, row_weights: np.ndarray, max_rows: int) -> List[np.ndarray]:
+    """
+    Reparte las filas de un lado del cruce (p. ej. el cronograma) en tandas de días completos
+    cuyo peso sumado no pase de max_rows; row_weights es cuántas filas dará cada una al
+    cruzarse. Un día que solo ya supera max_rows queda en su propia tanda. Devuelve las
+    posiciones de las filas de cada tanda, en su orden original.
+    """
+    days = pd.to_datetime(dates).dt.normalize().to_numpy()
+    order = np.argsort(days, kind='stable')
+    sorted_days = days[order]
+    day_starts = np.flatnonzero(np.r_[True, sorted_days[1:] != sorted_days[:-1]])
+    day_weights = np.add.reduceat(np.asarray(row_weights, dtype=np.int64)[order], day_starts) \
+        if len(order) else np.array([], dtype=np.int64)
+
+    chunks, chunk_start, chunk_weight = [], 0, 0
+    for i, weight in enumerate(day_weights):
+        if chunk_weight and chunk_weight + weight > max_rows:
+            chunks.append(np.sort(order[day_starts[chunk_start]:day_starts[i]]))
+            chunk_start, chunk_weight = i, 0
+        chunk_weight += weight
+    if len(day_weights):
+        chunks.append(np.sort(order[day_starts[chunk_start]:]))
+    return chunks
+
+
+def code_groups(codes: np.ndarray, size: int):
+    """
+    Agrupa filas por el código de su clave categórica (-1 para los nulos, que pd.merge también
+    cruza entre sí). Devuelve (orden, límites): las filas del código c son
+    orden[límites[c + 1]:límites[c + 2]] y las de clave nula orden[límites[0]:límites[1]].
+    Se ordena una sola vez; después cada consulta cuesta según las filas que devuelve.
+    """
+    shifted = codes.astype(np.int64) + 1
+    order = np.argsort(shifted, kind='stable')
+    bounds = np.searchsorted(shifted[order], np.arange(size + 2))
+    return order, bounds
+
+
+def rows_for_codes(groups, codes: np.ndarray) -> np.ndarray:
+    """Posiciones, en su orden original, de las filas de code_groups con alguno de esos códigos."""
+    order, bounds = groups
+    selected = np.unique(codes.astype(np.int64) + 1)
+    if not len(selected):
+        return np.array([], dtype=np.int64)
+    return np.sort(np.concatenate([order[bounds[code]:bounds[code + 1]] for code in selected]))
@@ -0,0 +1,169 @@
+import json
+import os
+import sys
+import time
+import uuid
+from typing import Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.file_utils import FileUtils
+
+# Índices en disco de clientes por nodo: las filas ordenadas por nodo y una tabla con el rango
+# de filas de cada nodo, para leer solo los clientes de los nodos de un cronograma.
+NODE_INDEX_DIR = os.environ.get('NODE_INDEX_DIR') or FileUtils.get_app_data_dir('node_index')
+NODE_INDEX_ENABLED = os.environ.get('NODE_INDEX_ENABLED', '1') != '0'
+NODE_INDEX_MAX_AGE_DAYS = float(os.environ.get('NODE_INDEX_MAX_AGE_DAYS', '7'))
+
+# Posición de cada fila en el origen; con ella una consulta devuelve las filas en su orden original.
+_ROW_COLUMN = '__row'
+
+
+class NodeIndex:
+    """
+    Índice persistente de un conjunto de filas por su clave de nodo, en dos archivos Arrow
+    IPC sin comprimir que se abren con memory mapping:
+
+    - '<name>-<marca>.rows.arrow': las filas ordenadas por nodo (estable, así dentro de cada
+      nodo conservan su orden) y su posición en el origen.
+    - '<name>-<marca>.offsets.arrow': una fila por nodo con el rango [start, stop) de sus filas.
+
+    Un archivo de metadatos '<name>.json' apunta a los archivos vigentes y guarda la firma del
+    origen con que se construyeron; si el origen cambia el índice deja de servir y se
+    reconstruye. Cada construcción escribe archivos nuevos y recién después actualiza los
+    metadatos, igual que SnapshotStore, así nunca se reemplaza un archivo mapeado por otro
+    proceso. Una consulta solo toca las páginas de los rangos pedidos: su costo depende de
+    cuántas filas devuelve, no del tamaño del origen.
+    """
+
+    def __init__(self, name: str, directory: str = NODE_INDEX_DIR, enabled: bool = NODE_INDEX_ENABLED,
+                 max_age_days: float = NODE_INDEX_MAX_AGE_DAYS):
+        self.name = name
+        self.directory = directory
+        self.enabled = enabled
+        self.max_age_seconds = max_age_days * 86400
+
+    @property
+    def available(self) -> bool:
+        """El índice requiere pyarrow; sin él se filtra el origen completo como siempre."""
+        if not self.enabled:
+            return False
+        try:
+            import pyarrow.feather  # noqa: F401
+        except ImportError:
+            return False
+        return True
+
+    def _meta_path(self) -> str:
+        return os.path.join(self.directory, f"{self.name}.json")
+
+    def read_meta(self) -> Optional[dict]:
+        try:
+            with open(self._meta_path(), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def is_current(self, source_signature: str) -> bool:
+        """Indica si hay un índice construido con ese mismo origen, sin abrirlo."""
+        if not self.available:
+            return False
+        meta = self.read_meta()
+        return meta is not None and meta['source'] == source_signature
+
+    def build(self, df: pd.DataFrame, key_column: str, source_signature: str) -> Optional[dict]:
+        """
+        Construye el índice de df por key_column y reemplaza el anterior. Las filas sin clave
+        no se guardan, porque ninguna consulta las pide. Devuelve los metadatos, o None si el
+        índice no está disponible o pyarrow no puede representar alguna columna (p. ej.
+        números y textos mezclados); en ese caso se sigue usando el origen completo.
+        """
+        if not self.available:
+            return None
+        import pyarrow as pa
+        from pyarrow import feather
+
+        keys = df[key_column]
+        if not isinstance(keys.dtype, pd.CategoricalDtype):
+            keys = keys.astype('category')
+        codes = keys.cat.codes.to_numpy()
+        positions = np.flatnonzero(codes >= 0)
+        order = positions[np.argsort(codes[positions], kind='stable')]
+        sorted_codes = codes[order]
+        present = np.unique(sorted_codes)
+        offsets = pd.DataFrame({
+            'node': pd.Series(keys.cat.categories[present], dtype=object).astype(str),
+            'start': np.searchsorted(sorted_codes, present, side='left').astype(np.int64),
+            'stop': np.searchsorted(sorted_codes, present, side='right').astype(np.int64),
+        })
+        try:
+            rows = pa.Table.from_pandas(df.iloc[order].assign(**{_ROW_COLUMN: order.astype(np.int64)}),
+                                        preserve_index=False)
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            print(f"NodeIndex: Cannot index {self.name}: {e}", file=sys.stderr)
+            return None
+
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune()
+            stamp = f"{int(time.time() * 1000)}-{uuid.uuid4().hex[:12]}"
+            rows_file, offsets_file = f"{self.name}-{stamp}.rows.arrow", f"{self.name}-{stamp}.offsets.arrow"
+            feather.write_feather(rows, os.path.join(self.directory, rows_file), compression='uncompressed')
+            feather.write_feather(offsets, os.path.join(self.directory, offsets_file), compression='uncompressed')
+
+            meta = {"name": self.name, "source": source_signature, "rows_file": rows_file,
+                    "offsets_file": offsets_file, "created_at": time.time(), "rows": rows.num_rows,
+                    "nodes": len(offsets)}
+            FileUtils.write_atomic(self._meta_path(), lambda f: f.write(json.dumps(meta).encode('utf-8')))
+        except OSError as e:
+            print(f"NodeIndex: Could not save index {self.name}: {e}", file=sys.stderr)
+            return None
+
+        for old_file in os.listdir(self.directory):
+            if old_file.startswith(f"{self.name}-") and old_file not in (rows_file, offsets_file):
+                try:
+                    os.remove(os.path.join(self.directory, old_file))
+                except OSError:
+                    # En Windows falla si otro proceso aún lo tiene mapeado; se reintenta en la próxima construcción.
+                    pass
+        return meta
+
+    def lookup(self, nodes: Iterable[str], source_signature: str) -> Optional[pd.DataFrame]:
+        """
+        Filas de los nodos pedidos, en su orden original y con las columnas con que se
+        construyó el índice. Devuelve None si no hay un índice vigente para ese origen.
+        """
+        if not self.available:
+            return None
+        meta = self.read_meta()
+        if meta is None or meta['source'] != source_signature:
+            return None
+        import pyarrow as pa
+        from pyarrow import feather
+
+        try:
+            offsets = feather.read_table(os.path.join(self.directory, meta['offsets_file']),
+                                         memory_map=True).to_pandas().set_index('node')
+            rows = feather.read_table(os.path.join(self.directory, meta['rows_file']), memory_map=True)
+        except (OSError, KeyError, pa.ArrowInvalid) as e:
+            print(f"NodeIndex: Ignoring unreadable index {self.name}: {e}", file=sys.stderr)
+            return None
+
+        ranges = offsets.loc[offsets.index.intersection(pd.Index(list(nodes), dtype=object))]
+        # Solo se convierten los rangos pedidos; el resto del archivo ni siquiera se lee del disco.
+        slices = [rows.slice(start, stop - start) for start, stop in zip(ranges['start'], ranges['stop'])]
+        df = pa.concat_tables(slices or [rows.slice(0, 0)]).to_pandas()
+        order = np.argsort(df[_ROW_COLUMN].to_numpy(), kind='stable')
+        return df.drop(columns=[_ROW_COLUMN]).iloc[order].reset_index(drop=True)
+
+    def _prune(self) -> None:
+        # Índices de archivos de clientes que ya no se usan (cada archivo tiene el suyo).
+        limit = time.time() - self.max_age_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,80 @@
+import re
+from typing import Callable, List
+
+import pandas as pd
+
+# Códigos de nodo que aparecen dentro de ZONA_GRUPO, por departamento.
+NODE_CODE_PATTERN = r'(SCZ\d+|LPZ\d+|SRE\d+|EAL\d+|PTS\d+|CBB\d+|TRJ\d+)'
+# Espacios que el servidor quita de la clave del nodo (ver compact_nodo_text): el espacio y los
+# que aparecen en datos pegados de Excel o de la web. str.strip() quita además otros espacios
+# Unicode poco comunes (U+2000 a U+200A, etc.); un nodo rodeado de esos no se encuentra al
+# filtrar en el servidor, aunque sí al leer la vista completa.
+SQL_WHITESPACE_CHARACTERS = ' \t\n\x0b\x0c\r\x85\xa0\u3000'
+_DROP_WHITESPACE = str.maketrans('', '', SQL_WHITESPACE_CHARACTERS)
+
+
+def normalize_nodo_text(nodo_text) -> str:
+    """
+    Limpia y estandariza un nombre de nodo: mayúsculas, sin la palabra 'NODO' y sin espacios.
+    Cualquier valor que no sea texto se convierte en ''.
+    """
+    if not isinstance(nodo_text, str):
+        return ''
+    return nodo_text.upper().replace('NODO', '').strip()
+
+
+def compact_nodo_text(nodo_text) -> str:
+    """
+    normalize_nodo_text sin ningún carácter de SQL_WHITESPACE_CHARACTERS, tampoco en medio.
+    Dos valores con la misma clave normalizada tienen la misma clave compacta, así que sirve
+    para preseleccionar clientes en el servidor, donde no hay un equivalente de strip().
+    """
+    return normalize_nodo_text(nodo_text).translate(_DROP_WHITESPACE)
+
+
+def map_distinct(values: pd.Series, transform: Callable[[pd.Series], pd.Series]) -> pd.Series:
+    """
+    Aplica `transform` solo a los valores distintos de la serie y reconstruye el resultado
+    con los códigos de factorize, como una serie categórica con categorías ordenadas.
+
+    `transform` recibe una serie con los valores únicos (incluido NaN si lo hay) y debe
+    devolver una serie de la misma longitud. El costo depende de la cantidad de valores
+    distintos, no de la cantidad de filas.
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    transformed = pd.Series(transform(pd.Series(uniques, dtype=object)).to_numpy(dtype=object))
+
+    # Varios valores crudos pueden normalizarse a la misma clave; los NaN quedan con código -1.
+    categories = sorted(transformed.dropna().unique())
+    unique_codes = pd.Index(categories, dtype=object).get_indexer(transformed)
+    return pd.Series(pd.Categorical.from_codes(unique_codes[codes], categories=categories),
+                     index=values.index, name=values.name)
+
+
+def normalize_nodo_key(values: pd.Series) -> pd.Series:
+    """Versión por columna de normalize_nodo_text; devuelve una clave categórica."""
+    return map_distinct(values, lambda uniques: uniques.map(normalize_nodo_text))
+
+
+def clean_text_key(values: pd.Series) -> pd.Series:
+    """Convierte a texto, quita espacios y pasa a mayúsculas cada valor distinto."""
+    return map_distinct(values, lambda uniques: uniques.astype(str).str.strip().str.upper())
+
+
+def extract_node_code(values: pd.Series) -> pd.Series:
+    """
+    Extrae el código de nodo (p. ej. 'SCZ012') de cada valor distinto de ZONA_GRUPO.
+    Los valores sin código quedan como NaN.
+    """
+    pattern = re.compile(NODE_CODE_PATTERN)
+    return map_distinct(
+        values, lambda uniques: uniques.astype(str).str.extract(pattern, expand=False).str.upper())
+
+
+def unify_categories(*keys: pd.Series) -> List[pd.Series]:
+    """
+    Da a varias claves categóricas las mismas categorías (la unión, ordenada), para que
+    pd.merge compare los códigos directamente en lugar de los textos.
+    """
+    categories = sorted(set().union(*(key.cat.categories for key in keys)))
+    return [key.cat.set_categories(categories) for key in keys]
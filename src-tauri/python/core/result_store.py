@@ -0,0 +1,161 @@
+import hashlib
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from core.file_utils import FileUtils
+
+# Resultados completos ya calculados, guardados en disco para paginar el preview sin recalcular
+# aunque cada página llegue en un proceso nuevo (como lo lanza la app de escritorio).
+RESULT_STORE_DIR = os.environ.get('RESULT_STORE_DIR') or FileUtils.get_app_data_dir('results')
+RESULT_STORE_ENABLED = os.environ.get('RESULT_STORE_ENABLED', '1') != '0'
+RESULT_STORE_MAX_AGE_HOURS = float(os.environ.get('RESULT_STORE_MAX_AGE_HOURS', '12'))
+
+_ATTRS_METADATA_KEY = b'result_attrs'
+
+
+class ResultStore:
+    """
+    Guarda un resultado por firma de solicitud (archivos de entrada, filtros y frescura de los
+    datos) en Feather sin comprimir, o con pickle si pyarrow no está o no puede representar
+    alguna columna. Junto al resultado guarda los órdenes de filas ya calculados para cada
+    criterio de orden, así una página siguiente solo lee el resultado y toma sus filas.
+    Los archivos más viejos que RESULT_STORE_MAX_AGE_HOURS se borran al guardar.
+    """
+
+    def __init__(self, directory: str = RESULT_STORE_DIR, enabled: bool = RESULT_STORE_ENABLED,
+                 max_age_hours: float = RESULT_STORE_MAX_AGE_HOURS):
+        self.directory = directory
+        self.enabled = enabled
+        self.max_age_seconds = max_age_hours * 3600
+
+    @staticmethod
+    def key_for(*parts) -> str:
+        """Clave de archivo para una firma de solicitud."""
+        return hashlib.sha1('|'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def file_signature(file_path: str) -> str:
+        """Firma barata de un archivo de entrada: cambia si cambian su ruta, mtime o tamaño."""
+        stat = os.stat(file_path)
+        return f"{os.path.abspath(file_path)}|{stat.st_mtime_ns}|{stat.st_size}"
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def contains(self, key: str) -> bool:
+        return self.enabled and any(os.path.exists(self._path(key, suffix)) for suffix in ('.arrow', '.pkl'))
+
+    def load(self, key: str) -> Optional[pd.DataFrame]:
+        """Devuelve el resultado guardado con esa clave, con sus attrs, o None si no hay."""
+        if not self.enabled:
+            return None
+        try:
+            if os.path.exists(self._path(key, '.arrow')):
+                from pyarrow import feather
+
+                table = feather.read_table(self._path(key, '.arrow'), memory_map=True)
+                df = table.to_pandas()
+                attrs = (table.schema.metadata or {}).get(_ATTRS_METADATA_KEY)
+                if attrs:
+                    df.attrs.update(json.loads(attrs))
+                return df
+            if os.path.exists(self._path(key, '.pkl')):
+                return pd.read_pickle(self._path(key, '.pkl'))
+        except Exception as e:
+            print(f"ResultStore: Ignoring unreadable result {key}: {e}", file=sys.stderr)
+        return None
+
+    def save(self, key: str, df: pd.DataFrame) -> None:
+        """Guarda el resultado; un fallo solo se informa, porque el resultado ya está calculado."""
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self._prune()
+        except OSError:
+            return
+        try:
+            import pyarrow as pa
+            from pyarrow import feather
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            metadata = dict(table.schema.metadata or {})
+            metadata[_ATTRS_METADATA_KEY] = json.dumps(df.attrs, default=str).encode('utf-8')
+            FileUtils.write_atomic(self._path(key, '.arrow'),
+                                   lambda stream: feather.write_feather(table.replace_schema_metadata(metadata),
+                                                                        stream, compression='uncompressed'))
+            return
+        except Exception:
+            pass
+        try:
+            FileUtils.write_atomic(self._path(key, '.pkl'), df.to_pickle)
+        except Exception as e:
+            print(f"ResultStore: Could not save result: {e}", file=sys.stderr)
+
+    def load_order(self, key: str, sort_key: str) -> Optional[np.ndarray]:
+        """Orden de filas guardado para el resultado y el criterio, mapeado en memoria."""
+        if not self.enabled:
+            return None
+        path = self._path(f"{key}-{self.key_for(sort_key)}", '.npy')
+        try:
+            return np.load(path, mmap_mode='r') if os.path.exists(path) else None
+        except (OSError, ValueError) as e:
+            print(f"ResultStore: Ignoring unreadable order {path}: {e}", file=sys.stderr)
+            return None
+
+    def save_order(self, key: str, sort_key: str, positions: np.ndarray) -> None:
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            FileUtils.write_atomic(self._path(f"{key}-{self.key_for(sort_key)}", '.npy'),
+                                   lambda stream: np.save(stream, positions, allow_pickle=False))
+        except (OSError, ValueError) as e:
+            print(f"ResultStore: Could not save order: {e}", file=sys.stderr)
+
+    def clear(self) -> int:
+        """Borra todos los resultados y órdenes guardados y devuelve cuántos resultados había."""
+        if not os.path.isdir(self.directory):
+            return 0
+        removed = 0
+        for name in os.listdir(self.directory):
+            try:
+                os.remove(os.path.join(self.directory, name))
+                removed += not name.endswith('.npy')
+            except OSError:
+                pass
+        return removed
+
+    def _prune(self) -> None:
+        limit = time.time() - self.max_age_seconds
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                # En Windows falla si otro proceso aún lo tiene mapeado; se reintenta en el próximo guardado.
+                pass
+
+    @staticmethod
+    def sort_positions(df: pd.DataFrame, column: Optional[str], descending: bool = False,
+                       base_order: Optional[np.ndarray] = None) -> np.ndarray:
+        """
+        Posiciones de las filas de df ordenadas por column. El orden es estable: los empates
+        conservan base_order (o el orden de df) y los nulos van al final. Las columnas de
+        texto se comparan como texto aunque mezclen números y textos.
+        """
+        order = np.arange(len(df)) if base_order is None else np.asarray(base_order)
+        if column is None:
+            return order
+        values = df[column].iloc[order].reset_index(drop=True)
+        if values.dtype == object:
+            values = values.astype('string')
+        ranks = values.sort_values(ascending=not descending, kind='stable', na_position='last').index.to_numpy()
+        return order[ranks]
@@ -0,0 +1,97 @@
+import os
+import tempfile
+import time
+import uuid
+from typing import List
+
+import pandas as pd
+
+# Archivos Arrow IPC con resultados para el proceso que lanzó al backend. Quien los pide los
+# lee (o los mapea en memoria) y los puede borrar; los que queden se borran al escribir otro
+# después de RESULT_TRANSPORT_MAX_AGE_HOURS.
+RESULT_TRANSPORT_DIR = os.environ.get('RESULT_TRANSPORT_DIR') or os.path.join(tempfile.gettempdir(),
+                                                                              'python_backend_results')
+RESULT_TRANSPORT_MAX_AGE_HOURS = float(os.environ.get('RESULT_TRANSPORT_MAX_AGE_HOURS', '1'))
+# Filas máximas de una página que viaja como archivo; con JSON el límite es mucho menor.
+RESULT_TRANSPORT_MAX_ROWS = int(os.environ.get('RESULT_TRANSPORT_MAX_ROWS', '200000'))
+
+# 'json' devuelve las filas dentro de la respuesta; 'arrow' las escribe en un archivo y la
+# respuesta solo lleva su ruta y su esquema.
+RESULT_FORMATS = ('json', 'arrow')
+
+
+def validate_result_format(result_format: str) -> None:
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Unsupported result format '{result_format}'. Use one of: {', '.join(RESULT_FORMATS)}")
+
+
+def _to_arrow_table(df: pd.DataFrame):
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        # Columnas object que mezclan números y textos (p. ej. teléfonos): solo esas pasan a texto.
+        mixed = {column: df[column].astype('string') for column in df.columns
+                 if df[column].dtype == object and pd.api.types.infer_dtype(df[column], skipna=True).startswith('mixed')}
+        return pa.Table.from_pandas(df.assign(**mixed), preserve_index=False)
+
+
+def arrow_schema(table) -> List[dict]:
+    """Esquema de la tabla como lista de {name, type}, para describir el archivo sin abrirlo."""
+    return [{"name": field.name, "type": str(field.type)} for field in table.schema]
+
+
+def write_arrow_result(df: pd.DataFrame, directory: str = RESULT_TRANSPORT_DIR) -> dict:
+    """
+    Escribe df como archivo Arrow IPC sin comprimir (se puede abrir con memory mapping) y
+    devuelve el handle que viaja en la respuesta: {transport, path, rows, bytes, schema}.
+    Las columnas se escriben con su tipo (fechas como timestamp, categóricas como
+    diccionario), sin convertir cada celda a un objeto de Python.
+    """
+    try:
+        from pyarrow import ipc
+    except ImportError:
+        raise ValueError("The arrow result format requires pyarrow")
+
+    table = _to_arrow_table(df.reset_index(drop=True))
+    os.makedirs(directory, exist_ok=True)
+    _prune(directory)
+    path = os.path.join(directory, f"result-{os.getpid()}-{uuid.uuid4().hex}.arrow")
+    # Se escribe aparte y se renombra, así el lector nunca abre un archivo a medias.
+    tmp_path = f"{path}.tmp"
+    try:
+        with open(tmp_path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {
+        "transport": "arrow",
+        "path": path,
+        "rows": table.num_rows,
+        "bytes": os.path.getsize(path),
+        "schema": arrow_schema(table),
+    }
+
+
+def read_arrow_result(path: str) -> pd.DataFrame:
+    """Lee un archivo escrito por write_arrow_result, con memory mapping."""
+    import pyarrow as pa
+    from pyarrow import ipc
+
+    with pa.memory_map(path, 'r') as source:
+        return ipc.open_file(source).read_all().to_pandas()
+
+
+def _prune(directory: str) -> None:
+    limit = time.time() - RESULT_TRANSPORT_MAX_AGE_HOURS * 3600
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.getmtime(path) < limit:
+                os.remove(path)
+        except OSError:
+            # En Windows falla si el lector aún lo tiene mapeado; se reintenta en la próxima escritura.
+            pass
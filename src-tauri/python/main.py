@@ -3,6 +3,9 @@ import sys
 import os
 import json
 import argparse
+import multiprocessing
+import threading
+from typing import TYPE_CHECKING
 
 # Bloque de compatibilidad para PyInstaller (se mantiene igual)
 if getattr(sys, 'frozen', False):
@@ -15,43 +18,301 @@ else:
     application_path = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, application_path)
 
-from app.controllers.task_controller import TaskController
+from core.instrumentation import profiled
+from core.jobs import JobScheduler, run_subprocess_job
 
+# El controlador arrastra pandas, SQLAlchemy y el servicio; se importa recién en main(),
+# después de validar los argumentos, para que --help y los errores de uso respondan al instante.
+if TYPE_CHECKING:
+    from app.controllers.task_controller import TaskController
 
-def main():
+
+def build_parser() -> argparse.ArgumentParser:
     # 1. Configuración del analizador de argumentos actualizada
     parser = argparse.ArgumentParser(description="Ejecutor de tareas de automatización.")
 
-    parser.add_argument("--mode", required=True, choices=['preview', 'export'], help="Modo de ejecución de la tarea.")
-    parser.add_argument("--cronograma-path", required=True, help="Ruta al archivo Excel del cronograma.")
+    # En modo worker los argumentos de la tarea llegan por stdin, por eso no son obligatorios aquí.
+    parser.add_argument("--worker", action="store_true",
+                        help="Mantiene el proceso vivo atendiendo solicitudes JSON (una por línea) en stdin.")
+
+    parser.add_argument("--list-tasks", action="store_true",
+                        help="Imprime como JSON las tareas de Excel disponibles, con sus parámetros y columnas.")
+    parser.add_argument("--batch", metavar="JOBS_JSON",
+                        help="Ejecuta un lote de trabajos con una sola carga de clientes. JOBS_JSON es un archivo "
+                             "con una lista de objetos {mode, cronograma_path, ip_filter, output_path}.")
+    parser.add_argument("--mode", choices=['preview', 'export', 'refresh_snapshots'],
+                        help="Modo de ejecución de la tarea. 'refresh_snapshots' actualiza las copias locales de las vistas.")
+    parser.add_argument("--cronograma-path", help="Ruta al archivo Excel del cronograma.")
 
     # --- AÑADIMOS EL NUEVO ARGUMENTO PARA EL FILTRO DE IP ---
-    parser.add_argument("--ip-filter", required=True, choices=['with_ip', 'without_ip', 'all'],
+    parser.add_argument("--ip-filter", choices=['with_ip', 'without_ip', 'all'],
                         help="Filtro de tipo de IP.")
 
-    parser.add_argument("--output-path", help="Ruta de salida para guardar el reporte en modo export.")
+    parser.add_argument("--output-path", help="Ruta de salida para guardar el reporte en modo export "
+                             "(.xlsx, .csv, .csv.gz, .parquet o .zip).")
+    # --- Paginación y orden del preview ---
+    parser.add_argument("--offset", type=int, default=0, help="Primera fila de la página del preview.")
+    parser.add_argument("--limit", type=int, default=20, help="Filas por página del preview.")
+    parser.add_argument("--sort-by", help="Columna del preview por la que ordenar (p. ej. FECHA_TRABAJO).")
+    parser.add_argument("--sort-desc", action="store_true", help="Ordena la columna de --sort-by en forma descendente.")
+    parser.add_argument("--result-format", choices=['json', 'arrow'], default='json',
+                        help="Cómo devolver las filas del preview: dentro del JSON o en un archivo Arrow IPC "
+                             "(la respuesta lleva su ruta y su esquema en 'rows_file').")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Guarda un perfil cProfile de toda la ejecución (texto si PATH termina en .txt).")
+    return parser
+
+
+def run_task(controller: 'TaskController', mode: str, cronograma_path: str, ip_filter: str,
+             output_path: str = None, offset: int = 0, limit: int = 20, sort_by: str = None,
+             sort_desc: bool = False, result_format: str = 'json'):
+    """
+    Ejecuta una sola solicitud de preview o export sobre el controlador recibido.
+    Lo comparten el modo de una sola ejecución y el modo worker.
+    """
+    if mode == 'preview':
+        return controller.execute_preview(
+            cronograma_path=cronograma_path,
+            ip_filter=ip_filter,
+            offset=offset,
+            limit=limit,
+            sort_by=sort_by,
+            sort_desc=sort_desc,
+            result_format=result_format
+        )
+    elif mode == 'export':
+        if not output_path:
+            raise ValueError("El modo 'export' requiere el argumento --output-path.")
+        return controller.execute_export(
+            cronograma_path=cronograma_path,
+            ip_filter=ip_filter,
+            output_path=output_path
+        )
+    raise ValueError(f"Modo desconocido: {mode}")
+
+
+def handle_worker_request(controller: 'TaskController', request: dict):
+    """
+    Atiende una solicitud del modo worker. Además de 'preview' y 'export'
+    acepta 'ping' para comprobar que el proceso sigue vivo, 'invalidate_cache'
+    para descartar los resultados reutilizables, 'refresh_snapshots' para
+    actualizar las instantáneas locales de las vistas, 'batch' para ejecutar
+    la lista de trabajos de "jobs" con una sola carga de clientes y 'task' para
+    ejecutar una tarea de Excel (run_excel_task).
+    """
+    mode = request.get("mode")
+    if mode == 'ping':
+        return {"status": "ok"}
+    if mode == 'task':
+        return run_excel_task(request.get("task_name"), request.get("params", {}))
+    if mode == 'batch':
+        return run_batch(controller, request.get("jobs"))
+    if mode == 'invalidate_cache':
+        return controller.invalidate_cache()
+    if mode == 'refresh_snapshots':
+        return controller.refresh_snapshots()
+    # Se valida antes que los campos, para que un modo mal escrito no se informe como un campo faltante.
+    if mode not in ('preview', 'export'):
+        raise ValueError(f"Modo desconocido: {mode}")
+
+    for key in ("cronograma_path", "ip_filter"):
+        if not request.get(key):
+            raise ValueError(f"Falta el campo '{key}' en la solicitud.")
+    if request["ip_filter"] not in ('with_ip', 'without_ip', 'all'):
+        raise ValueError(f"Filtro de IP desconocido: {request['ip_filter']}")
+    for key in ("offset", "limit"):
+        if key in request and not isinstance(request[key], int):
+            raise ValueError(f"El campo '{key}' debe ser un entero.")
+
+    return run_task(
+        controller,
+        mode=mode,
+        cronograma_path=request["cronograma_path"],
+        ip_filter=request["ip_filter"],
+        output_path=request.get("output_path"),
+        offset=request.get("offset", 0),
+        limit=request.get("limit", 20),
+        sort_by=request.get("sort_by"),
+        sort_desc=bool(request.get("sort_desc", False)),
+        result_format=request.get("result_format", "json")
+    )
+
+
+def run_excel_task(task_name: str, params: dict):
+    """
+    Ejecuta una tarea de tasks/ con task_runner.py en un proceso aparte, con los mismos
+    argumentos que recibe por línea de comandos; así una solicitud cancelada termina el
+    proceso aunque esté leyendo un Excel. Devuelve lo que task_runner.py imprime: el JSON
+    del preview o el nombre del archivo exportado.
+    """
+    if not task_name or not isinstance(params, dict):
+        raise ValueError("Una solicitud 'task' requiere task_name y params (un objeto).")
+    if getattr(sys, 'frozen', False):
+        raise ValueError("Las tareas de Excel se ejecutan con task_runner.py, que no está incluido en el ejecutable.")
+    # Los eventos de etapa de task_runner.py llegan como progreso de la solicitud.
+    output = run_subprocess_job(
+        [sys.executable, os.path.join(application_path, 'task_runner.py'), task_name, json.dumps(params)],
+        env={**os.environ, 'STAGE_EVENTS_ENABLED': '1'})
+    try:
+        return json.loads(output)
+    except ValueError:
+        return output.strip()
+
+
+def run_batch(controller: 'TaskController', jobs):
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError("El lote debe ser una lista no vacía de trabajos.")
+    return controller.execute_batch(jobs)
+
+
+def load_batch_file(path: str) -> list:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ValueError(f"No se pudo leer el archivo de lote {path}: {e}")
+
+
+# Las respuestas y los eventos de progreso salen desde varios hilos; cada línea se escribe entera.
+_stdout_lock = threading.Lock()
+
+
+def write_response(response: dict):
+    line = json.dumps(response, ensure_ascii=False, default=str) + "\n"
+    with _stdout_lock:
+        sys.stdout.write(line)
+        sys.stdout.flush()
+
+
+def request_key(request: dict) -> str:
+    """Clave de single-flight: la solicitud sin su id ni la opción de progreso."""
+    return json.dumps({key: value for key, value in request.items() if key not in ("id", "progress")},
+                      sort_keys=True, default=str)
 
+
+def run_worker(controller: 'TaskController'):
+    """
+    Bucle de peticiones/respuestas en JSON lines sobre stdin/stdout.
+
+    Cada línea de entrada es un objeto como
+    {"id": 1, "mode": "preview", "cronograma_path": "...", "ip_filter": "all"}
+    (un preview acepta además "offset", "limit", "sort_by", "sort_desc" y "result_format") y cada línea de salida es {"id": 1, "result": ...} o {"id": 1, "error": "..."}.
+    El proceso termina con {"mode": "shutdown"} o al cerrarse stdin. El controlador,
+    el engine y su pool de conexiones se reutilizan entre solicitudes.
+
+    Las solicitudes se atienden con un JobScheduler: varias a la vez (JOB_MAX_CONCURRENT),
+    así que las respuestas pueden llegar en otro orden y se asocian por "id". Una solicitud
+    idéntica a otra pendiente espera el resultado de esa en vez de repetirla. Con
+    "progress": true la solicitud recibe además líneas {"id", "event": "progress", ...} con
+    cada etapa que empieza o termina. {"id": 2, "mode": "cancel", "target": 1} cancela la
+    solicitud 1: recibe {"id": 1, "error": "Solicitud cancelada.", "cancelled": true} y, si
+    nadie más espera ese trabajo, se detiene en su próxima etapa o consulta. 'ping',
+    'cancel' e 'invalidate_cache' se responden en el acto, aunque haya trabajos corriendo.
+    """
+    if sys.stdin is None or sys.stdout is None:
+        raise RuntimeError("El modo worker necesita stdin y stdout conectados.")
+
+    # En Windows las tuberías usan la página de códigos local; forzamos UTF-8 en ambos sentidos.
+    for stream in (sys.stdin, sys.stdout):
+        if hasattr(stream, "reconfigure"):
+            stream.reconfigure(encoding="utf-8")
+
+    controller.warm_up()
+    scheduler = JobScheduler(write_response)
+    write_response({"id": None, "result": {"status": "ready"}})
+
+    try:
+        for line in sys.stdin:
+            line = line.strip()
+            if not line:
+                continue
+
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("La solicitud debe ser un objeto JSON.")
+            except Exception as e:
+                write_response({"id": None, "error": f"Solicitud inválida: {e}"})
+                continue
+
+            request_id = request.get("id")
+            mode = request.get("mode")
+            if mode == 'shutdown':
+                scheduler.shutdown()
+                write_response({"id": request_id, "result": {"status": "bye"}})
+                return
+            if mode == 'cancel':
+                cancelled = scheduler.cancel(request.get("target"))
+                write_response({"id": request_id, "result": {"status": "cancelled" if cancelled else "not_found"}})
+                continue
+            if mode in ('ping', 'invalidate_cache'):
+                try:
+                    write_response({"id": request_id, "result": handle_worker_request(controller, request)})
+                except Exception as e:
+                    print(f"Worker: Error en la solicitud {request_id}: {e}", file=sys.stderr)
+                    write_response({"id": request_id, "error": str(e)})
+                continue
+
+            scheduler.submit(request_id, request_key(request),
+                             lambda request=request: handle_worker_request(controller, request),
+                             progress=bool(request.get("progress")))
+    finally:
+        scheduler.shutdown()
+
+
+def main():
+    parser = build_parser()
     args = parser.parse_args()
 
-    controller = TaskController()
+    if args.list_tasks:
+        # Solo lee el catálogo; no importa pandas ni los módulos de las tareas.
+        from tasks.registry import list_tasks
+
+        print(json.dumps(list_tasks(), ensure_ascii=False))
+        return
+
+    if not args.worker and not args.batch:
+        required = [("--mode", args.mode)]
+        if args.mode != 'refresh_snapshots':
+            required += [("--cronograma-path", args.cronograma_path), ("--ip-filter", args.ip_filter)]
+        for flag, value in required:
+            if not value:
+                parser.error(f"el argumento {flag} es obligatorio fuera del modo --worker")
+
     try:
-        # 2. Lógica actualizada para llamar al controlador con el nuevo filtro
-        if args.mode == 'preview':
-            result = controller.execute_preview(
-                cronograma_path=args.cronograma_path,
-                ip_filter=args.ip_filter
-            )
-        elif args.mode == 'export':
-            if not args.output_path:
-                raise ValueError("El modo 'export' requiere el argumento --output-path.")
-            result = controller.execute_export(
+        with profiled(args.profile):
+            from app.controllers.task_controller import TaskController
+
+            controller = TaskController()
+            if args.worker:
+                run_worker(controller)
+                return
+
+            if args.batch:
+                result = run_batch(controller, load_batch_file(args.batch))
+                print(json.dumps(result, ensure_ascii=False, default=str))
+                return
+
+            if args.mode == 'refresh_snapshots':
+                print(json.dumps(controller.refresh_snapshots(), ensure_ascii=False, default=str))
+                return
+
+            # 2. Lógica actualizada para llamar al controlador con el nuevo filtro
+            result = run_task(
+                controller,
+                mode=args.mode,
                 cronograma_path=args.cronograma_path,
                 ip_filter=args.ip_filter,
-                output_path=args.output_path
+                output_path=args.output_path,
+                offset=args.offset,
+                limit=args.limit,
+                sort_by=args.sort_by,
+                sort_desc=args.sort_desc,
+                result_format=args.result_format
             )
 
-        # 3. Imprimimos el resultado final como JSON
-        print(json.dumps(result, ensure_ascii=False, default=str))
+            # 3. Imprimimos el resultado final como JSON
+            print(json.dumps(result, ensure_ascii=False, default=str))
 
     except Exception as e:
         # En caso de cualquier error, lo imprimimos como un JSON de error
@@ -60,4 +321,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # Los lotes usan un pool de procesos; en el ejecutable de PyInstaller los hijos arrancan por aquí.
+    multiprocessing.freeze_support()
     main()
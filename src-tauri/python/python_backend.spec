@@ -16,7 +16,8 @@ a = Analysis(
         'pandas',
         'openpyxl',
         'pytds', # Usamos pytds como acordamos
-        'pandas._libs.tslibs.base'
+        'pandas._libs.tslibs.base',
+        'pyarrow.feather' # Instantáneas locales de las vistas (opcional)
     ],
     hookspath=[],
     hooksconfig={},
@@ -1,18 +1,215 @@
 import sys
 import json
-import pandas as pd
+import multiprocessing
 import os
 import tempfile
 
 from core.file_utils import FileUtils
-from tasks.clients_by_node import ClientsByNodeTask
+from core.instrumentation import profiled, stage
+# El catálogo no importa ninguna tarea: se importa solo la pedida, y recién después de validar
+# los argumentos, así listar tareas o un error de uso no esperan a que cargue pandas.
+from tasks.registry import list_tasks, load_task_class, validate_params
 
-TASKS = {
-    "clients_by_node": ClientsByNodeTask,
-}
+PREVIEW_ROWS = 20
+# Filas máximas por página cuando el preview se pide con offset/limit/sort_by.
+PREVIEW_MAX_PAGE_ROWS = 500
+
+
+def load_task(TaskClass, schedule_file: str, clients_file: str):
+    task = TaskClass()
+    with stage('task.load_schedule') as event:
+        task.load_schedule(schedule_file)
+        event.set(rows_out=len(task.schedule_df))
+    with stage('task.load_clients') as event:
+        task.load_clients(clients_file)
+        event.set(rows_out=len(task.clients_df))
+    return task
+
+
+def to_records(df) -> list:
+    import pandas as pd
+
+    df = df.copy()
+    # Convierte las columnas datetime a string
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].astype(str)
+    # Como object, para que los nulos de categóricas y strings de Arrow salgan como None.
+    df = df.astype(object)
+    return df.where(pd.notnull(df), None).to_dict(orient="records")
+
+
+def preview_page(task_name: str, TaskClass, schedule_file: str, clients_file: str, filter_b2b: str,
+                 offset: int, limit: int, sort_by: str = None, sort_desc: bool = False,
+                 result_format: str = "json") -> dict:
+    """
+    Una página del resultado completo de la tarea, ordenada por sort_by (una columna del
+    resultado) o en el orden de process(). El resultado se calcula una vez por archivos y
+    filtro y queda en disco, igual que cada orden pedido; como cada página llega en un
+    proceso nuevo, las siguientes solo leen el resultado y toman sus filas. Con
+    result_format='arrow' las filas van en un archivo Arrow IPC y la página puede ser mayor.
+    """
+    from core.result_store import ResultStore
+    from core.result_transport import RESULT_TRANSPORT_MAX_ROWS
+
+    max_page_rows = RESULT_TRANSPORT_MAX_ROWS if result_format == "arrow" else PREVIEW_MAX_PAGE_ROWS
+    if not isinstance(offset, int) or offset < 0:
+        raise ValueError("offset debe ser un entero no negativo")
+    if not isinstance(limit, int) or not 1 <= limit <= max_page_rows:
+        raise ValueError(f"limit debe ser un entero entre 1 y {max_page_rows}")
+    sort_desc = bool(sort_by) and sort_desc
+
+    store = ResultStore()
+    key = ResultStore.key_for(task_name, filter_b2b, ResultStore.file_signature(schedule_file),
+                              ResultStore.file_signature(clients_file))
+    with stage('task.preview_page', filter_b2b=filter_b2b, offset=offset, limit=limit,
+               sort_by=sort_by, sort_desc=sort_desc) as event:
+        result = store.load(key)
+        event.set(cache='disk' if result is not None else 'miss')
+        if result is None:
+            task = load_task(TaskClass, schedule_file, clients_file)
+            with stage('task.process', filter_b2b=filter_b2b,
+                       rows_in=len(task.clients_df), schedule_rows=len(task.schedule_df)) as process_event:
+                task.process(filter_b2b=filter_b2b)
+                process_event.set(rows_out=len(task.result_df))
+            result = task.result_df
+            store.save(key, result)
+
+        if sort_by is not None and sort_by not in result.columns:
+            raise ValueError(f"Columna de orden desconocida: {sort_by}. Use una de: {', '.join(result.columns)}")
+        sort_key = f"{sort_by or ''}|{'desc' if sort_desc else 'asc'}"
+        order = store.load_order(key, sort_key) if sort_by else None
+        if order is None:
+            order = ResultStore.sort_positions(result, sort_by, sort_desc)
+            if sort_by:
+                store.save_order(key, sort_key, order)
+        event.set(rows_out=len(order[offset:offset + limit]), total_rows=len(result))
+    return page_response(result, order, offset, limit, sort_by, sort_desc, result_format)
+
+
+def page_response(result, order, offset: int, limit: int, sort_by: str = None, sort_desc: bool = False,
+                  result_format: str = "json") -> dict:
+    page = result.iloc[order[offset:offset + limit]]
+    if result_format == "arrow":
+        from core.result_transport import write_arrow_result
+        rows = {"rows_file": write_arrow_result(page)}
+    else:
+        rows = {"rows": to_records(page)}
+    return {
+        **rows,
+        "offset": offset,
+        "limit": limit,
+        "total_rows": len(result),
+        "total_rows_exact": True,
+        "sort_by": sort_by,
+        "sort_desc": sort_desc,
+    }
+
+
+def export_path_for(task_name: str, output_format: str, suffix: str = "") -> str:
+    import pandas as pd
+
+    # Genera nombre de archivo único y lo guarda en temp
+    filename = f"{task_name}_resultado_{int(pd.Timestamp.now().timestamp())}{suffix}.{output_format}"
+    return os.path.join(tempfile.gettempdir(), filename)
+
+
+# --- Lotes: varios cronogramas o filtros con una sola carga del archivo de clientes ---
+_batch_clients = None
+_batch_client_nodes = None
+
+
+def _init_batch_worker(shared_clients) -> None:
+    global _batch_clients, _batch_client_nodes
+    _batch_clients, _batch_client_nodes = shared_clients, None
+
+
+def _run_batch_job(job: dict):
+    """
+    Un trabajo del lote, en un proceso del pool: carga su cronograma, toma de los clientes
+    compartidos solo los de sus nodos y genera su preview (primera página) o su export.
+    """
+    global _batch_client_nodes
+    from core.result_store import ResultStore
+
+    TaskClass = load_task_class(job["task_name"])
+    filter_b2b = job.get("filter_b2b", "all")
+    with stage('task.batch_job', mode=job["mode"], filter_b2b=filter_b2b) as event:
+        task = TaskClass()
+        with stage('task.load_schedule') as load_event:
+            task.load_schedule(job["schedule_file"])
+            load_event.set(rows_out=len(task.schedule_df))
+        # La clave de nodo de los clientes compartidos se lee una vez por proceso.
+        if _batch_client_nodes is None:
+            _batch_client_nodes = _batch_clients.column(TaskClass.CLIENT_NODE_COLUMN)
+        task.normalized_clients_df = _batch_clients.take(_batch_client_nodes.isin(task.schedule_nodes()).to_numpy())
+        with stage('task.process', filter_b2b=filter_b2b, rows_in=len(task.normalized_clients_df),
+                   schedule_rows=len(task.schedule_df)) as process_event:
+            task.process(filter_b2b=filter_b2b)
+            process_event.set(rows_out=len(task.result_df))
+        event.set(rows_out=len(task.result_df))
+
+        if job["mode"] == "export":
+            final_path = task.export_result(export_path_for(job["task_name"], job.get("output_format", "xlsx"),
+                                                            f"_{job['index']}"))
+            return os.path.basename(final_path)
+
+        # Queda en disco con la misma clave que preview_page, para las páginas siguientes.
+        store = ResultStore()
+        store.save(ResultStore.key_for(job["task_name"], filter_b2b, ResultStore.file_signature(job["schedule_file"]),
+                                       job["clients_signature"]), task.result_df)
+        return page_response(task.result_df, ResultStore.sort_positions(task.result_df, None), 0,
+                             job.get("limit", PREVIEW_ROWS))
+
+
+def run_batch_jobs(task_name: str, TaskClass, clients_file: str, jobs: list) -> dict:
+    """
+    Ejecuta los trabajos de un lote (schedule_path, filter_b2b, mode y, para exportar,
+    output_format) con un solo archivo de clientes. Los clientes se cargan y normalizan una
+    vez, se comparten con el pool de procesos (SharedFrame) y cada trabajo toma solo los
+    clientes de los nodos de su cronograma. Devuelve {"result": ...} o {"error": ...} por trabajo.
+    """
+    from core.batch import SharedFrame, run_batch
+    from core.result_store import ResultStore
+
+    if not hasattr(TaskClass, "normalize_clients"):
+        raise ValueError(f"La tarea {task_name} no admite lotes")
+    batch_jobs = []
+    for index, job in enumerate(jobs):
+        if not isinstance(job, dict) or not job.get("schedule_path"):
+            raise ValueError(f"El trabajo {index} del lote no tiene schedule_path")
+        if job.get("mode", "preview") not in ("preview", "export"):
+            raise ValueError(f"Modo desconocido en el trabajo {index}: {job.get('mode')}")
+        limit = job.get("limit", PREVIEW_ROWS)
+        if not isinstance(limit, int) or not 1 <= limit <= PREVIEW_MAX_PAGE_ROWS:
+            raise ValueError(f"limit debe ser un entero entre 1 y {PREVIEW_MAX_PAGE_ROWS}")
+        validate_params(task_name, {**job, "mode": job.get("mode", "preview")})
+        batch_jobs.append({**job, "index": index, "task_name": task_name, "mode": job.get("mode", "preview"),
+                           "schedule_file": FileUtils.get_temp_file_path_by_name(job["schedule_path"]),
+                           "clients_signature": ResultStore.file_signature(clients_file)})
+
+    with stage('task.batch', jobs=len(jobs)) as event:
+        task = TaskClass()
+        with stage('task.load_clients') as load_event:
+            task.load_clients(clients_file)
+            load_event.set(rows_out=len(task.clients_df))
+        with stage('task.normalize_clients', rows_in=len(task.clients_df)):
+            shared_clients = SharedFrame.create(task.normalize_clients())
+        del task
+        try:
+            results = run_batch(_run_batch_job, batch_jobs, _init_batch_worker, (shared_clients,))
+        finally:
+            shared_clients.remove()
+        event.set(errors=sum("error" in result for result in results))
+    return {"status": "success", "jobs": results}
 
 
 def main():
+    # Lista las tareas disponibles con sus parámetros y columnas, sin importar ninguna.
+    if sys.argv[1:] == ["--list"]:
+        print(json.dumps(list_tasks(), ensure_ascii=False))
+        return
+
     if len(sys.argv) < 3:
         print("Faltan argumentos", file=sys.stderr)
         sys.exit(1)
@@ -31,38 +228,77 @@ def main():
     filter_b2b = params.get("filter_b2b", "all")
     schedule_path = params.get("schedule_path")
     clients_path = params.get("clients_path")
+    # Ruta opcional para guardar un perfil cProfile de la ejecución.
+    profile_path = params.get("profile_path")
+    # Filas del preview dentro del JSON o en un archivo Arrow IPC (se responde su ruta).
+    result_format = params.get("result_format", "json")
 
-    if not schedule_path or not clients_path:
+    if mode == "batch":
+        if not clients_path or not isinstance(params.get("jobs"), list) or not params["jobs"]:
+            print(json.dumps({"error": "El modo batch requiere clients_path y una lista jobs"}), file=sys.stderr)
+            sys.exit(1)
+    elif not schedule_path or not clients_path:
         print(json.dumps({"error": "Faltan archivos schedule_path o clients_path"}), file=sys.stderr)
         sys.exit(1)
 
     # Lógica principal de la tarea
     try:
-        TaskClass = TASKS.get(task_name)
-        if TaskClass is None:
-            raise ValueError(f"Tarea desconocida: {task_name}")
+        validate_params(task_name, params)
+        TaskClass = load_task_class(task_name)
 
-        task = TaskClass()
-        task.load_schedule(FileUtils.get_temp_file_path_by_name(schedule_path))
-        task.load_clients(FileUtils.get_temp_file_path_by_name(clients_path))
-        task.process(filter_b2b=filter_b2b)
-
-        if mode == "export":
-            # Genera nombre de archivo único y lo guarda en temp
-            temp_dir = tempfile.gettempdir()
-            filename = f"{task_name}_resultado_{int(pd.Timestamp.now().timestamp())}.xlsx"
-            output_path = os.path.join(temp_dir, filename)
-            task.export_result(output_path)
-            print(filename)
-            return
-        else:
-            preview = task.get_preview(20)
-            # Convierte las columnas datetime a string
-            for col in preview.columns:
-                if pd.api.types.is_datetime64_any_dtype(preview[col]):
-                    preview[col] = preview[col].astype(str)
-            print(json.dumps(preview.where(pd.notnull(preview), None).to_dict(orient="records"), ensure_ascii=False))
-            return
+        schedule_file = FileUtils.get_temp_file_path_by_name(schedule_path) if schedule_path else None
+        clients_file = FileUtils.get_temp_file_path_by_name(clients_path)
+        with profiled(profile_path), stage('task_runner.run', task=task_name, mode=mode):
+            if mode == "batch":
+                print(json.dumps(run_batch_jobs(task_name, TaskClass, clients_file, params["jobs"]),
+                                 ensure_ascii=False))
+                return
+            elif mode == "export":
+                from core.export_utils import STREAMING_EXPORT_ENABLED
+
+                task = load_task(TaskClass, schedule_file, clients_file)
+                output_path = export_path_for(task_name, params.get("output_format", "xlsx"))
+                if STREAMING_EXPORT_ENABLED and hasattr(task, "export_by_date"):
+                    # Cruza y escribe una fecha por vez, sin armar el resultado completo.
+                    with stage('task.export', filter_b2b=filter_b2b, strategy='by_date') as event:
+                        final_path = task.export_by_date(output_path, filter_b2b=filter_b2b)
+                        event.set(path=final_path)
+                else:
+                    with stage('task.process', filter_b2b=filter_b2b,
+                               rows_in=len(task.clients_df), schedule_rows=len(task.schedule_df)) as event:
+                        task.process(filter_b2b=filter_b2b)
+                        event.set(rows_out=len(task.result_df))
+
+                    # Un XLSX demasiado grande se guarda en otro formato; se informa el nombre final.
+                    with stage('task.export', rows_in=len(task.result_df)) as event:
+                        final_path = task.export_result(output_path)
+                        event.set(path=final_path)
+                print(os.path.basename(final_path))
+                return
+            elif any(key in params for key in ("offset", "limit", "sort_by")):
+                page = preview_page(task_name, TaskClass, schedule_file, clients_file, filter_b2b,
+                                    offset=params.get("offset", 0), limit=params.get("limit", PREVIEW_ROWS),
+                                    sort_by=params.get("sort_by"), sort_desc=bool(params.get("sort_desc", False)),
+                                    result_format=result_format)
+                print(json.dumps(page, ensure_ascii=False))
+                return
+            else:
+                task = load_task(TaskClass, schedule_file, clients_file)
+                with stage('task.preview', filter_b2b=filter_b2b) as event:
+                    if hasattr(task, "preview_top"):
+                        # Solo calcula las filas que se muestran, no el resultado completo.
+                        preview, total, exact = task.preview_top(filter_b2b=filter_b2b, max_rows=PREVIEW_ROWS)
+                        event.set(total_rows=total, total_exact=exact)
+                    else:
+                        task.process(filter_b2b=filter_b2b)
+                        preview = task.get_preview(PREVIEW_ROWS)
+                    event.set(rows_out=len(preview))
+                if result_format == "arrow":
+                    from core.result_transport import write_arrow_result
+                    print(json.dumps(write_arrow_result(preview), ensure_ascii=False))
+                else:
+                    print(json.dumps(to_records(preview), ensure_ascii=False))
+                return
 
     except Exception as e:
         print(json.dumps({"error": str(e)}), file=sys.stderr)
@@ -70,4 +306,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # Los lotes usan un pool de procesos; en un ejecutable congelado los hijos arrancan por aquí.
+    multiprocessing.freeze_support()
     main()
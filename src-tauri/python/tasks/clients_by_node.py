@@ -1,63 +1,147 @@
+import multiprocessing
+import os
+
+import numpy as np
 import pandas as pd
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Tuple
+from core.dtypes import compact_frame, frame_memory_bytes
 from core.excel_utils import ExcelUtils
+from core.export_utils import STREAMING_EXPORT_BATCH_ROWS, ExportUtils, PartitionedWriter
 from core.file_utils import FileUtils
+from core.instrumentation import peak_rss_bytes, stage
+from core.join_estimate import (JOIN_MAX_ROWS, code_groups, date_chunks, estimate_join, join_row_weights,
+                                rows_for_codes)
+from core.node_index import NodeIndex
+from core.node_keys import clean_text_key, extract_node_code, map_distinct, unify_categories
+from core.result_store import ResultStore
+from tasks.registry import required_columns
+
+# Entrada de la tarea en tasks.registry, de donde salen sus columnas obligatorias.
+TASK_NAME = "clients_by_node"
+
+# Filas del cronograma de la primera tanda del preview; cada tanda siguiente es el doble.
+PREVIEW_SCHEDULE_BATCH_ROWS = 16
+# Procesos para el cruce en paralelo de process(): 1 lo hace en este proceso, 0 usa uno por CPU.
+PARALLEL_JOIN_WORKERS = int(os.environ.get('PARALLEL_JOIN_WORKERS', '1'))
+# Con menos clientes el cruce en un solo proceso tarda menos que arrancar el pool.
+PARALLEL_JOIN_MIN_ROWS = int(os.environ.get('PARALLEL_JOIN_MIN_ROWS', '1000000'))
+
+_MB = 1024 * 1024
 
 
 class ClientsByNodeTask:
+    # Columna de los clientes normalizados que se cruza con los nodos del cronograma.
+    CLIENT_NODE_COLUMN = "NODO_EXTRAIDO"
+
     def __init__(self):
         self.schedule_df: Optional[pd.DataFrame] = None
         self.clients_df: Optional[pd.DataFrame] = None
         self.result_df: Optional[pd.DataFrame] = None
+        # Clientes con las claves ya normalizadas y sin filtro B2B; sirven para varios process().
+        self.normalized_clients_df: Optional[pd.DataFrame] = None
 
     def load_schedule(self, file_path: str):
-        required_columns = [
-            "NODO_N", "FECHA TRABAJO", "DEPARTAMENTO"
-        ]
         FileUtils.validate_extension(file_path)
-        self.schedule_df = ExcelUtils.load_excel(file_path, required_columns)
+        self.schedule_df = compact_frame(
+            ExcelUtils.load_excel(file_path, required_columns(TASK_NAME, "schedule_path")),
+            categories=["NODO_N", "DEPARTAMENTO"],
+        )
 
     def load_clients(self, file_path: str):
-        required_columns = [
-            "CLIENTENRO", "CLIENTE_NOMBRE_COMPLETO", "ZONA_GRUPO",
-            "DEPARTAMENTO", "PRODUCTO_IP", "ES_B2B", "CLIENTE_TELEFONO"
-        ]
+        """
+        Carga el reporte de clientes. Si el cronograma ya está cargado y el archivo tiene un
+        índice por nodo vigente, solo lee del índice los clientes de los nodos del cronograma,
+        ya normalizados, sin abrir el Excel; los demás no cruzarían con ningún trabajo. Si no
+        hay índice, carga el archivo completo y construye el índice para la próxima vez.
+        """
         FileUtils.validate_extension(file_path)
-        self.clients_df = ExcelUtils.load_excel(file_path, required_columns)
+        index = NodeIndex(ResultStore.key_for(TASK_NAME, os.path.abspath(file_path)))
+        signature = f"{ResultStore.file_signature(file_path)}|{required_columns(TASK_NAME, 'clients_path')}"
+        if self.schedule_df is not None:
+            with stage('task.client_index_lookup') as event:
+                clients = index.lookup(self.schedule_nodes(), signature)
+                event.set(hit=clients is not None, rows_out=len(clients) if clients is not None else None)
+            if clients is not None:
+                # Las filas del índice ya tienen las claves normalizadas.
+                self.clients_df = self.normalized_clients_df = clients
+                return
 
-    def process(self, filter_b2b: Literal["all", "b2b", "b2c"] = "all"):
+        # Pocos valores distintos como categóricas, el número de cliente como entero y los
+        # textos largos (nombre y teléfono) como strings de Arrow.
+        self.clients_df = compact_frame(
+            ExcelUtils.load_excel(file_path, required_columns(TASK_NAME, "clients_path")),
+            categories=["ZONA_GRUPO", "DEPARTAMENTO", "PRODUCTO_IP", "ES_B2B"],
+            account_ids=["CLIENTENRO"],
+            strings=["CLIENTE_NOMBRE_COMPLETO", "CLIENTE_TELEFONO"],
+        )
+        self.normalized_clients_df = None
+        if index.available and not index.is_current(signature):
+            with stage('task.client_index_build', rows_in=len(self.clients_df)) as event:
+                meta = index.build(self.normalize_clients(), self.CLIENT_NODE_COLUMN, signature)
+                event.set(rows_out=meta["rows"] if meta else None, nodes=meta["nodes"] if meta else None)
+
+    def normalize_clients(self) -> pd.DataFrame:
         """
-        filter_b2b:
-            - "all": muestra todos
-            - "b2b": solo clientes B2B (ES_B2B == 1 o 'SI')
-            - "b2c": solo clientes B2C (ES_B2B == 0 o 'NO')
+        Normaliza las claves de los clientes (nodo, departamento y ES_B2B) una sola vez por
+        archivo cargado. El resultado no depende del filtro B2B, así que lo comparten todos
+        los process() y los trabajos de un lote con el mismo archivo de clientes.
         """
-        if self.schedule_df is None or self.clients_df is None:
-            raise ValueError("Both schedule and clients data must be loaded first.")
+        if self.normalized_clients_df is None:
+            if self.clients_df is None:
+                raise ValueError("Clients data must be loaded first.")
+            # Copia superficial: solo se reasignan columnas, no se modifican las cargadas.
+            clients = self.clients_df.copy(deep=False)
+            # Extraer código de nodo
+            clients["NODO_EXTRAIDO"] = extract_node_code(clients["ZONA_GRUPO"])
+            clients["DEPARTAMENTO"] = clean_text_key(clients["DEPARTAMENTO"])
+
+            # Normaliza columna ES_B2B a valores string
+            clients["ES_B2B"] = clean_text_key(clients["ES_B2B"])
+            self.normalized_clients_df = clients
+        return self.normalized_clients_df
 
-        schedule = self.schedule_df.copy()
-        clients = self.clients_df.copy()
+    def schedule_nodes(self) -> List[str]:
+        """Nodos del cronograma cargado, normalizados igual que CLIENT_NODE_COLUMN."""
+        if self.schedule_df is None:
+            raise ValueError("Schedule data must be loaded first.")
+        return list(clean_text_key(self.schedule_df["NODO_N"]).cat.categories)
 
-        schedule["NODO_N"] = schedule["NODO_N"].astype(str).str.strip().str.upper()
-        schedule["DEPARTAMENTO"] = schedule["DEPARTAMENTO"].astype(str).str.strip().str.upper()
-        schedule["FECHA TRABAJO"] = pd.to_datetime(schedule["FECHA TRABAJO"], errors='coerce')
-        schedule = schedule[schedule["FECHA TRABAJO"].notnull()]
+    def _prepare(self, filter_b2b: str) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Normaliza las claves de ambos archivos y aplica el filtro B2B.
+        Devuelve (clientes, cronograma) listos para cruzarse con _join.
+        """
+        if self.schedule_df is None or (self.clients_df is None and self.normalized_clients_df is None):
+            raise ValueError("Both schedule and clients data must be loaded first.")
 
-        # Extraer código de nodo
-        clients["NODO_EXTRAIDO"] = clients["ZONA_GRUPO"].astype(str).str.extract(
-            r'(SCZ\d+|LPZ\d+|SRE\d+|EAL\d+|PTS\d+|CBB\d+|TRJ\d+)', expand=False).str.upper()
-        clients["DEPARTAMENTO"] = clients["DEPARTAMENTO"].astype(str).str.strip().str.upper()
+        with stage('task.normalize', schedule_rows=len(self.schedule_df)) as event:
+            schedule = self.schedule_df.copy(deep=False)
+            # Las claves se normalizan una vez por valor distinto y quedan como categóricas
+            schedule["NODO_N"] = clean_text_key(schedule["NODO_N"])
+            schedule["DEPARTAMENTO"] = clean_text_key(schedule["DEPARTAMENTO"])
+            schedule["FECHA TRABAJO"] = pd.to_datetime(schedule["FECHA TRABAJO"], errors='coerce')
+            schedule = schedule[schedule["FECHA TRABAJO"].notnull()]
 
-        # Normaliza columna ES_B2B a valores string
-        clients["ES_B2B"] = clients["ES_B2B"].astype(str).str.strip().str.upper()
+            # Copia superficial: las columnas que se reasignan abajo no tocan las normalizadas.
+            clients = self.normalize_clients().copy(deep=False)
+            event.set(rows_in=len(clients))
 
-        # Filtrar según el parámetro filter_b2b
-        if filter_b2b == "b2b":
-            clients = clients[clients["ES_B2B"].isin(["1", "SI", "TRUE", "YES"])]
-        elif filter_b2b == "b2c":
-            clients = clients[clients["ES_B2B"].isin(["0", "NO", "FALSE", ""])]
-            # Ajusta según tus datos reales
+            # Filtrar según el parámetro filter_b2b
+            if filter_b2b == "b2b":
+                clients = clients[clients["ES_B2B"].isin(["1", "SI", "TRUE", "YES"])]
+            elif filter_b2b == "b2c":
+                clients = clients[clients["ES_B2B"].isin(["0", "NO", "FALSE", ""])]
+                # Ajusta según tus datos reales
 
+            # Mismas categorías en ambos lados para que el merge compare códigos
+            clients["NODO_EXTRAIDO"], schedule["NODO_N"] = unify_categories(clients["NODO_EXTRAIDO"], schedule["NODO_N"])
+            clients["DEPARTAMENTO"], schedule["DEPARTAMENTO"] = unify_categories(
+                clients["DEPARTAMENTO"], schedule["DEPARTAMENTO"])
+            event.set(rows_out=len(clients), schedule_rows_out=len(schedule))
+        return clients, schedule
+
+    @staticmethod
+    def _join(clients: pd.DataFrame, schedule: pd.DataFrame) -> pd.DataFrame:
         # Merge usando nodo extraído y departamento
         merged = pd.merge(
             clients,
@@ -79,8 +163,205 @@ class ClientsByNodeTask:
             "CLIENTE_TELEFONO",
             "ES_B2B"
         ]].sort_values(by=["FECHA TRABAJO", "NODO_N", "CLIENTENRO"])
+        return result.reset_index(drop=True)
+
+    def process(self, filter_b2b: Literal["all", "b2b", "b2c"] = "all"):
+        """
+        filter_b2b:
+            - "all": muestra todos
+            - "b2b": solo clientes B2B (ES_B2B == 1 o 'SI')
+            - "b2c": solo clientes B2C (ES_B2B == 0 o 'NO')
+        """
+        clients, schedule = self._prepare(filter_b2b)
+        workers = self._join_workers(len(clients))
+        with stage('task.merge', rows_in=len(clients), schedule_rows=len(schedule), workers=workers) as event:
+            event.set(estimated_rows=self._check_join_size(clients, schedule)["rows"])
+            if workers > 1:
+                self.result_df = self._parallel_join(clients, schedule, workers)
+            else:
+                self.result_df = self._join(clients, schedule)
+            event.set(rows_out=len(self.result_df), **self.memory_report())
+
+    @staticmethod
+    def _check_join_size(clients: pd.DataFrame, schedule: pd.DataFrame) -> dict:
+        """
+        Estima las filas del cruce antes de hacerlo: un nodo con muchos clientes listado en
+        muchas fechas multiplica las filas. Falla si pasarían de JOIN_MAX_ROWS.
+        """
+        estimate = estimate_join([clients["NODO_EXTRAIDO"], clients["DEPARTAMENTO"]],
+                                 [schedule["NODO_N"], schedule["DEPARTAMENTO"]])
+        if estimate["rows"] > JOIN_MAX_ROWS:
+            raise ValueError(
+                f"The join would produce {estimate['rows']} rows, more than JOIN_MAX_ROWS ({JOIN_MAX_ROWS}). "
+                f"A node appears up to {estimate['max_right_per_key']} times in the schedule; "
+                f"check for repeated dates or split the schedule.")
+        return estimate
 
-        self.result_df = result.reset_index(drop=True)
+    @staticmethod
+    def _join_workers(client_rows: int) -> int:
+        """Procesos para el cruce: 1 con pocos clientes o si ya se corre dentro de un pool (lotes)."""
+        if client_rows < PARALLEL_JOIN_MIN_ROWS or multiprocessing.parent_process() is not None:
+            return 1
+        return PARALLEL_JOIN_WORKERS if PARALLEL_JOIN_WORKERS > 0 else (os.cpu_count() or 1)
+
+    @staticmethod
+    def _partition_nodes(client_codes: np.ndarray, schedule_codes: np.ndarray, n_nodes: int,
+                         partitions: int) -> np.ndarray:
+        """
+        Asigna cada nodo a una partición; todos los clientes y trabajos de un nodo caen en la
+        misma, así cada partición se cruza sola. Solo se reparten los nodos del cronograma, el
+        de más clientes primero a la partición con menos filas, para que ninguna quede mucho
+        más grande que las demás. Devuelve la partición de cada código de nodo (-1 si no se usa).
+        """
+        scheduled = np.zeros(n_nodes, dtype=bool)
+        scheduled[schedule_codes[schedule_codes >= 0]] = True
+        counts = np.bincount(client_codes[client_codes >= 0], minlength=n_nodes)
+        partition_of = np.full(n_nodes, -1, dtype=np.int64)
+        loads = np.zeros(partitions, dtype=np.int64)
+        for node in np.flatnonzero(scheduled)[np.argsort(-counts[scheduled], kind='stable')]:
+            target = int(np.argmin(loads))
+            partition_of[node] = target
+            loads[target] += counts[node]
+        return partition_of
+
+    def _parallel_join(self, clients: pd.DataFrame, schedule: pd.DataFrame, workers: int) -> pd.DataFrame:
+        """
+        El mismo resultado que _join, repartido en un pool de procesos. Ambos lados ya tienen
+        las claves normalizadas y las mismas categorías; se parten por nodo, cada lado se
+        ordena por partición y se escribe una vez en un SharedFrame, y cada proceso lee solo
+        el rango de su partición, la cruza con _join y devuelve su resultado también como
+        SharedFrame. Como cada partición sale ordenada y un par (fecha, nodo) está en una
+        sola, las salidas se intercalan por bloques sin volver a ordenar todas las filas.
+        """
+        from core.batch import SharedFrame, run_batch
+
+        client_codes = clients["NODO_EXTRAIDO"].cat.codes.to_numpy()
+        schedule_codes = schedule["NODO_N"].cat.codes.to_numpy()
+        partition_of = self._partition_nodes(client_codes, schedule_codes,
+                                             len(clients["NODO_EXTRAIDO"].cat.categories), workers)
+
+        def split(df: pd.DataFrame, codes: np.ndarray):
+            # Filas de cada partición contiguas y en su orden original; las de nodos sin partición se descartan.
+            partition = np.where(codes >= 0, partition_of[codes], -1)
+            order = np.flatnonzero(partition >= 0)
+            order = order[np.argsort(partition[order], kind='stable')]
+            bounds = np.searchsorted(partition[order], np.arange(workers + 1))
+            return SharedFrame.create(df.iloc[order]), bounds
+
+        shared_clients, client_bounds = split(clients, client_codes)
+        shared_schedule, schedule_bounds = split(schedule, schedule_codes)
+        jobs = [
+            {"clients": shared_clients, "schedule": shared_schedule,
+             "clients_range": (int(client_bounds[p]), int(client_bounds[p + 1])),
+             "schedule_range": (int(schedule_bounds[p]), int(schedule_bounds[p + 1]))}
+            for p in range(workers) if client_bounds[p] < client_bounds[p + 1]
+        ]
+        outputs = []
+        try:
+            results = run_batch(_join_partition, jobs, max_workers=workers)
+            outputs = [result["result"] for result in results if "result" in result]
+            errors = [result["error"] for result in results if "error" in result]
+            if errors:
+                raise ValueError(f"Parallel join failed: {errors[0]}")
+            parts = [output.slice(0, len(output)) for output in outputs]
+        finally:
+            for shared in [shared_clients, shared_schedule, *outputs]:
+                shared.remove()
+        if not parts:
+            return self._join(clients.iloc[:0], schedule)
+        return self._merge_sorted_partitions(parts)
+
+    @staticmethod
+    def _merge_sorted_partitions(parts: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        Intercala salidas de _join ya ordenadas en el orden que daría un solo _join. Cada
+        bloque de filas con la misma fecha y nodo viene entero de una partición, así que
+        basta ordenar los bloques (pocos) por fecha y nodo y concatenarlos en ese orden;
+        dentro de cada bloque las filas ya están en su orden final.
+        """
+        merged = pd.concat(parts, ignore_index=True)
+        if merged.empty:
+            return merged
+        fechas = merged["FECHA TRABAJO"].to_numpy()
+        nodes = merged["NODO_N"].cat.codes.to_numpy().astype(np.int64)
+        # Como en sort_values, los nulos van al final.
+        nodes[nodes < 0] = np.iinfo(np.int64).max
+
+        starts_block = np.ones(len(merged), dtype=bool)
+        starts_block[1:] = (fechas[1:] != fechas[:-1]) | (nodes[1:] != nodes[:-1])
+        part_starts = np.cumsum([len(part) for part in parts[:-1]], dtype=np.int64)
+        starts_block[part_starts[part_starts < len(merged)]] = True
+        starts = np.flatnonzero(starts_block)
+        lengths = np.diff(np.append(starts, len(merged)))
+
+        block_order = np.lexsort((nodes[starts], fechas[starts]))
+        block_starts, block_lengths = starts[block_order], lengths[block_order]
+        # Posición de origen de cada fila de salida: el inicio de su bloque más su lugar dentro de él.
+        positions = np.repeat(block_starts - (np.cumsum(block_lengths) - block_lengths), block_lengths)
+        positions += np.arange(len(merged))
+        return merged.take(positions).reset_index(drop=True)
+
+    def memory_report(self) -> dict:
+        """
+        Memoria de los DataFrames cargados y del resultado, y memoria máxima del proceso, en MB
+        y por millón de clientes, para comparar corridas con archivos de distinto tamaño.
+        """
+        clients = self.normalized_clients_df if self.normalized_clients_df is not None else self.clients_df
+        n_clients = len(clients) if clients is not None else 0
+        frames = sum(frame_memory_bytes(df) for df in (clients, self.schedule_df, self.result_df))
+        peak = peak_rss_bytes()
+
+        def per_million(value):
+            return round(value / _MB * 1_000_000 / n_clients, 1) if value is not None and n_clients else None
+
+        return {
+            'clients': n_clients,
+            'frames_mb': round(frames / _MB, 1),
+            'frames_mb_per_million_clients': per_million(frames),
+            'peak_rss_mb': round(peak / _MB, 1) if peak is not None else None,
+            'peak_rss_mb_per_million_clients': per_million(peak),
+        }
+
+    def preview_top(self, filter_b2b: Literal["all", "b2b", "b2c"] = "all",
+                    max_rows: int = 10) -> Tuple[pd.DataFrame, int, bool]:
+        """
+        Calcula solo las primeras max_rows filas del resultado de process(), sin cruzar ni
+        ordenar todos los clientes. Recorre el cronograma por fecha en tandas que se duplican
+        (cerrando cada tanda en un cambio de fecha) y cruza solo los clientes de esos nodos;
+        se detiene cuando ya hay max_rows filas, porque las fechas siguientes no pueden
+        adelantarse a ellas.
+
+        Devuelve (filas, total, exacto): el total es exacto si se recorrió todo el cronograma
+        y, si no, una estimación proporcional a las filas del cronograma recorridas.
+        """
+        clients, schedule = self._prepare(filter_b2b)
+        with stage('task.preview_top', rows_in=len(clients), schedule_rows=len(schedule),
+                   max_rows=max_rows) as event:
+            schedule = schedule.sort_values("FECHA TRABAJO", kind="stable")
+            fechas = schedule["FECHA TRABAJO"].to_numpy()
+            # Ambas claves comparten categorías, así que basta comparar los códigos de nodo.
+            # El último lugar de la tabla corresponde al código -1 (cliente sin nodo).
+            client_nodes = clients["NODO_EXTRAIDO"].cat.codes.to_numpy()
+            visited_nodes = np.zeros(len(clients["NODO_EXTRAIDO"].cat.categories) + 1, dtype=bool)
+
+            end, batch_rows = 0, PREVIEW_SCHEDULE_BATCH_ROWS
+            while True:
+                end = min(len(schedule), end + batch_rows)
+                # La tanda termina en un cambio de fecha para que sus filas ya sean definitivas.
+                while 0 < end < len(schedule) and fechas[end] == fechas[end - 1]:
+                    end += 1
+                visited = schedule.iloc[:end]
+                visited_nodes[visited["NODO_N"].cat.codes.to_numpy()] = True
+                result = self._join(clients[visited_nodes[client_nodes]], visited)
+                if len(result) >= max_rows or end >= len(schedule):
+                    break
+                batch_rows *= 2
+
+            exact = end >= len(schedule)
+            total = len(result) if exact else round(len(result) * len(schedule) / end)
+            event.set(rows_out=min(max_rows, len(result)), schedule_rows_visited=end,
+                      total_rows=total, total_exact=exact)
+        return result.head(max_rows), total, exact
 
     def get_preview(self, max_rows: int = 10) -> pd.DataFrame:
         if self.result_df is None:
@@ -91,20 +372,70 @@ class ClientsByNodeTask:
         if self.result_df is None:
             raise ValueError("No result to export. Did you run process()?")
 
-        FileUtils.validate_extension(output_path)
+        ExportUtils.detect_format(output_path)
 
-        df = self.result_df.copy()
-        df["FECHA_STR"] = df["FECHA TRABAJO"].dt.strftime("%d-%m-%Y")
-        df["MES_ANIO"] = df["FECHA TRABAJO"].dt.strftime("%B %Y")
+        mes_anio = self._month_keys(self.result_df["FECHA TRABAJO"])
+        final_path, _ = ExportUtils.save_partitioned(
+            self.result_df,
+            output_path,
+            partition_keys=mes_anio,
+            partition_name_for=lambda mes: mes[:31],
+            columns=list(self.result_df.columns)
+        )
+        return final_path  # Debe ser la ruta absoluta, NO los datos
+
+    @staticmethod
+    def _month_keys(fechas: pd.Series) -> pd.Series:
+        # Una partición por mes; el nombre del mes se formatea una vez por fecha distinta, no por fila.
+        return map_distinct(fechas, lambda distintas: pd.to_datetime(distintas).dt.strftime("%B %Y"))
+
+    def export_by_date(self, output_path: str, filter_b2b: Literal["all", "b2b", "b2c"] = "all") -> str:
+        """
+        El mismo archivo que process() seguido de export_result(), sin armar el resultado
+        completo. Recorre las particiones del export (meses) y, dentro de cada una, los días
+        del cronograma en orden, en tandas de días completos de hasta
+        STREAMING_EXPORT_BATCH_ROWS filas cruzadas: cada tanda cruza solo los clientes de sus
+        nodos con _join y se agrega a la hoja del mes antes de pasar a la siguiente. Como
+        _join ordena por fecha, las filas quedan en el mismo orden que en process(). La
+        memoria queda acotada por los clientes cargados más la tanda o el día más grande.
+        No deja result_df.
+        """
+        ExportUtils.detect_format(output_path)
+        clients, schedule = self._prepare(filter_b2b)
+        with stage('task.export_by_date', rows_in=len(clients), schedule_rows=len(schedule)) as event:
+            estimate = self._check_join_size(clients, schedule)
+            weights = join_row_weights([clients["NODO_EXTRAIDO"], clients["DEPARTAMENTO"]],
+                                       [schedule["NODO_N"], schedule["DEPARTAMENTO"]])
+            mes_anio = self._month_keys(schedule["FECHA TRABAJO"])
+            largest_month = int(pd.Series(weights).groupby(mes_anio.to_numpy()).sum().max()) \
+                if len(schedule) else 0
+            final_path, output_format = ExportUtils.resolve_format(output_path, estimate["rows"], largest_month)
 
-        with pd.ExcelWriter(output_path) as writer:
-            for mes, group in df.groupby("MES_ANIO"):
-                sheet_name = mes[:31]
-                group.drop(columns=["FECHA_STR", "MES_ANIO"], inplace=True)
-                group.to_excel(writer, sheet_name=sheet_name, index=False)
-        return output_path  # Debe ser la ruta absoluta, NO los datos
+            sample = self._join(clients.iloc[:0], schedule.iloc[:0])
+            clients_by_node = code_groups(clients["NODO_EXTRAIDO"].cat.codes.to_numpy(),
+                                          len(clients["NODO_EXTRAIDO"].cat.categories))
+            with PartitionedWriter(final_path, output_format, sample, list(sample.columns)) as writer:
+                for mes, month_positions in ExcelUtils.iter_partitions(mes_anio):
+                    month = schedule.iloc[month_positions]
+                    for batch in date_chunks(month["FECHA TRABAJO"], weights[month_positions],
+                                             STREAMING_EXPORT_BATCH_ROWS):
+                        days = month.iloc[batch]
+                        batch_clients = rows_for_codes(clients_by_node, days["NODO_N"].cat.codes.to_numpy())
+                        writer.write(mes[:31], self._join(clients.iloc[batch_clients], days))
+            event.set(rows_out=writer.rows_written, partitions=writer.partitions,
+                      largest_partition_rows=largest_month, format=output_format)
+        return final_path
 
     def get_result_columns(self) -> List[str]:
         if self.result_df is None:
             return []
         return list(self.result_df.columns)
+
+
+def _join_partition(job: dict):
+    """Cruza una partición en un proceso del pool y deja su resultado en un SharedFrame."""
+    from core.batch import SharedFrame
+
+    clients = job["clients"].slice(*job["clients_range"])
+    schedule = job["schedule"].slice(*job["schedule_range"])
+    return SharedFrame.create(ClientsByNodeTask._join(clients, schedule))
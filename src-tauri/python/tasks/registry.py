@@ -0,0 +1,82 @@
+import importlib
+from typing import Dict, List
+
+# Catálogo de tareas de automatización. Cada tarea declara aquí, sin importar su módulo, lo
+# que hace falta para listarla y validar una ejecución:
+#
+# - target: "módulo:Clase" que se importa recién al ejecutarla (el módulo suele cargar pandas).
+# - display_name / description: textos para la lista de tareas de la app.
+# - inputs: archivo de entrada -> columnas obligatorias; el módulo de la tarea las lee de aquí.
+# - params: parámetro -> {default, choices, description}.
+# - modes: modos de ejecución que admite la tarea.
+#
+# Para agregar una tarea basta con su módulo en tasks/ y una entrada en este diccionario;
+# este archivo no debe importar pandas ni los módulos de las tareas.
+TASKS: Dict[str, dict] = {
+    "clients_by_node": {
+        "target": "tasks.clients_by_node:ClientsByNodeTask",
+        "display_name": "Clientes por Nodo (Excel)",
+        "description": "Cruza el reporte de clientes con el cronograma de trabajos por nodo y departamento.",
+        "inputs": {
+            "schedule_path": ["NODO_N", "FECHA TRABAJO", "DEPARTAMENTO"],
+            "clients_path": [
+                "CLIENTENRO", "CLIENTE_NOMBRE_COMPLETO", "ZONA_GRUPO",
+                "DEPARTAMENTO", "PRODUCTO_IP", "ES_B2B", "CLIENTE_TELEFONO"
+            ],
+        },
+        "params": {
+            "filter_b2b": {
+                "default": "all", "choices": ["all", "b2b", "b2c"],
+                "description": "Clientes a incluir: todos, solo B2B o solo B2C.",
+            },
+            "output_format": {
+                "default": "xlsx", "choices": ["xlsx", "csv", "csv.gz", "parquet", "zip"],
+                "description": "Formato del archivo exportado.",
+            },
+            "result_format": {
+                "default": "json", "choices": ["json", "arrow"],
+                "description": "Cómo devolver las filas del preview: en el JSON o en un archivo Arrow.",
+            },
+        },
+        "modes": ["preview", "export", "batch"],
+    },
+}
+
+
+def get_task_info(task_name: str) -> dict:
+    """Metadatos de una tarea del catálogo."""
+    info = TASKS.get(task_name)
+    if info is None:
+        raise ValueError(f"Tarea desconocida: {task_name}")
+    return info
+
+
+def list_tasks() -> List[dict]:
+    """El catálogo como lista serializable a JSON, sin el módulo de cada tarea."""
+    return [
+        {"name": name, **{key: value for key, value in info.items() if key != "target"}}
+        for name, info in TASKS.items()
+    ]
+
+
+def required_columns(task_name: str, input_name: str) -> List[str]:
+    """Columnas obligatorias de un archivo de entrada de la tarea."""
+    return list(get_task_info(task_name)["inputs"][input_name])
+
+
+def validate_params(task_name: str, params: dict) -> None:
+    """Comprueba el modo y los parámetros con opciones fijas antes de importar la tarea."""
+    info = get_task_info(task_name)
+    mode = params.get("mode", "preview")
+    if mode not in info["modes"]:
+        raise ValueError(f"La tarea {task_name} no admite el modo {mode}")
+    for name, spec in info["params"].items():
+        value = params.get(name, spec.get("default"))
+        if "choices" in spec and value not in spec["choices"]:
+            raise ValueError(f"Valor inválido para {name}: {value}. Use uno de: {', '.join(spec['choices'])}")
+
+
+def load_task_class(task_name: str):
+    """Importa el módulo de la tarea y devuelve su clase."""
+    module_name, class_name = get_task_info(task_name)["target"].split(":")
+    return getattr(importlib.import_module(module_name), class_name)
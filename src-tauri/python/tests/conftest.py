@@ -0,0 +1,89 @@
+import os
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# Las pruebas usan directorios de datos propios y no emiten eventos de etapa por stderr.
+# Se fija antes de importar los módulos de la app, que leen su configuración al importarse.
+_data_dir = tempfile.mkdtemp(prefix='excelclienttigohelper-tests-')
+for _name in ('EXCEL_CACHE_DIR', 'RESULT_STORE_DIR', 'NODE_INDEX_DIR', 'SNAPSHOT_DIR', 'RESULT_TRANSPORT_DIR'):
+    os.environ.setdefault(_name, os.path.join(_data_dir, _name.lower()))
+os.environ.setdefault('STAGE_EVENTS_ENABLED', '0')
+os.environ.setdefault('SNAPSHOT_ENABLED', '0')
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_db_session(tmp_path):
+    """
+    Crea un SQLite con las dos vistas de la base (clientes y bandera de IP) y devuelve una
+    sesión sobre él. Recibe el NODO de cada cliente; la cuenta es su posición y tienen IP
+    las cuentas pares.
+    """
+    engines = []
+
+    def make(client_nodes):
+        path = tmp_path / f'db{len(engines)}.sqlite'
+        db = sqlite3.connect(path)
+        db.execute("create table c (NRO_CUENTA numeric, NOMBRE_CLIENTE text, NODO text, EJECUTIVO_CORPORATE text, "
+                   "CORREO_TITULAR_PYME text, TELEFONO_CONTACTO text, TIPO_PRODUCTO text)")
+        db.execute("create table ip (CLIENTENRO numeric, BANDERA_IP text)")
+        db.executemany("insert into c values (?, ?, ?, 'Ej', 'a@b', '777', 'X')",
+                       [(i, f"Cliente {i}", nodo) for i, nodo in enumerate(client_nodes)])
+        db.executemany("insert into ip values (?, 'TIENE')", [(i,) for i in range(0, len(client_nodes), 2)])
+        db.execute("create view VISTAS_CACHE_CUBO_CARTERAS as select * from c")
+        db.execute("create view VISTA_TIENE_IP as select CLIENTENRO, BANDERA_IP from ip")
+        db.commit()
+        db.close()
+        engine = create_engine(f"sqlite:///{path}")
+        engines.append(engine)
+        return Session(engine)
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture
+def make_synthetic_inputs(tmp_path):
+    """
+    Datos de benchmarks/synthetic_data: una base SQLite con las dos vistas para n_clients
+    clientes (con NODO escrito de varias formas) y un cronograma de schedule_rows filas.
+    Devuelve (sesión, ruta del cronograma).
+    """
+    from benchmarks import synthetic_data
+
+    engines = []
+
+    def make(n_clients, schedule_rows, seed=0):
+        db_path = str(tmp_path / f'vistas{len(engines)}.sqlite')
+        cronograma_path = str(tmp_path / f'cronograma{len(engines)}.xlsx')
+        synthetic_data.build_sqlite_standin(db_path, n_clients, seed=seed + 2)
+        synthetic_data.build_cronograma(schedule_rows, seed=seed).to_excel(cronograma_path, index=False)
+        engine = create_engine(f"sqlite:///{db_path}")
+        engines.append(engine)
+        return Session(engine), cronograma_path
+
+    yield make
+    for engine in engines:
+        engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def task_inputs(tmp_path_factory):
+    """
+    Cronograma de 400 filas y reporte de 20000 clientes sintéticos para la tarea, escritos una
+    sola vez. Devuelve (ruta del cronograma, ruta del reporte de clientes).
+    """
+    from benchmarks import synthetic_data
+
+    directory = tmp_path_factory.mktemp('task_inputs')
+    schedule_path, clients_path = str(directory / 'cronograma.xlsx'), str(directory / 'clientes.xlsx')
+    synthetic_data.build_cronograma(400).to_excel(schedule_path, index=False)
+    synthetic_data.build_clientes(20000).to_excel(clients_path, index=False)
+    return schedule_path, clients_path
@@ -0,0 +1,46 @@
+import copy
+import json
+
+from benchmarks.run_benchmarks import DEFAULT_BASELINE, MACHINE_KEY, build_parser, compare_with_baseline
+
+
+def case(**seconds):
+    return {'stages': {name: {'seconds': value, 'peak_rss_mb': 100.0} for name, value in seconds.items()},
+            'result': {'rows': 10, 'hash': 'abc'}}
+
+
+BASELINE = {MACHINE_KEY: {'cpus': 1}, 'service/1000': case(db_fetch=0.4, merge=0.06, export=1.0, preview=0.01)}
+
+
+def test_same_run_has_no_regressions():
+    assert compare_with_baseline({'service/1000': case(db_fetch=0.4, merge=0.06, export=1.0, preview=0.01)},
+                                 BASELINE, 0.25) == []
+
+
+def test_slower_stage_beyond_the_tolerance_is_a_regression():
+    problems = compare_with_baseline({'service/1000': case(db_fetch=0.4, merge=0.06, export=1.3, preview=0.01)},
+                                     BASELINE, 0.25)
+    assert problems == ["service/1000/export: 1.300s vs baseline 1.000s"]
+
+
+def test_small_or_noisy_differences_are_ignored():
+    # export sube menos que la tolerancia, merge la supera por menos de MIN_REGRESSION_SECONDS y
+    # preview está por debajo de MIN_COMPARABLE_SECONDS en la línea base.
+    current = case(db_fetch=0.4, merge=0.09, export=1.2, preview=0.04)
+    assert compare_with_baseline({'service/1000': current}, BASELINE, 0.25) == []
+
+
+def test_changed_result_and_missing_case_fail():
+    changed = copy.deepcopy(BASELINE['service/1000'])
+    changed['result']['rows'] = 11
+    problems = compare_with_baseline({'service/1000': changed, 'task/1000': case(load=1.0)}, BASELINE, 0.25)
+    assert problems[0].startswith("service/1000: result changed")
+    assert problems[1] == "task/1000: not in the baseline; save one with --save-baseline"
+
+
+def test_reference_baseline_covers_the_default_run():
+    args = build_parser().parse_args([])
+    with open(DEFAULT_BASELINE, encoding='utf-8') as f:
+        baseline = json.load(f)
+    assert {f"{pipeline}/{size}" for pipeline in args.pipelines.split(',')
+            for size in args.sizes.split(',')} <= set(baseline)
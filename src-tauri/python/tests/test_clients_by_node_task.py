@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+
+from tasks import clients_by_node
+from tasks.clients_by_node import ClientsByNodeTask
+
+
+@pytest.fixture
+def task(task_inputs):
+    task = ClientsByNodeTask()
+    task.load_schedule(task_inputs[0])
+    task.load_clients(task_inputs[1])
+    return task
+
+
+@pytest.mark.parametrize('filter_b2b', ['all', 'b2b', 'b2c'])
+@pytest.mark.parametrize('max_rows', [1, 10, 200])
+def test_preview_top_matches_the_head_of_process(task, filter_b2b, max_rows):
+    top, total, exact = task.preview_top(filter_b2b, max_rows)
+    task.process(filter_b2b)
+
+    pd.testing.assert_frame_equal(top.reset_index(drop=True), task.result_df.head(max_rows).reset_index(drop=True))
+    if exact:
+        assert total == len(task.result_df)
+
+
+def test_preview_top_stops_early_with_an_estimated_total(task):
+    top, total, exact = task.preview_top('all', 10)
+    task.process('all')
+
+    assert not exact
+    assert len(top) == 10
+    assert 0.5 * len(task.result_df) < total < 2 * len(task.result_df)
+
+
+@pytest.mark.parametrize('filter_b2b', ['all', 'b2b'])
+@pytest.mark.parametrize('workers', [2, 3])
+def test_parallel_join_matches_the_single_join(task, filter_b2b, workers):
+    clients, schedule = task._prepare(filter_b2b)
+
+    parallel = task._parallel_join(clients, schedule, workers)
+
+    pd.testing.assert_frame_equal(parallel, ClientsByNodeTask._join(clients, schedule))
+
+
+def test_process_with_parallel_workers_matches_the_serial_result(task, monkeypatch):
+    task.process('all')
+    serial = task.result_df
+    monkeypatch.setattr(clients_by_node, 'PARALLEL_JOIN_MIN_ROWS', 0)
+    monkeypatch.setattr(clients_by_node, 'PARALLEL_JOIN_WORKERS', 2)
+
+    task.process('all')
+
+    pd.testing.assert_frame_equal(task.result_df, serial)
+
+
+def test_merge_sorted_partitions_interleaves_blocks_by_date_and_node(task):
+    clients, schedule = task._prepare('all')
+    nodes = schedule["NODO_N"].cat.categories
+    # Dos particiones con nodos alternados: sus bloques de (fecha, nodo) se intercalan.
+    parts = [ClientsByNodeTask._join(clients[clients["NODO_EXTRAIDO"].isin(nodes[p::2])],
+                                     schedule[schedule["NODO_N"].isin(nodes[p::2])]) for p in (0, 1)]
+
+    merged = ClientsByNodeTask._merge_sorted_partitions(parts)
+
+    pd.testing.assert_frame_equal(merged, ClientsByNodeTask._join(clients, schedule))
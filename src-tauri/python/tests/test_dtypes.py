@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.clients_by_node_service import ClientsByNodeService
+from core.dtypes import arrow_string_dtype, compact_frame, frame_memory_bytes, to_account_ids, to_compact_strings
+
+
+def test_account_ids_become_integers_and_keep_nulls():
+    assert to_account_ids(pd.Series([1.0, 2.0, 3.0])).dtype == 'int64'
+    with_nulls = to_account_ids(pd.Series([1.0, np.nan, 3.0]))
+    assert with_nulls.dtype == 'Int64'
+    assert with_nulls.isna().tolist() == [False, True, False]
+    assert to_account_ids(pd.Series([10, 20], dtype=object)).tolist() == [10, 20]
+
+
+@pytest.mark.parametrize('values', [['00123', '00456'], [1.5, 2.0], ['123', 456]])
+def test_account_ids_that_are_not_whole_numbers_are_left_alone(values):
+    series = pd.Series(values, dtype=object)
+    pd.testing.assert_series_equal(to_account_ids(series), series)
+
+
+@pytest.mark.skipif(arrow_string_dtype() is None, reason="pyarrow is not installed")
+def test_only_pure_text_columns_become_arrow_strings():
+    assert to_compact_strings(pd.Series(['Ana', None, 'Luis'])).dtype == arrow_string_dtype()
+    mixed = pd.Series(['777', 777, None], dtype=object)
+    pd.testing.assert_series_equal(to_compact_strings(mixed), mixed)
+
+
+def test_compact_frame_keeps_the_values_and_uses_less_memory():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'NRO_CUENTA': np.where(rng.random(5000) < 0.1, np.nan, rng.integers(1, 10 ** 9, 5000)).astype(float),
+        'NODO': rng.choice(['N1', 'N2', 'N3'], 5000).astype(object),
+        'NOMBRE_CLIENTE': [f"Cliente {i}" for i in range(5000)],
+    })
+    original = df.copy()
+
+    compact = compact_frame(df, categories=['NODO', 'FALTA'], account_ids=['NRO_CUENTA'], strings=['NOMBRE_CLIENTE'])
+
+    assert compact is df
+    assert frame_memory_bytes(compact) < frame_memory_bytes(original)
+    for column in original:
+        assert compact[column].astype(object).where(compact[column].notna(), None).tolist() == \
+            original[column].astype(object).where(original[column].notna(), None).tolist()
+
+
+def test_compact_clients_do_not_change_the_result(make_synthetic_inputs, monkeypatch):
+    db_session, cronograma_path = make_synthetic_inputs(5000, 200)
+    compact = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    monkeypatch.setattr(ClientsByNodeService, '_compact_clients', staticmethod(lambda df_clientes: df_clientes))
+    service = ClientsByNodeService()
+    service.invalidate_cache()
+    plain = service.get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    assert compact['total_rows'] == plain['total_rows']
+    assert compact['rows'] == plain['rows']
@@ -0,0 +1,58 @@
+import os
+
+import pandas as pd
+import pytest
+
+from core import excel_utils
+from core.excel_utils import ExcelUtils
+
+COLUMNS = ['NODO_N', 'FECHA TRABAJO']
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    directory = tmp_path / 'excel_cache'
+    monkeypatch.setattr(excel_utils, 'EXCEL_CACHE_DIR', str(directory))
+    return directory
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = str(tmp_path / 'crono.xlsx')
+    pd.DataFrame({'NODO_N': ['SCZ001', 'LPZ002'], 'FECHA TRABAJO': ['2025-07-01', '2025-07-02'],
+                  'OTRA': [1, 2]}).to_excel(path, index=False)
+    return path
+
+
+def test_second_load_is_served_from_the_cache(cache_dir, workbook, monkeypatch):
+    first = ExcelUtils.load_excel(workbook, COLUMNS)
+
+    def no_parse(*args, **kwargs):
+        raise AssertionError("no debería volver a parsear el XLSX")
+
+    monkeypatch.setattr(pd, 'read_excel', no_parse)
+    pd.testing.assert_frame_equal(ExcelUtils.load_excel(workbook, COLUMNS), first)
+    assert list(first.columns) == COLUMNS
+
+
+def test_interrupted_cache_write_leaves_no_sidecar(cache_dir, workbook, monkeypatch):
+    def write_half(self, target, *args, **kwargs):
+        if isinstance(target, str):
+            with open(target, 'wb') as stream:
+                stream.write(b'ARROW1\x00\x00')
+        else:
+            target.write(b'ARROW1\x00\x00')
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(pd.DataFrame, 'to_feather', write_half)
+    monkeypatch.setattr(pd.DataFrame, 'to_pickle', write_half)
+    expected = ExcelUtils.load_excel(workbook, COLUMNS)
+
+    assert os.listdir(cache_dir) == []
+    monkeypatch.undo()
+    pd.testing.assert_frame_equal(ExcelUtils.load_excel(workbook, COLUMNS), expected)
+
+
+def test_missing_columns_are_reported_from_the_header(cache_dir, workbook):
+    with pytest.raises(ValueError, match="Missing columns in .*: FALTA"):
+        ExcelUtils.load_excel(workbook, ['NODO_N', 'FALTA'])
@@ -0,0 +1,63 @@
+import pandas as pd
+import pytest
+
+from app.services import clients_by_node_service
+from app.services.clients_by_node_service import ClientsByNodeService
+from tasks import clients_by_node
+from tasks.clients_by_node import ClientsByNodeTask
+
+
+def assert_same_export(streamed_path, full_path):
+    if streamed_path.endswith('.xlsx'):
+        streamed, full = pd.read_excel(streamed_path, sheet_name=None), pd.read_excel(full_path, sheet_name=None)
+        assert list(streamed) == list(full)
+        for sheet in full:
+            pd.testing.assert_frame_equal(streamed[sheet], full[sheet], obj=sheet)
+    else:
+        with open(streamed_path, 'rb') as a, open(full_path, 'rb') as b:
+            assert a.read() == b.read()
+
+
+@pytest.mark.parametrize('ip_filter', ['all', 'with_ip'])
+@pytest.mark.parametrize('extension', ['xlsx', 'csv'])
+def test_export_by_date_matches_the_full_export(make_synthetic_inputs, monkeypatch, tmp_path, ip_filter, extension):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    # Menos filas por tanda que las de un solo día: cada día se cruza en su propia tanda.
+    monkeypatch.setattr(clients_by_node_service, 'STREAMING_EXPORT_BATCH_ROWS', 5)
+
+    streamed = ClientsByNodeService().export_to_excel(db_session, cronograma_path, ip_filter,
+                                                      str(tmp_path / f'by_date.{extension}'))
+    service = ClientsByNodeService()
+    df_processed = service._get_processed_data(db_session, cronograma_path, ip_filter)
+    full = service._export_result(df_processed, str(tmp_path / f'full.{extension}'))
+
+    assert df_processed['FECHA TRABAJO'].dt.normalize().value_counts().max() > 5
+    assert (streamed['format'], full['format']) == (extension, extension)
+    assert_same_export(streamed['path'], full['path'])
+
+
+def test_export_starts_from_a_computed_result_when_there_is_one(make_synthetic_inputs, monkeypatch, tmp_path):
+    db_session, cronograma_path = make_synthetic_inputs(3000, 60)
+    service = ClientsByNodeService()
+    service._get_processed_data(db_session, cronograma_path, 'all')
+    monkeypatch.setattr(service, '_export_by_date', lambda *args: pytest.fail("the cached result was not used"))
+
+    result = service.export_to_excel(db_session, cronograma_path, 'all', str(tmp_path / 'out.xlsx'))
+
+    assert result['format'] == 'xlsx'
+
+
+@pytest.mark.parametrize('filter_b2b', ['all', 'b2b'])
+@pytest.mark.parametrize('extension', ['xlsx', 'csv'])
+def test_task_export_by_date_matches_process_and_export(task_inputs, monkeypatch, tmp_path, filter_b2b, extension):
+    task = ClientsByNodeTask()
+    task.load_schedule(task_inputs[0])
+    task.load_clients(task_inputs[1])
+    monkeypatch.setattr(clients_by_node, 'STREAMING_EXPORT_BATCH_ROWS', 5)
+
+    streamed = task.export_by_date(str(tmp_path / f'by_date.{extension}'), filter_b2b)
+    task.process(filter_b2b)
+    full = task.export_result(str(tmp_path / f'full.{extension}'))
+
+    assert task.result_df['FECHA TRABAJO'].dt.normalize().value_counts().max() > 5
+    assert_same_export(streamed, full)
@@ -0,0 +1,134 @@
+import os
+
+import pandas as pd
+import pytest
+
+from app.services.clients_by_node_service import ClientsByNodeService
+from app.services.incremental_sessions import IncrementalSessions
+from core.node_keys import normalize_nodo_key
+from core.result_store import ResultStore
+
+
+def cronograma(rows):
+    """Cronograma normalizado como el de _read_cronograma, a partir de (NODO_N, fecha)."""
+    df = pd.DataFrame(rows, columns=['NODO_N', 'FECHA TRABAJO'])
+    df['FECHA TRABAJO'] = pd.to_datetime(df['FECHA TRABAJO'])
+    df['NODO_NORMALIZADO'] = normalize_nodo_key(df['NODO_N'])
+    return df
+
+
+PREVIOUS = [('SCZ001', '2025-07-01'), ('SCZ001', '2025-07-02'), ('LPZ002', '2025-07-01'),
+            ('CBB003', '2025-07-03'), ('PTS004', '2025-07-04')]
+
+
+def test_diff_nodes_classifies_added_changed_and_removed():
+    current = cronograma([
+        ('SCZ001', '2025-07-02'), ('SCZ001', '2025-07-01'),  # mismas filas en otro orden
+        ('LPZ002', '2025-07-05'),                              # otra fecha
+        ('PTS004', '2025-07-04'), ('PTS004', '2025-07-06'),    # una fila más
+        ('TRJ005', '2025-07-01'),                              # nodo nuevo
+    ])                                                         # CBB003 quitado
+
+    added, changed, removed = IncrementalSessions.diff_nodes(cronograma(PREVIOUS), current)
+
+    assert added == ['TRJ005']
+    assert sorted(changed) == ['LPZ002', 'PTS004']
+    assert removed == ['CBB003']
+
+
+def test_diff_nodes_without_changes_is_empty():
+    assert IncrementalSessions.diff_nodes(cronograma(PREVIOUS), cronograma(PREVIOUS[::-1])) == ([], [], [])
+
+
+def test_diff_nodes_sees_a_renamed_node_with_the_same_key():
+    # 'Nodo SCZ001' normaliza igual que 'SCZ001', pero la fila del archivo cambió.
+    current = cronograma([('Nodo SCZ001', '2025-07-01')] + PREVIOUS[1:])
+
+    assert IncrementalSessions.diff_nodes(cronograma(PREVIOUS), current) == ([], ['SCZ001'], [])
+
+
+def test_stored_session_keeps_one_copy_of_the_result(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    key = IncrementalSessions.session_key('crono.xlsx', 'all', 'token')
+    df_cronograma = cronograma(PREVIOUS)
+    df_clientes = pd.DataFrame({'NRO_CUENTA': [1, 2], 'NODO_NORMALIZADO': ['SCZ001', 'LPZ002']})
+    df_resultado = pd.DataFrame({'NRO_CUENTA': [1, 1, 2], 'NODO_NORMALIZADO': ['SCZ001'] * 2 + ['LPZ002']})
+    result_key = ResultStore.key_for('resultado')
+
+    IncrementalSessions(store).put(key, df_cronograma, df_clientes, df_resultado, result_key)
+
+    # El resultado, los clientes y el cronograma: el resultado no se guarda dos veces.
+    assert len(os.listdir(tmp_path)) == 3
+    pd.testing.assert_frame_equal(store.load(result_key), df_resultado)
+    # Otro proceso (otra instancia, sin sesiones en memoria) la encuentra en disco.
+    other = IncrementalSessions(store)
+    assert other.contains(key)
+    loaded_cronograma, loaded_clientes, loaded_resultado = other.get(key)
+    pd.testing.assert_frame_equal(loaded_resultado, df_resultado)
+    pd.testing.assert_frame_equal(loaded_clientes, df_clientes)
+    assert list(loaded_cronograma['NODO_N']) == list(df_cronograma['NODO_N'])
+    assert loaded_cronograma.attrs == {}
+
+
+def test_session_without_its_stored_result_is_not_used(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    key = IncrementalSessions.session_key('crono.xlsx', 'all', 'token')
+    result_key = ResultStore.key_for('resultado')
+    IncrementalSessions(store).put(key, cronograma(PREVIOUS), pd.DataFrame({'a': [1]}),
+                                   pd.DataFrame({'a': [1]}), result_key)
+    os.remove(os.path.join(tmp_path, result_key + '.arrow'))
+
+    assert IncrementalSessions(store).get(key) is None
+
+
+# NODO de cada cliente en la vista; varios clientes por nodo y nodos que el cronograma no usa.
+CLIENT_NODES = ['SCZ001', 'Nodo SCZ001', 'LPZ002', 'lpz002 ', 'CBB003', 'PTS004', 'PTS004',
+                'TRJ005', 'SRE006', 'EAL007', None] * 3
+FIRST = PREVIOUS + [('SRE006', '2025-07-02'), ('EAL007', '2025-07-05')]
+# Filas quitadas (CBB003 y una de SCZ001), editadas (LPZ002, EAL007) y nuevas (TRJ005).
+EDITED = [('SCZ001', '2025-07-02'), ('LPZ002', '2025-07-09'), ('PTS004', '2025-07-04'),
+          ('SRE006', '2025-07-02'), ('EAL007', '2025-07-06'), ('TRJ005', '2025-07-07'),
+          ('TRJ005', '2025-07-08')]
+
+
+def write_cronograma(path, rows):
+    pd.DataFrame(rows, columns=['NODO_N', 'FECHA TRABAJO']).to_excel(path, index=False)
+
+
+def service_with_store(directory, incremental=True):
+    service = ClientsByNodeService()
+    service.result_store = ResultStore(directory=str(directory))
+    service.incremental_sessions = IncrementalSessions(service.result_store, enabled=incremental)
+    return service
+
+
+def sorted_rows(df):
+    columns = ['NRO_CUENTA', 'FECHA TRABAJO', 'NODO_NORMALIZADO', 'BANDERA_IP']
+    df = df[columns].astype({'NRO_CUENTA': int, 'NODO_NORMALIZADO': str})
+    return df.sort_values(columns).reset_index(drop=True)
+
+
+@pytest.mark.parametrize('ip_filter', ['all', 'with_ip', 'without_ip'])
+@pytest.mark.parametrize('same_process', [True, False])
+def test_incremental_rebuild_matches_full_rebuild(tmp_path, make_db_session, monkeypatch, ip_filter, same_process):
+    path = str(tmp_path / 'crono.xlsx')
+    write_cronograma(path, FIRST)
+    with make_db_session(CLIENT_NODES) as db_session:
+        service = service_with_store(tmp_path / 'store')
+        service._get_processed_data(db_session, path, ip_filter, persist=True)
+
+        write_cronograma(path, EDITED)
+        if not same_process:
+            # La edición llega en otro proceso: la sesión sale del ResultStore.
+            service = service_with_store(tmp_path / 'store')
+        updates = []
+        update = service._update_incrementally
+        monkeypatch.setattr(service, '_update_incrementally', lambda *args: updates.append(1) or update(*args))
+        df_incremental = service._get_processed_data(db_session, path, ip_filter, persist=True)
+
+        df_full = service_with_store(tmp_path / 'full', incremental=False)._get_processed_data(
+            db_session, path, ip_filter)
+
+    assert updates == [1]
+    assert len(df_full) > 0
+    pd.testing.assert_frame_equal(sorted_rows(df_incremental), sorted_rows(df_full))
@@ -0,0 +1,106 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.services.clients_by_node_service import ClientsByNodeService
+from core import instrumentation
+from core.instrumentation import stage, stage_listener
+
+MAIN_PY = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'main.py')
+
+
+def stage_lines(stderr: str):
+    return [json.loads(line) for line in stderr.splitlines() if line.startswith('{"event": "stage"')]
+
+
+def test_stage_writes_one_json_line_per_block(capsys, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'STAGE_EVENTS_ENABLED', True)
+
+    with stage('service.preview', rows_in=10):
+        with stage('service.merge') as event:
+            event.set(rows_out=4)
+
+    inner, outer = stage_lines(capsys.readouterr().err)
+    assert (inner['stage'], inner['parent'], inner['status'], inner['rows_out']) == (
+        'service.merge', 'service.preview', 'ok', 4)
+    assert (outer['stage'], outer['parent'], outer['rows_in']) == ('service.preview', None, 10)
+    assert outer['duration_ms'] >= inner['duration_ms'] >= 0
+
+
+def test_failed_stage_reports_the_error(capsys, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'STAGE_EVENTS_ENABLED', True)
+
+    with pytest.raises(ValueError):
+        with stage('task.load'):
+            raise ValueError("Missing columns")
+
+    [event] = stage_lines(capsys.readouterr().err)
+    assert (event['status'], event['error']) == ('error', 'Missing columns')
+
+
+def test_disabled_events_write_nothing(capsys, monkeypatch):
+    monkeypatch.setattr(instrumentation, 'STAGE_EVENTS_ENABLED', False)
+    with stage('task.load'):
+        pass
+    assert stage_lines(capsys.readouterr().err) == []
+
+
+def test_preview_reports_its_stages(make_synthetic_inputs, tmp_path):
+    db_session, cronograma_path = make_synthetic_inputs(5000, 200)
+    service = ClientsByNodeService()
+    records = []
+
+    with stage_listener(lambda kind, name, fields: records.append(fields) if kind == 'end' else None):
+        first = service.get_preview(db_session, cronograma_path, 'all')
+        service.get_preview(db_session, cronograma_path, 'all', offset=20)
+
+    by_stage = {}
+    for record in records:
+        by_stage.setdefault(record['stage'], []).append(record)
+    first_page, second_page = by_stage['service.preview']
+    assert (first_page['path'], first_page['rows_out'], first_page['total_rows']) == (
+        'top_n', 20, first['total_rows'])
+    assert second_page['path'] == 'full'
+    [processed] = by_stage['service.processed_data']
+    assert (processed['parent'], processed['cache']) == ('service.preview', 'miss')
+    assert by_stage['service.merge'][0]['rows_out'] == processed['rows_out']
+    assert {record['status'] for record in records} == {'ok'}
+
+
+def test_worker_streams_stage_progress_for_requests_that_ask(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(5000, 200)
+    db_session.close()
+    worker = subprocess.Popen([sys.executable, MAIN_PY, '--worker'], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True,
+                              env={**os.environ, 'DATABASE_URL': str(db_session.get_bind().url)})
+    try:
+        assert json.loads(worker.stdout.readline())['result'] == {"status": "ready"}
+        for request_id, progress in ((1, True), (2, False)):
+            worker.stdin.write(json.dumps({"id": request_id, "mode": "preview", "cronograma_path": cronograma_path,
+                                           "ip_filter": "all", "offset": request_id, "progress": progress}) + '\n')
+            worker.stdin.flush()
+        messages = []
+        while sum('event' not in message for message in messages) < 2:
+            messages.append(json.loads(worker.stdout.readline()))
+        worker.stdin.write(json.dumps({"id": None, "mode": "shutdown"}) + '\n')
+        worker.stdin.flush()
+        assert worker.wait(timeout=30) == 0
+    finally:
+        if worker.poll() is None:
+            worker.kill()
+
+    assert all('result' in message for message in messages if 'event' not in message), messages
+    assert [message for message in messages if message['id'] == 2 and 'event' in message] == []
+    events = [message for message in messages if message['id'] == 1 and 'event' in message]
+    assert [event['status'] for event in events[:2]] == ['queued', 'running']
+    stages = [(event['stage'], event['status']) for event in events[2:]]
+    assert (stages[0], stages[-1]) == (('controller.preview', 'started'), ('controller.preview', 'ok'))
+    # Las etapas internas llegan con su inicio y su fin, anidadas dentro de la del controlador. Las dos
+    # solicitudes corren a la vez y la segunda en terminar reutiliza el resultado de la otra, así que
+    # solo se esperan las etapas que recorren ambas.
+    inner = stages[1:-1]
+    for name in ('service.preview', 'service.processed_data'):
+        assert inner.index((name, 'started')) < inner.index((name, 'ok'))
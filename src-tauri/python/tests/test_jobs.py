@@ -0,0 +1,295 @@
+import json
+import sys
+import threading
+import time
+
+import pytest
+
+from core.instrumentation import stage
+from core.jobs import (CANCELLED_MESSAGE, CancelToken, JobCancelled, JobScheduler, check_cancelled, job_scope,
+                       run_subprocess_job)
+
+CANCELLED = {"error": CANCELLED_MESSAGE, "cancelled": True}
+
+
+class Responses:
+    """Respuestas del planificador, en el orden en que llegan desde cualquier hilo."""
+
+    def __init__(self):
+        self.items = []
+        self._lock = threading.Lock()
+
+    def __call__(self, response):
+        with self._lock:
+            self.items.append(response)
+
+    def final(self, request_id):
+        """Respuestas (no eventos de progreso) a request_id, sin el id."""
+        with self._lock:
+            return [{k: v for k, v in item.items() if k != 'id'} for item in self.items
+                    if item['id'] == request_id and 'event' not in item]
+
+    def events(self, request_id):
+        with self._lock:
+            return [item for item in self.items if item['id'] == request_id and 'event' in item]
+
+    def wait_for(self, request_id, count=1, timeout=5):
+        deadline = time.monotonic() + timeout
+        while len(self.final(request_id)) < count:
+            assert time.monotonic() < deadline, f"sin respuesta para {request_id}: {self.items}"
+            time.sleep(0.01)
+        return self.final(request_id)
+
+
+class Gate:
+    """Un fn falso que cuenta sus ejecuciones y no termina hasta que se abre la compuerta."""
+
+    def __init__(self, result='ok'):
+        self.result = result
+        self.calls = 0
+        self.started = threading.Event()
+        self.opened = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        self.started.set()
+        assert self.opened.wait(5)
+        return self.result
+
+
+def until_cancelled(started: threading.Event):
+    """Un fn falso que corre hasta que su trabajo se cancela, revisando el punto de control."""
+    def run():
+        started.set()
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            check_cancelled()
+            time.sleep(0.01)
+        return 'not cancelled'
+    return run
+
+
+@pytest.fixture
+def responses():
+    return Responses()
+
+
+@pytest.fixture
+def scheduler(responses):
+    scheduler = JobScheduler(responses, max_concurrent=1)
+    yield scheduler
+    scheduler.shutdown()
+
+
+def test_identical_requests_share_one_run(scheduler, responses):
+    gate = Gate(result={'rows': 3})
+    scheduler.submit(1, 'key', gate)
+    assert gate.started.wait(5)
+    scheduler.submit(2, 'key', gate)
+    gate.opened.set()
+
+    assert responses.wait_for(1) == [{"result": {'rows': 3}}]
+    assert responses.wait_for(2) == [{"result": {'rows': 3}}]
+    assert gate.calls == 1
+
+
+def test_different_keys_run_separately(scheduler, responses):
+    first, second = Gate(1), Gate(2)
+    first.opened.set()
+    second.opened.set()
+    scheduler.submit(1, 'a', first)
+    scheduler.submit(2, 'b', second)
+
+    assert responses.wait_for(1) == [{"result": 1}]
+    assert responses.wait_for(2) == [{"result": 2}]
+    assert (first.calls, second.calls) == (1, 1)
+
+
+def test_a_finished_key_runs_again(scheduler, responses):
+    gate = Gate()
+    gate.opened.set()
+    scheduler.submit(1, 'key', gate)
+    responses.wait_for(1)
+    scheduler.submit(2, 'key', gate)
+
+    responses.wait_for(2)
+    assert gate.calls == 2
+
+
+def test_cancelling_one_coalesced_request_keeps_the_job_for_the_other(scheduler, responses):
+    gate = Gate(result='shared')
+    scheduler.submit(1, 'key', gate)
+    assert gate.started.wait(5)
+    scheduler.submit(2, 'key', gate)
+
+    assert scheduler.cancel(1)
+    assert responses.final(1) == [CANCELLED]
+    gate.opened.set()
+
+    assert responses.wait_for(2) == [{"result": 'shared'}]
+    # La solicitud cancelada no recibe además el resultado.
+    assert responses.final(1) == [CANCELLED]
+    assert gate.calls == 1
+
+
+def test_cancelling_a_queued_job_never_runs_it(scheduler, responses):
+    running, queued = Gate('first'), Gate('second')
+    scheduler.submit(1, 'a', running)
+    assert running.started.wait(5)
+    scheduler.submit(2, 'b', queued)
+
+    assert scheduler.cancel(2)
+    running.opened.set()
+
+    assert responses.wait_for(1) == [{"result": 'first'}]
+    queued.opened.set()
+    time.sleep(0.1)
+    assert queued.calls == 0
+    assert responses.final(2) == [CANCELLED]
+
+
+def test_cancelled_request_key_starts_a_new_job(scheduler, responses):
+    started = threading.Event()
+    scheduler.submit(1, 'key', until_cancelled(started))
+    assert started.wait(5)
+    scheduler.cancel(1)
+
+    gate = Gate('fresh')
+    gate.opened.set()
+    scheduler.submit(2, 'key', gate)
+    assert responses.wait_for(2) == [{"result": 'fresh'}]
+
+
+def test_cancelling_a_running_job_stops_it_at_its_next_checkpoint(scheduler, responses):
+    started = threading.Event()
+    scheduler.submit(1, 'key', until_cancelled(started))
+    assert started.wait(5)
+
+    assert scheduler.cancel(1)
+
+    # El trabajo termina por su cuenta y libera el único hilo del pool.
+    after = Gate('after')
+    after.opened.set()
+    scheduler.submit(2, 'other', after)
+    assert responses.wait_for(2, timeout=2) == [{"result": 'after'}]
+    assert responses.final(1) == [CANCELLED]
+
+
+def test_stage_start_is_a_cancellation_checkpoint(scheduler, responses):
+    started, cancelled, stages = threading.Event(), threading.Event(), []
+
+    def run():
+        started.set()
+        assert cancelled.wait(5)
+        with stage('after_cancel'):
+            stages.append('ran')
+        return 'not cancelled'
+
+    scheduler.submit(1, 'key', run)
+    assert started.wait(5)
+    scheduler.cancel(1)
+    cancelled.set()
+    scheduler.shutdown()
+
+    assert stages == []
+    assert responses.final(1) == [CANCELLED]
+
+
+def test_cancel_unknown_request(scheduler, responses):
+    assert not scheduler.cancel(99)
+    assert responses.items == []
+
+
+def test_duplicate_request_id_is_rejected(scheduler, responses):
+    gate = Gate()
+    scheduler.submit(1, 'a', gate)
+    scheduler.submit(1, 'b', Gate())
+    assert responses.final(1) == [{"error": "Ya hay una solicitud en curso con el id 1."}]
+    gate.opened.set()
+    assert responses.wait_for(1, count=2)[1] == {"result": 'ok'}
+
+
+def test_errors_reach_every_subscriber(scheduler, responses):
+    gate = Gate()
+
+    def fail():
+        gate()
+        raise ValueError("No se pudo leer el archivo")
+
+    scheduler.submit(1, 'key', fail)
+    assert gate.started.wait(5)
+    scheduler.submit(2, 'key', fail)
+    gate.opened.set()
+
+    assert responses.wait_for(1) == [{"error": "No se pudo leer el archivo"}]
+    assert responses.wait_for(2) == [{"error": "No se pudo leer el archivo"}]
+
+
+def test_progress_events_only_for_requests_that_asked(scheduler, responses):
+    def run():
+        with stage('service.preview', rows_in=3) as event:
+            event.set(rows_out=2)
+        return 'done'
+
+    gate = Gate()
+    scheduler.submit(0, 'block', gate)
+    scheduler.submit(1, 'key', run, progress=True)
+    scheduler.submit(2, 'key', run)
+    gate.opened.set()
+    responses.wait_for(1)
+
+    events = responses.events(1)
+    assert [event['status'] for event in events] == ['queued', 'running', 'started', 'ok']
+    assert events[2]['stage'] == events[3]['stage'] == 'service.preview'
+    assert events[3]['rows_out'] == 2
+    assert responses.events(2) == []
+    assert responses.wait_for(2) == [{"result": 'done'}]
+
+
+def test_coalesced_request_is_told_so(scheduler, responses):
+    gate = Gate()
+    scheduler.submit(1, 'key', gate)
+    scheduler.submit(2, 'key', gate, progress=True)
+    assert responses.events(2)[0] == {"id": 2, "event": "progress", "status": "coalesced"}
+    gate.opened.set()
+    responses.wait_for(2)
+
+
+def test_shutdown_cancels_running_and_queued_jobs(responses):
+    scheduler = JobScheduler(responses, max_concurrent=1)
+    started, queued = threading.Event(), Gate()
+    scheduler.submit(1, 'a', until_cancelled(started))
+    assert started.wait(5)
+    scheduler.submit(2, 'b', queued)
+
+    begin = time.monotonic()
+    scheduler.shutdown()
+
+    assert time.monotonic() - begin < 2
+    assert responses.final(1) == [CANCELLED]
+    assert responses.final(2) == [CANCELLED]
+    assert queued.calls == 0
+
+
+def test_subprocess_job_is_terminated_on_cancel():
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel).start()
+    begin = time.monotonic()
+    with job_scope(token), pytest.raises(JobCancelled):
+        run_subprocess_job([sys.executable, '-c', 'import time; time.sleep(30)'])
+    assert time.monotonic() - begin < 5
+
+
+def test_subprocess_job_reports_stage_events_and_errors():
+    script = ("import json, sys; "
+              f"print(json.dumps({{'event': 'stage', 'stage': 'task.load', 'status': 'ok'}}), file=sys.stderr); "
+              "print(json.dumps({'error': 'Archivo inválido'}), file=sys.stderr); sys.exit(1)")
+    progress = []
+    with job_scope(CancelToken(), progress.append), pytest.raises(ValueError, match='Archivo inválido'):
+        run_subprocess_job([sys.executable, '-c', script])
+    assert progress == [{'stage': 'task.load', 'status': 'ok'}]
+
+
+def test_subprocess_job_returns_stdout():
+    output = run_subprocess_job([sys.executable, '-c', f"print({json.dumps(json.dumps({'rows': 1}))})"])
+    assert json.loads(output) == {'rows': 1}
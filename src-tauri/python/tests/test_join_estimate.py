@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import clients_by_node_service
+from app.services.clients_by_node_service import ClientsByNodeService
+from core.join_estimate import code_groups, date_chunks, estimate_join, join_row_weights, rows_for_codes
+from tasks import clients_by_node
+from tasks.clients_by_node import ClientsByNodeTask
+
+
+def test_estimate_matches_the_rows_of_the_merge():
+    rng = np.random.default_rng(0)
+    left = pd.DataFrame({'nodo': rng.choice(['A', 'B', 'C', None], 500), 'dep': rng.choice(['LP', 'SC'], 500)})
+    right = pd.DataFrame({'nodo': rng.choice(['A', 'B', 'D', None], 40), 'dep': rng.choice(['LP', 'SC', 'CB'], 40)})
+
+    estimate = estimate_join([left['nodo'], left['dep']], [right['nodo'], right['dep']])
+
+    merged = pd.merge(left, right, on=['nodo', 'dep'], how='inner')
+    assert estimate['rows'] == len(merged)
+    assert estimate['keys'] == len(merged.drop_duplicates(['nodo', 'dep']))
+    assert estimate['max_right_per_key'] == right.merge(merged[['nodo', 'dep']].drop_duplicates()).groupby(
+        ['nodo', 'dep'], dropna=False).size().max()
+
+
+def test_estimate_with_shared_categories_and_no_common_keys():
+    dtype = pd.CategoricalDtype(['A', 'B', 'C'])
+    left, right = pd.Series(['A', 'A', 'B'], dtype=dtype), pd.Series(['B', 'B', 'C'], dtype=dtype)
+    assert estimate_join([left], [right]) == {'rows': 2, 'keys': 1, 'max_left_per_key': 1, 'max_right_per_key': 2}
+    assert estimate_join([left], [pd.Series(['C'], dtype=dtype)])['rows'] == 0
+    assert list(join_row_weights([left], [right])) == [1, 1, 0]
+
+
+def test_date_chunks_keep_whole_days_under_the_limit():
+    dates = pd.Series(pd.to_datetime(['2024-01-02 08:00', '2024-01-01 08:00', '2024-01-02 10:00', '2024-01-03 08:00',
+                                      '2024-01-04 08:00']))
+    weights = np.array([3, 4, 3, 9, 1])
+
+    chunks = date_chunks(dates, weights, max_rows=7)
+
+    # El día 1 (4) no entra con el día 2 (6); el día 3 (9) ya pasa el límite solo y queda aparte.
+    assert [list(chunk) for chunk in chunks] == [[1], [0, 2], [3], [4]]
+    assert [list(chunk) for chunk in date_chunks(dates, weights, max_rows=100)] == [[0, 1, 2, 3, 4]]
+    assert date_chunks(dates.iloc[:0], weights[:0], max_rows=7) == []
+
+
+def test_code_groups_return_rows_by_code_in_original_order():
+    codes = np.array([2, -1, 0, 2, 1, -1, 2])
+    groups = code_groups(codes, size=4)
+
+    assert list(rows_for_codes(groups, np.array([2]))) == [0, 3, 6]
+    assert list(rows_for_codes(groups, np.array([-1, 0]))) == [1, 2, 5]
+    assert list(rows_for_codes(groups, np.array([3]))) == []
+    assert list(rows_for_codes(groups, np.array([], dtype=np.int64))) == []
+
+
+def service_join_inputs(db_session, cronograma_path):
+    service = ClientsByNodeService()
+    df_cronograma = service._read_cronograma(cronograma_path)
+    nodos = df_cronograma['NODO_NORMALIZADO'].cat.categories.tolist()
+    return service._load_affected_clients(db_session, nodos, 'all')[0], df_cronograma
+
+
+def test_chunked_merge_matches_the_single_merge(make_synthetic_inputs, monkeypatch):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    df_clientes, df_cronograma = service_join_inputs(db_session, cronograma_path)
+    single = ClientsByNodeService._join_with_cronograma(df_clientes, df_cronograma)
+
+    monkeypatch.setattr(clients_by_node_service, 'JOIN_CHUNK_ROWS', 500)
+    chunked = ClientsByNodeService._join_with_cronograma(df_clientes, df_cronograma)
+
+    assert single.attrs['join_estimate']['strategy'] == 'single'
+    assert chunked.attrs['join_estimate']['strategy'] == 'chunked'
+    assert chunked.attrs['join_estimate']['chunks'] > 1
+    assert chunked.attrs['join_estimate']['rows'] == len(chunked) == len(single)
+    # Las tandas cambian el orden entre días, no dentro de un día.
+    days = lambda fechas: fechas.dt.normalize()
+    pd.testing.assert_frame_equal(chunked.sort_values('FECHA TRABAJO', key=days, kind='stable').reset_index(drop=True),
+                                  single.sort_values('FECHA TRABAJO', key=days, kind='stable').reset_index(drop=True))
+
+
+def test_chunked_merge_serves_the_same_preview(make_synthetic_inputs, monkeypatch):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    single = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    monkeypatch.setattr(clients_by_node_service, 'JOIN_CHUNK_ROWS', 500)
+    chunked = ClientsByNodeService()
+    chunked.invalidate_cache()
+    page = chunked.get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    assert page['join_estimate']['strategy'] == 'chunked'
+    assert page['rows'] == single['rows']
+
+
+def test_join_over_the_maximum_is_rejected_before_merging(make_synthetic_inputs, monkeypatch):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    df_clientes, df_cronograma = service_join_inputs(db_session, cronograma_path)
+    monkeypatch.setattr(clients_by_node_service, 'JOIN_MAX_ROWS', 100)
+    merges = []
+    monkeypatch.setattr(clients_by_node_service.pd, 'merge', lambda *args, **kwargs: merges.append(args))
+
+    with pytest.raises(ValueError, match="más que el máximo permitido \\(100\\)"):
+        ClientsByNodeService._join_with_cronograma(df_clientes, df_cronograma)
+    assert merges == []
+
+
+def test_task_join_over_the_maximum_is_rejected(monkeypatch):
+    clients = pd.DataFrame({'NODO_EXTRAIDO': ['A'] * 30, 'DEPARTAMENTO': ['LP'] * 30})
+    schedule = pd.DataFrame({'NODO_N': ['A'] * 5, 'DEPARTAMENTO': ['LP'] * 5})
+    assert ClientsByNodeTask._check_join_size(clients, schedule)['rows'] == 150
+
+    monkeypatch.setattr(clients_by_node, 'JOIN_MAX_ROWS', 100)
+    with pytest.raises(ValueError, match="150 rows, more than JOIN_MAX_ROWS \\(100\\)"):
+        ClientsByNodeTask._check_join_size(clients, schedule)
@@ -0,0 +1,95 @@
+import functools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.models.clients_by_node_model import CacheCuboCarteras
+from app.services.clients_by_node_service import ClientsByNodeService
+from app.services.snapshot_store import SnapshotStore
+from core.node_index import NodeIndex
+from tasks import clients_by_node
+from tasks.clients_by_node import ClientsByNodeTask
+
+
+@pytest.fixture
+def clients():
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'NODO': rng.choice(['A', 'B', 'C', 'D', None], 2000),
+        'NRO_CUENTA': np.arange(2000, dtype=np.int64),
+        'NOMBRE': [f"Cliente {i}" for i in range(2000)],
+    })
+
+
+@pytest.mark.parametrize('nodes', [['A'], ['C', 'A'], ['A', 'B', 'C', 'D'], ['Z'], []])
+def test_lookup_matches_a_full_scan(tmp_path, clients, nodes):
+    index = NodeIndex('clientes', directory=str(tmp_path))
+    meta = index.build(clients, 'NODO', 'v1')
+
+    found = index.lookup(nodes, 'v1')
+
+    assert (meta['rows'], meta['nodes']) == (clients['NODO'].notna().sum(), 4)
+    pd.testing.assert_frame_equal(found, clients[clients['NODO'].isin(nodes)].reset_index(drop=True))
+
+
+def test_lookup_with_another_source_or_disabled_returns_none(tmp_path, clients):
+    index = NodeIndex('clientes', directory=str(tmp_path))
+    index.build(clients, 'NODO', 'v1')
+
+    assert index.is_current('v1') and not index.is_current('v2')
+    assert index.lookup(['A'], 'v2') is None
+    assert NodeIndex('clientes', directory=str(tmp_path), enabled=False).lookup(['A'], 'v1') is None
+    assert NodeIndex('otro', directory=str(tmp_path)).lookup(['A'], 'v1') is None
+
+
+def test_rebuild_replaces_the_previous_index(tmp_path, clients):
+    index = NodeIndex('clientes', directory=str(tmp_path))
+    index.build(clients, 'NODO', 'v1')
+    changed = clients.assign(NODO=clients['NODO'].replace({'A': 'B'}))
+
+    meta = index.build(changed, 'NODO', 'v2')
+
+    assert index.lookup(['A'], 'v2').empty
+    pd.testing.assert_frame_equal(index.lookup(['B'], 'v2'), changed[changed['NODO'] == 'B'].reset_index(drop=True))
+    assert sorted(f for f in tmp_path.iterdir() if f.name.startswith('clientes-')) == sorted(
+        tmp_path / name for name in (meta['rows_file'], meta['offsets_file']))
+
+
+@pytest.mark.parametrize('filter_b2b', ['all', 'b2b'])
+def test_task_clients_from_the_index_give_the_same_result(task_inputs, monkeypatch, tmp_path, filter_b2b):
+    def processed(enabled):
+        monkeypatch.setattr(clients_by_node, 'NodeIndex',
+                            functools.partial(NodeIndex, directory=str(tmp_path), enabled=enabled))
+        task = ClientsByNodeTask()
+        task.load_schedule(task_inputs[0])
+        task.load_clients(task_inputs[1])
+        task.process(filter_b2b)
+        return task
+
+    full_scan = processed(False)
+    processed(True)  # Construye el índice.
+    indexed = processed(True)
+
+    assert len(indexed.clients_df) < len(full_scan.clients_df)
+    pd.testing.assert_frame_equal(indexed.result_df, full_scan.result_df, check_categorical=False)
+
+
+def test_service_snapshot_clients_from_the_index_give_the_same_page(make_synthetic_inputs, tmp_path):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    from_db = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    service = ClientsByNodeService()
+    service.invalidate_cache()
+    service.snapshot_store = SnapshotStore(directory=str(tmp_path / 'snapshots'), enabled=True)
+    service.client_index = NodeIndex(CacheCuboCarteras.__tablename__, directory=str(tmp_path / 'index'))
+    service.refresh_snapshots(db_session)
+    load = service.snapshot_store.load
+    service.snapshot_store.load = lambda view_name: (
+        pytest.fail("the node index was not used") if view_name == CacheCuboCarteras.__tablename__ else load(view_name))
+
+    from_index = service.get_preview(db_session, cronograma_path, 'all', offset=1, max_rows=500)
+
+    assert from_index['data_source'] != from_db['data_source']
+    assert from_index['total_rows'] == from_db['total_rows']
+    assert from_index['rows'] == from_db['rows']
@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from app.services import clients_by_node_service
+from app.services.clients_by_node_service import ClientsByNodeService
+from core.node_keys import normalize_nodo_text
+
+NODOS = ['PTS046', 'SCZ001']
+# NODO de cada cliente; los que normalize_nodo_text lleva a uno de NODOS deben salir siempre.
+CLIENT_NODES = [
+    'PTS046', 'PTS046\t', '\tPTS046', 'nodo PTS046\r\n', 'PTS046\xa0', '　PTS046 ', 'Nodo scz001\x0b',
+    'PTS 046', 'PTS046X', 'SCZ002', '', None,
+]
+
+
+@pytest.fixture
+def db_session(make_db_session):
+    with make_db_session(CLIENT_NODES) as session:
+        yield session
+
+
+def expected_accounts(ip_filter):
+    accounts = [i for i, nodo in enumerate(CLIENT_NODES) if normalize_nodo_text(nodo) in NODOS]
+    if ip_filter == 'with_ip':
+        return [i for i in accounts if i % 2 == 0]
+    if ip_filter == 'without_ip':
+        return [i for i in accounts if i % 2 != 0]
+    return accounts
+
+
+def accounts(df):
+    return sorted(int(account) for account in df['NRO_CUENTA'])
+
+
+@pytest.mark.parametrize('ip_filter', ['all', 'with_ip', 'without_ip'])
+@pytest.mark.parametrize('in_list_limit', [500, 0])
+def test_pushdown_keeps_clients_with_any_whitespace(db_session, monkeypatch, ip_filter, in_list_limit):
+    # Con límite 0 los nodos viajan en la tabla temporal en vez de la lista IN.
+    monkeypatch.setattr(clients_by_node_service, 'PUSHDOWN_IN_LIST_LIMIT', in_list_limit)
+    service = ClientsByNodeService()
+
+    df = service._fetch_affected_clients(db_session, NODOS, ip_filter)
+
+    assert accounts(df) == expected_accounts(ip_filter)
+    assert set(df['NODO_NORMALIZADO'].astype(str)) <= set(NODOS)
+
+
+def test_pushdown_matches_streamed_read(db_session):
+    service = ClientsByNodeService()
+
+    pushed = service._fetch_affected_clients(db_session, NODOS, 'all')
+    streamed = service._stream_affected_clients(db_session, NODOS, 'all')
+
+    assert accounts(pushed) == accounts(streamed) == expected_accounts('all')
+    by_account = lambda df: df.set_index(df['NRO_CUENTA'].astype(int))['NODO_NORMALIZADO'].astype(str).sort_index()
+    pd.testing.assert_series_equal(by_account(pushed), by_account(streamed))
@@ -0,0 +1,123 @@
+import pytest
+
+from app.services.clients_by_node_service import ClientsByNodeService
+from core.result_store import ResultStore
+
+
+def full_preview(db_session, cronograma_path, ip_filter, **kwargs):
+    """La misma página servida desde el resultado completo, con un servicio que ya lo calculó."""
+    service = ClientsByNodeService()
+    service._get_processed_data(db_session, cronograma_path, ip_filter, persist=True)
+    return service.get_preview(db_session, cronograma_path, ip_filter, **kwargs)
+
+
+@pytest.mark.parametrize('ip_filter', ['all', 'with_ip', 'without_ip'])
+@pytest.mark.parametrize('max_rows', [1, 20, 300])
+def test_top_n_first_page_matches_the_head_of_the_full_result(make_synthetic_inputs, ip_filter, max_rows):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+
+    top = ClientsByNodeService().get_preview(db_session, cronograma_path, ip_filter, max_rows=max_rows)
+    full = full_preview(db_session, cronograma_path, ip_filter, max_rows=max_rows)
+
+    assert len(top['rows']) == max_rows
+    assert top['rows'] == full['rows']
+
+
+def test_top_n_stops_early_and_estimates_the_total(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    service = ClientsByNodeService()
+    queries = []
+    load = service._load_affected_clients
+    service._load_affected_clients = lambda session, nodos, ip_filter: queries.append(nodos) or load(
+        session, nodos, ip_filter)
+
+    top = service.get_preview(db_session, cronograma_path, 'all')
+    full = full_preview(db_session, cronograma_path, 'all')
+
+    assert not top['total_rows_exact'] and full['total_rows_exact']
+    # Solo se consultaron los nodos de las primeras fechas, no los del cronograma entero.
+    consulted = sum(len(nodos) for nodos in queries)
+    assert consulted < len(service._read_cronograma(cronograma_path)['NODO_NORMALIZADO'].cat.categories) / 2
+    assert 0.5 * full['total_rows'] < top['total_rows'] < 2 * full['total_rows']
+
+
+def test_top_n_over_a_small_schedule_is_exact(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 20)
+
+    top = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', max_rows=500)
+    full = full_preview(db_session, cronograma_path, 'all', max_rows=500)
+
+    assert top['total_rows_exact']
+    assert top['total_rows'] == full['total_rows'] == len(top['rows'])
+    assert top['rows'] == full['rows']
+
+
+def all_pages(service, db_session, cronograma_path, ip_filter, **kwargs):
+    rows, offset = [], 0
+    while True:
+        page = service.get_preview(db_session, cronograma_path, ip_filter, max_rows=500, offset=offset, **kwargs)
+        rows.extend(page['rows'])
+        offset += 500
+        if offset >= page['total_rows']:
+            return rows
+
+
+def test_total_becomes_exact_once_the_full_result_is_computed(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    service = ClientsByNodeService()
+
+    first = service.get_preview(db_session, cronograma_path, 'all')
+    second = service.get_preview(db_session, cronograma_path, 'all', offset=20)
+    first_again = service.get_preview(db_session, cronograma_path, 'all')
+
+    assert (first['total_rows_exact'], second['total_rows_exact'], first_again['total_rows_exact']) == (
+        False, True, True)
+    assert first['total_rows'] != second['total_rows']
+    assert second['total_rows'] == first_again['total_rows'] == len(service._get_processed_data(
+        db_session, cronograma_path, 'all'))
+    # La primera página no cambia al pasar de la estimación al resultado completo.
+    assert first_again['rows'] == first['rows']
+    assert second['rows'][0] not in first['rows']
+
+
+def test_offset_past_the_end_returns_no_rows(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(3000, 60)
+    service = ClientsByNodeService()
+    total = service.get_preview(db_session, cronograma_path, 'all', offset=1)['total_rows']
+
+    last = service.get_preview(db_session, cronograma_path, 'all', offset=total - 3)
+    past = service.get_preview(db_session, cronograma_path, 'all', offset=total + 10)
+
+    assert len(last['rows']) == 3
+    assert (past['rows'], past['total_rows'], past['total_rows_exact']) == ([], total, True)
+
+
+@pytest.mark.parametrize('sort_desc', [False, True])
+def test_sorted_pages_keep_ties_in_the_default_order(make_synthetic_inputs, sort_desc):
+    db_session, cronograma_path = make_synthetic_inputs(3000, 60)
+    default_rows = all_pages(ClientsByNodeService(), db_session, cronograma_path, 'all')
+    position = {(row['FECHA_TRABAJO'], row['NRO_CUENTA']): i for i, row in enumerate(default_rows)}
+
+    rows = all_pages(ClientsByNodeService(), db_session, cronograma_path, 'all',
+                     sort_by='ZONA_GRUPO', sort_desc=sort_desc)
+
+    assert sorted(map(position.get, [(row['FECHA_TRABAJO'], row['NRO_CUENTA']) for row in rows])) == list(
+        range(len(default_rows)))
+    zones = [row['ZONA_GRUPO'] for row in rows]
+    # Cada nodo forma un solo tramo y, dentro de él, las filas siguen el orden por defecto.
+    assert len({zone for zone, previous in zip(zones, [None] + zones) if zone != previous}) == len(set(zones))
+    for row, following in zip(rows, rows[1:]):
+        if row['ZONA_GRUPO'] == following['ZONA_GRUPO']:
+            assert (position[(row['FECHA_TRABAJO'], row['NRO_CUENTA'])]
+                    < position[(following['FECHA_TRABAJO'], following['NRO_CUENTA'])])
+
+
+def test_saved_sort_order_serves_the_same_pages_to_a_new_service(make_synthetic_inputs, monkeypatch):
+    db_session, cronograma_path = make_synthetic_inputs(3000, 60)
+    rows = all_pages(ClientsByNodeService(), db_session, cronograma_path, 'all', sort_by='ZONA_GRUPO')
+
+    # Un servicio nuevo no tiene el orden en memoria: lo lee del disco en lugar de recalcularlo.
+    def no_sort(*args, **kwargs):
+        raise AssertionError("the saved order should have been used")
+    monkeypatch.setattr(ResultStore, 'sort_positions', staticmethod(no_sort))
+    assert all_pages(ClientsByNodeService(), db_session, cronograma_path, 'all', sort_by='ZONA_GRUPO') == rows
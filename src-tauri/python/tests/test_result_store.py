@@ -0,0 +1,74 @@
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.result_store import ResultStore
+
+
+def concurrently(*fns):
+    """Corre las funciones a la vez, cada una en su hilo, y propaga la primera excepción."""
+    barrier, errors = threading.Barrier(len(fns)), []
+
+    def run(fn):
+        barrier.wait()
+        try:
+            fn()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(fn,)) for fn in fns]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def frame(value, rows=200_000):
+    return pd.DataFrame({'NRO_CUENTA': np.arange(rows), 'VALOR': np.full(rows, value),
+                         'NODO': np.where(np.arange(rows) % 2, 'SCZ001', 'LPZ002')})
+
+
+@pytest.mark.parametrize('round_', range(5))
+def test_saving_the_same_key_from_two_threads_publishes_a_whole_result(tmp_path, round_):
+    store = ResultStore(directory=str(tmp_path))
+    key = ResultStore.key_for('crono.xlsx', 'all', round_)
+    first, second = frame(1), frame(2)
+
+    concurrently(lambda: store.save(key, first), lambda: store.save(key, second))
+
+    loaded = store.load(key)
+    assert loaded is not None
+    # Gana una de las dos escrituras, completa; nunca una mezcla ni un archivo truncado.
+    assert any(loaded.equals(df) for df in (first, second))
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
+
+
+def test_saving_the_same_order_from_two_threads(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    key = ResultStore.key_for('crono.xlsx', 'all')
+    ascending, descending = np.arange(500_000), np.arange(500_000)[::-1].copy()
+
+    concurrently(lambda: store.save_order(key, 'NRO_CUENTA|asc', ascending),
+                 lambda: store.save_order(key, 'NRO_CUENTA|asc', descending))
+
+    loaded = store.load_order(key, 'NRO_CUENTA|asc')
+    assert any(np.array_equal(loaded, positions) for positions in (ascending, descending))
+
+
+def test_pickle_fallback_keeps_attrs(tmp_path):
+    store = ResultStore(directory=str(tmp_path))
+    # Números y textos mezclados en una columna: pyarrow no puede guardarla.
+    df = pd.DataFrame({'NODO': ['SCZ001', 2, None]})
+    df.attrs['data_source'] = {'type': 'live'}
+
+    store.save('mixed', df)
+
+    assert os.listdir(tmp_path) == ['mixed.pkl']
+    loaded = store.load('mixed')
+    pd.testing.assert_frame_equal(loaded, df)
+    assert loaded.attrs == df.attrs
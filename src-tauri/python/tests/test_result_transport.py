@@ -0,0 +1,75 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.clients_by_node_service import PREVIEW_MAX_PAGE_ROWS, ClientsByNodeService
+from core.result_transport import read_arrow_result, validate_result_format, write_arrow_result
+
+
+def records(df: pd.DataFrame):
+    df = df.astype(object)
+    return df.where(df.notna(), None).to_dict(orient='records')
+
+
+def test_arrow_result_round_trips_with_its_types(tmp_path):
+    df = pd.DataFrame({
+        'NRO_CUENTA': pd.array([1, None, 3], dtype='Int64'),
+        'FECHA_TRABAJO': pd.to_datetime(['2024-01-02', '2024-01-03', None]),
+        'ZONA_GRUPO': pd.Categorical(['N1', 'N2', 'N1']),
+        'CLIENTE_NOMBRE_COMPLETO': ['Ana', None, 'Luis'],
+        'MONTO': [1.5, np.nan, 3.0],
+    }, index=[10, 20, 30])
+
+    handle = write_arrow_result(df, str(tmp_path))
+
+    assert (handle['transport'], handle['rows']) == ('arrow', 3)
+    assert handle['bytes'] == os.path.getsize(handle['path'])
+    assert [field['name'] for field in handle['schema']] == list(df.columns)
+    assert dict((field['name'], field['type']) for field in handle['schema'])['FECHA_TRABAJO'].startswith('timestamp')
+    pd.testing.assert_frame_equal(read_arrow_result(handle['path']), df.reset_index(drop=True))
+    assert os.listdir(tmp_path) == [os.path.basename(handle['path'])]
+
+
+def test_mixed_text_and_number_columns_travel_as_text(tmp_path):
+    df = pd.DataFrame({'CLIENTE_TELEFONO': pd.Series(['777-1', 777, None], dtype=object), 'NRO_CUENTA': [1, 2, 3]})
+
+    handle = write_arrow_result(df, str(tmp_path))
+
+    result = read_arrow_result(handle['path'])
+    assert result['CLIENTE_TELEFONO'].tolist()[:2] == ['777-1', '777']
+    assert result['CLIENTE_TELEFONO'].isna().tolist() == [False, False, True]
+    assert result['NRO_CUENTA'].tolist() == [1, 2, 3]
+
+
+def test_unknown_result_format_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported result format 'xml'"):
+        validate_result_format('xml')
+
+
+@pytest.mark.parametrize('offset', [0, 7])
+def test_arrow_preview_has_the_same_rows_as_json(make_synthetic_inputs, offset):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+
+    as_json = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', max_rows=100, offset=offset)
+    as_arrow = ClientsByNodeService().get_preview(db_session, cronograma_path, 'all', max_rows=100, offset=offset,
+                                                  result_format='arrow')
+
+    assert 'rows' not in as_arrow
+    assert as_arrow['rows_file']['rows'] == len(as_json['rows']) == 100
+    assert records(read_arrow_result(as_arrow['rows_file']['path'])) == as_json['rows']
+    assert {key: value for key, value in as_arrow.items() if key != 'rows_file'} == \
+        {key: value for key, value in as_json.items() if key != 'rows'}
+
+
+def test_arrow_pages_can_be_larger_than_json_pages(make_synthetic_inputs):
+    db_session, cronograma_path = make_synthetic_inputs(20000, 300)
+    service = ClientsByNodeService()
+
+    with pytest.raises(ValueError):
+        service.get_preview(db_session, cronograma_path, 'all', max_rows=PREVIEW_MAX_PAGE_ROWS + 1)
+    page = service.get_preview(db_session, cronograma_path, 'all', max_rows=PREVIEW_MAX_PAGE_ROWS + 1, offset=1,
+                               result_format='arrow')
+
+    assert page['rows_file']['rows'] == min(PREVIEW_MAX_PAGE_ROWS + 1, page['total_rows'] - 1)
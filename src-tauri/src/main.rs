@@ -1,26 +1,44 @@
 // src-tauri/src/main.rs
 #![cfg_attr(not(debug_assertions), windows_subsystem = "windows")]
 
-use tauri::AppHandle;
-use tauri_plugin_shell::{process::CommandEvent, ShellExt};
+use std::collections::HashMap;
+use std::sync::atomic::{AtomicU64, Ordering};
+use std::sync::{Arc, Mutex};
 
-async fn run_python_command(app: AppHandle, args: Vec<String>) -> Result<String, String> {
-    #[cfg(debug_assertions)]
-    let command_name = "python";
-    #[cfg(debug_assertions)]
-    let script_path = "python/main.py";
+use serde_json::{json, Value};
+use tauri::async_runtime::{self, Sender};
+use tauri::{AppHandle, Manager, RunEvent};
+use tauri_plugin_shell::process::{Command, CommandChild, CommandEvent};
+use tauri_plugin_shell::ShellExt;
 
-    #[cfg(not(debug_assertions))]
-    let command_name = "python/python_backend.exe";
+type PendingRequests = Arc<Mutex<HashMap<String, Sender<Result<Value, String>>>>>;
 
-    let mut command_builder = app.shell().command(command_name);
+// Proceso `main.py --worker` que atiende las solicitudes de la app. Se arranca con la primera
+// solicitud y se reutiliza: conserva la conexión a la base y los resultados ya calculados.
+struct Worker {
+    child: CommandChild,
+    // Solicitudes enviadas que esperan su respuesta, por id.
+    pending: PendingRequests,
+}
+
+#[derive(Default)]
+struct WorkerState {
+    worker: async_runtime::Mutex<Option<Worker>>,
+    next_id: AtomicU64,
+}
 
+fn python_command(app: &AppHandle) -> Command {
     #[cfg(debug_assertions)]
-    {
-        command_builder = command_builder.arg(script_path);
-    }
+    let command = app.shell().command("python").arg("python/main.py");
+
+    #[cfg(not(debug_assertions))]
+    let command = app.shell().command("python/python_backend.exe");
 
-    let (mut rx, _child) = command_builder
+    command
+}
+
+async fn run_python_command(app: AppHandle, args: Vec<String>) -> Result<String, String> {
+    let (mut rx, _child) = python_command(&app)
         .args(&args)
         .spawn()
         .map_err(|e| format!("Fallo al ejecutar el script: {}", e))?;
@@ -48,36 +66,239 @@ async fn run_python_command(app: AppHandle, args: Vec<String>) -> Result<String,
     Ok(stdout_buffer)
 }
 
+// Entrega una línea de stdout del worker a la solicitud que espera su respuesta.
+fn dispatch_worker_message(message: Value, pending: &PendingRequests, ready: &mut Option<Sender<Result<Value, String>>>) {
+    let id = match message.get("id") {
+        Some(Value::String(id)) => id.clone(),
+        Some(Value::Null) | None => {
+            // La primera línea sin id es {"result": {"status": "ready"}}.
+            if let Some(ready) = ready.take() {
+                let _ = ready.try_send(Ok(Value::Null));
+            }
+            return;
+        }
+        Some(other) => other.to_string(),
+    };
+    // No se piden eventos de progreso; si llegan se ignoran.
+    if message.get("event").is_some() {
+        return;
+    }
+    let Some(sender) = pending.lock().unwrap().remove(&id) else { return };
+    let response = match message.get("error") {
+        Some(error) => Err(error.as_str().map(str::to_string).unwrap_or_else(|| error.to_string())),
+        None => Ok(message.get("result").cloned().unwrap_or(Value::Null)),
+    };
+    let _ = sender.try_send(response);
+}
+
+// Arranca el worker y espera a que avise que está listo.
+async fn spawn_worker(app: &AppHandle) -> Result<Worker, String> {
+    let (mut rx, child) = python_command(app)
+        .arg("--worker")
+        .set_raw_out(true)
+        .spawn()
+        .map_err(|e| format!("Fallo al iniciar el proceso de Python: {}", e))?;
+
+    let pending: PendingRequests = Arc::default();
+    let (ready_tx, mut ready_rx) = async_runtime::channel(1);
+    let reader_pending = pending.clone();
+    let app_handle = app.clone();
+    async_runtime::spawn(async move {
+        let mut ready = Some(ready_tx);
+        let mut stdout_buffer: Vec<u8> = Vec::new();
+        let mut stderr_tail = String::new();
+        while let Some(event) = rx.recv().await {
+            match event {
+                CommandEvent::Stdout(bytes) => {
+                    // En modo raw los bytes llegan como se leen; las respuestas son una por línea.
+                    stdout_buffer.extend_from_slice(&bytes);
+                    while let Some(end) = stdout_buffer.iter().position(|byte| *byte == b'\n') {
+                        let line: Vec<u8> = stdout_buffer.drain(..=end).collect();
+                        if let Ok(message) = serde_json::from_slice::<Value>(&line) {
+                            dispatch_worker_message(message, &reader_pending, &mut ready);
+                        }
+                    }
+                }
+                CommandEvent::Stderr(bytes) => {
+                    let text = String::from_utf8_lossy(&bytes);
+                    eprint!("{}", text);
+                    stderr_tail.push_str(&text);
+                    if stderr_tail.len() > 4000 {
+                        stderr_tail = stderr_tail.split_off(stderr_tail.len() - 2000);
+                    }
+                }
+                CommandEvent::Terminated(_) | CommandEvent::Error(_) => break,
+                _ => (),
+            }
+        }
+
+        // El worker terminó: fallan las solicitudes pendientes y la próxima arranca otro.
+        let message = format!("El proceso de Python terminó inesperadamente. Detalles: {}", stderr_tail.trim());
+        if let Some(ready) = ready.take() {
+            let _ = ready.try_send(Err(message.clone()));
+        }
+        for (_, sender) in reader_pending.lock().unwrap().drain() {
+            let _ = sender.try_send(Err(message.clone()));
+        }
+        let state = app_handle.state::<WorkerState>();
+        let mut slot = state.worker.lock().await;
+        if slot.as_ref().is_some_and(|worker| Arc::ptr_eq(&worker.pending, &reader_pending)) {
+            *slot = None;
+        }
+    });
+
+    match ready_rx.recv().await {
+        Some(Ok(_)) => Ok(Worker { child, pending }),
+        Some(Err(message)) => Err(message),
+        None => Err("El proceso de Python terminó antes de estar listo.".to_string()),
+    }
+}
+
+// Envía una solicitud al worker (arrancándolo si hace falta) y espera su respuesta. Con
+// request_id la solicitud lleva ese id, para poder cancelarla después con cancel_task.
+async fn worker_request(app: &AppHandle, mut request: Value, request_id: Option<String>) -> Result<Value, String> {
+    let state = app.state::<WorkerState>();
+    let id = request_id.unwrap_or_else(|| format!("app-{}", state.next_id.fetch_add(1, Ordering::Relaxed)));
+    request["id"] = Value::String(id.clone());
+    let (tx, mut rx) = async_runtime::channel(1);
+    {
+        let mut slot = state.worker.lock().await;
+        if slot.is_none() {
+            *slot = Some(spawn_worker(app).await?);
+        }
+        let worker = slot.as_mut().unwrap();
+        worker.pending.lock().unwrap().insert(id.clone(), tx);
+        if let Err(e) = worker.child.write(format!("{}\n", request).as_bytes()) {
+            worker.pending.lock().unwrap().remove(&id);
+            *slot = None;
+            return Err(format!("No se pudo enviar la solicitud al proceso de Python: {}", e));
+        }
+    }
+    rx.recv()
+        .await
+        .unwrap_or_else(|| Err("El proceso de Python no respondió la solicitud.".to_string()))
+}
+
+// Ejecuta la solicitud en el worker y devuelve su resultado como el JSON que imprime
+// main.py. Si el worker no puede arrancar se usa un proceso de una sola ejecución.
+async fn run_backend_request(app: AppHandle, request: Value, request_id: Option<String>, args: Vec<String>) -> Result<String, String> {
+    {
+        let state = app.state::<WorkerState>();
+        let mut slot = state.worker.lock().await;
+        if slot.is_none() {
+            match spawn_worker(&app).await {
+                Ok(worker) => *slot = Some(worker),
+                Err(e) => {
+                    eprintln!("No se pudo iniciar el worker de Python, se usa un proceso por solicitud: {}", e);
+                    drop(slot);
+                    return run_python_command(app, args).await;
+                }
+            }
+        }
+    }
+    worker_request(&app, request, request_id).await.map(|result| result.to_string())
+}
+
 // --- COMANDO PREVIEW CORREGIDO ---
 // 1. AÑADIMOS #[tauri::command(rename_all = "camelCase")]
 //    Esto le dice a Tauri que espere argumentos en camelCase desde el frontend.
 #[tauri::command(rename_all = "camelCase")]
-async fn preview_task(app: tauri::AppHandle, cronograma_path: String, ip_filter: String) -> Result<String, String> {
-    let args = vec![
+async fn preview_task(
+    app: tauri::AppHandle,
+    cronograma_path: String,
+    ip_filter: String,
+    offset: Option<u32>,
+    limit: Option<u32>,
+    sort_by: Option<String>,
+    sort_desc: Option<bool>,
+    request_id: Option<String>,
+) -> Result<String, String> {
+    let request = json!({
+        "mode": "preview",
+        "cronograma_path": cronograma_path,
+        "ip_filter": ip_filter,
+        "offset": offset.unwrap_or(0),
+        "limit": limit.unwrap_or(20),
+        "sort_by": sort_by,
+        "sort_desc": sort_desc.unwrap_or(false),
+    });
+    let mut args = vec![
         "--mode".to_string(), "preview".to_string(),
         "--cronograma-path".to_string(), cronograma_path,
         "--ip-filter".to_string(), ip_filter,
     ];
-    run_python_command(app, args).await
+    // Paginación y orden opcionales; las páginas siguientes se sirven del resultado ya guardado.
+    if let Some(offset) = offset {
+        args.extend(["--offset".to_string(), offset.to_string()]);
+    }
+    if let Some(limit) = limit {
+        args.extend(["--limit".to_string(), limit.to_string()]);
+    }
+    if let Some(sort_by) = sort_by {
+        args.extend(["--sort-by".to_string(), sort_by]);
+    }
+    if sort_desc.unwrap_or(false) {
+        args.push("--sort-desc".to_string());
+    }
+    run_backend_request(app, request, request_id, args).await
 }
 
 // --- COMANDO EXPORT CORREGIDO ---
 #[tauri::command(rename_all = "camelCase")]
-async fn export_task(app: tauri::AppHandle, cronograma_path: String, ip_filter: String, output_path: String) -> Result<String, String> {
+async fn export_task(
+    app: tauri::AppHandle,
+    cronograma_path: String,
+    ip_filter: String,
+    output_path: String,
+    request_id: Option<String>,
+) -> Result<String, String> {
+    let request = json!({
+        "mode": "export",
+        "cronograma_path": cronograma_path,
+        "ip_filter": ip_filter,
+        "output_path": output_path,
+    });
     let args = vec![
         "--mode".to_string(), "export".to_string(),
         "--cronograma-path".to_string(), cronograma_path,
         "--ip-filter".to_string(), ip_filter,
         "--output-path".to_string(), output_path,
     ];
-    run_python_command(app, args).await
+    run_backend_request(app, request, request_id, args).await
+}
+
+// Cancela una solicitud enviada con ese requestId; esa solicitud falla con "Solicitud cancelada.".
+// Devuelve "cancelled", o "not_found" si ya había terminado o no pasó por el worker.
+#[tauri::command(rename_all = "camelCase")]
+async fn cancel_task(app: tauri::AppHandle, request_id: String) -> Result<String, String> {
+    if app.state::<WorkerState>().worker.lock().await.is_none() {
+        return Ok("not_found".to_string());
+    }
+    let result = worker_request(&app, json!({"mode": "cancel", "target": request_id}), None).await?;
+    Ok(result.get("status").and_then(Value::as_str).unwrap_or("not_found").to_string())
+}
+
+// Catálogo de tareas de Excel del backend (nombre, parámetros y columnas); no carga pandas.
+#[tauri::command]
+async fn list_tasks(app: tauri::AppHandle) -> Result<String, String> {
+    run_python_command(app, vec!["--list-tasks".to_string()]).await
 }
 
 fn main() {
     tauri::Builder::default()
         .plugin(tauri_plugin_shell::init())
         .plugin(tauri_plugin_dialog::init())
-        .invoke_handler(tauri::generate_handler![preview_task, export_task])
-        .run(tauri::generate_context!())
-        .expect("error while running tauri application");
-}
\ No newline at end of file
+        .manage(WorkerState::default())
+        .invoke_handler(tauri::generate_handler![preview_task, export_task, cancel_task, list_tasks])
+        .build(tauri::generate_context!())
+        .expect("error while running tauri application")
+        .run(|app, event| {
+            if let RunEvent::Exit = event {
+                // El worker cancela lo pendiente y termina; si no, termina al cerrarse su stdin.
+                let state = app.state::<WorkerState>();
+                if let Some(mut worker) = async_runtime::block_on(state.worker.lock()).take() {
+                    let _ = worker.child.write(b"{\"id\": null, \"mode\": \"shutdown\"}\n");
+                }
+            }
+        });
+}
@@ -4,9 +4,30 @@ import { motion } from "framer-motion";
 type PreviewTableProps = {
   data: Array<Record<string, any>>;
   maxRows?: number;
+  // Paginación: con onPageChange, data es la página que empieza en offset de un total de totalRows filas.
+  totalRows?: number;
+  totalRowsExact?: boolean;
+  offset?: number;
+  onPageChange?: (offset: number) => void;
+  // Orden: con onSortChange, los encabezados permiten ordenar por columna.
+  sortBy?: string | null;
+  sortDesc?: boolean;
+  onSortChange?: (sortBy: string, sortDesc: boolean) => void;
+  loading?: boolean;
 };
 
-export const PreviewTable: React.FC<PreviewTableProps> = ({ data, maxRows = 10 }) => {
+export const PreviewTable: React.FC<PreviewTableProps> = ({
+  data,
+  maxRows = 10,
+  totalRows,
+  totalRowsExact = true,
+  offset = 0,
+  onPageChange,
+  sortBy,
+  sortDesc = false,
+  onSortChange,
+  loading = false,
+}) => {
   if (!data || data.length === 0) {
     return (
       <motion.div
@@ -21,14 +42,22 @@ export const PreviewTable: React.FC<PreviewTableProps> = ({ data, maxRows = 10 }
   }
 
   const columns = Object.keys(data[0]);
+  const paginated = onPageChange !== undefined && totalRows !== undefined;
+  const lastRow = offset + Math.min(data.length, maxRows);
+
+  const handleSort = (col: string) => {
+    if (!onSortChange || loading) return;
+    // Un clic ordena ascendente; otro clic sobre la misma columna invierte el orden.
+    onSortChange(col, sortBy === col ? !sortDesc : false);
+  };
 
   return (
     <motion.div
       initial={{ opacity: 0, scale: 0.96 }}
       animate={{ opacity: 1, scale: 1 }}
       transition={{ duration: 0.5, ease: "easeOut" }}
-      className="overflow-x-auto rounded-2xl shadow-xl border border-blue-200 dark:border-blue-800/40 mt-4
-        bg-white/90 dark:bg-gray-900 transition-colors duration-300"
+      className={`overflow-x-auto rounded-2xl shadow-xl border border-blue-200 dark:border-blue-800/40 mt-4
+        bg-white/90 dark:bg-gray-900 transition-colors duration-300 ${loading ? "opacity-60" : ""}`}
     >
       <table className="min-w-full text-base text-blue-950 dark:text-gray-100 transition-colors">
         <thead>
@@ -36,9 +65,11 @@ export const PreviewTable: React.FC<PreviewTableProps> = ({ data, maxRows = 10 }
             {columns.map((col) => (
               <th
                 key={col}
-                className="px-4 py-3 font-extrabold text-blue-800 dark:text-blue-300 uppercase tracking-widest border-b border-blue-200 dark:border-blue-800 transition-colors"
+                onClick={() => handleSort(col)}
+                className={`px-4 py-3 font-extrabold text-blue-800 dark:text-blue-300 uppercase tracking-widest border-b border-blue-200 dark:border-blue-800 transition-colors ${onSortChange ? "cursor-pointer select-none hover:text-blue-600 dark:hover:text-blue-200" : ""}`}
               >
                 {col}
+                {sortBy === col && <span className="ml-1">{sortDesc ? "▼" : "▲"}</span>}
               </th>
             ))}
           </tr>
@@ -63,7 +94,7 @@ export const PreviewTable: React.FC<PreviewTableProps> = ({ data, maxRows = 10 }
               ))}
             </tr>
           ))}
-          {data.length > maxRows && (
+          {!paginated && data.length > maxRows && (
             <tr>
               <td
                 colSpan={columns.length}
@@ -75,6 +106,30 @@ export const PreviewTable: React.FC<PreviewTableProps> = ({ data, maxRows = 10 }
           )}
         </tbody>
       </table>
+      {paginated && (
+        <div className="flex items-center justify-between px-4 py-3 text-sm text-blue-700 dark:text-blue-300">
+          <span>
+            Filas {offset + 1}–{lastRow} de {totalRowsExact ? "" : "~"}
+            {totalRows!.toLocaleString()}
+          </span>
+          <div className="space-x-2">
+            <button
+              onClick={() => onPageChange!(Math.max(0, offset - maxRows))}
+              disabled={loading || offset === 0}
+              className="px-3 py-1 rounded-md bg-blue-100 dark:bg-blue-900 hover:bg-blue-200 dark:hover:bg-blue-800 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              &larr; Anterior
+            </button>
+            <button
+              onClick={() => onPageChange!(offset + maxRows)}
+              disabled={loading || (totalRowsExact && lastRow >= totalRows!) || data.length < maxRows}
+              className="px-3 py-1 rounded-md bg-blue-100 dark:bg-blue-900 hover:bg-blue-200 dark:hover:bg-blue-800 disabled:opacity-50 disabled:cursor-not-allowed"
+            >
+              Siguiente &rarr;
+            </button>
+          </div>
+        </div>
+      )}
     </motion.div>
   );
 };
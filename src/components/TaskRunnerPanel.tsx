@@ -1,5 +1,5 @@
 // src/components/TaskRunnerPanel.tsx
-import React, { useState } from 'react';
+import React, { useRef, useState } from 'react';
 import { invoke } from '@tauri-apps/api/core';
 import { save, open } from '@tauri-apps/plugin-dialog';
 import { motion, AnimatePresence } from 'framer-motion';
@@ -14,12 +14,61 @@ interface TaskRunnerPanelProps {
 type Status = 'idle' | 'loading' | 'preview' | 'success' | 'error';
 type IpFilter = 'with_ip' | 'without_ip' | 'all';
 
+// Filas que el cruce estimó antes de hacerse y cómo se hizo (en un solo merge o por fechas).
+type JoinEstimate = {
+  rows: number;
+  keys: number;
+  max_left_per_key: number;
+  max_right_per_key: number;
+  strategy: 'single' | 'chunked';
+  chunks?: number;
+};
+
+// Respuesta de main.py --mode preview: una página del resultado y el total de filas.
+type PreviewPage = {
+  rows: Array<Record<string, any>>;
+  offset: number;
+  limit: number;
+  total_rows: number;
+  total_rows_exact: boolean;
+  sort_by: string | null;
+  sort_desc: boolean;
+  join_estimate?: JoinEstimate | null;
+};
+
+// Respuesta de main.py --mode export. Si el resultado no cabe en XLSX, el backend lo escribe en
+// otro formato (ZIP de CSV, CSV o Parquet) con la misma ruta base y devuelve la ruta real.
+type ExportResult = {
+  path: string;
+  format: string;
+  requestedPath: string;
+};
+
+const FORMAT_LABELS: Record<string, string> = {
+  xlsx: 'Excel (.xlsx)',
+  zip: 'ZIP con un CSV por fecha (.zip)',
+  csv: 'CSV (.csv)',
+  'csv.gz': 'CSV comprimido (.csv.gz)',
+  parquet: 'Parquet (.parquet)',
+};
+
+const PREVIEW_PAGE_SIZE = 20;
+// Error con el que el backend responde a una solicitud cancelada.
+const CANCELLED_MESSAGE = 'Solicitud cancelada.';
+
+let requestCounter = 0;
+const nextRequestId = () => `ui-${Date.now()}-${++requestCounter}`;
+
 export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }) => {
   const [cronogramaPath, setCronogramaPath] = useState<string | null>(null);
   const [ipFilter, setIpFilter] = useState<IpFilter>('with_ip');
   const [status, setStatus] = useState<Status>('idle');
   const [error, setError] = useState<string | null>(null);
-  const [previewData, setPreviewData] = useState<any[]>([]);
+  const [previewPage, setPreviewPage] = useState<PreviewPage | null>(null);
+  const [pageLoading, setPageLoading] = useState(false);
+  const [exportResult, setExportResult] = useState<ExportResult | null>(null);
+  // Id de la solicitud de preview o export en curso, para poder cancelarla.
+  const activeRequestId = useRef<string | null>(null);
 
   const handleFileSelect = async () => {
     const selectedPath = await open({
@@ -36,7 +85,36 @@ export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }
   const handleReset = () => {
     setStatus('idle');
     setError(null);
-    setPreviewData([]);
+    setPreviewPage(null);
+    setExportResult(null);
+  };
+
+  const fetchPreviewPage = async (offset: number, sortBy: string | null, sortDesc: boolean): Promise<PreviewPage> => {
+    // --- CAMBIO CLAVE: Usamos los nombres en camelCase que el frontend ya estaba usando ---
+    const requestId = nextRequestId();
+    activeRequestId.current = requestId;
+    const resultJson = await invoke<string>('preview_task', {
+      cronogramaPath: cronogramaPath,
+      ipFilter: ipFilter,
+      offset: offset,
+      limit: PREVIEW_PAGE_SIZE,
+      sortBy: sortBy,
+      sortDesc: sortDesc,
+      requestId: requestId,
+    }).finally(() => {
+      if (activeRequestId.current === requestId) activeRequestId.current = null;
+    });
+    const data = JSON.parse(resultJson);
+    if (data.error) throw new Error(data.error);
+    return data;
+  };
+
+  const isCancelled = (e: any) => (e.message || e.toString()) === CANCELLED_MESSAGE;
+
+  const handleCancel = async () => {
+    if (activeRequestId.current) {
+      await invoke<string>('cancel_task', { requestId: activeRequestId.current });
+    }
   };
 
   const handlePreview = async () => {
@@ -44,22 +122,34 @@ export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }
     setStatus('loading');
     setError(null);
     try {
-      // --- CAMBIO CLAVE: Usamos los nombres en camelCase que el frontend ya estaba usando ---
-      const resultJson = await invoke<string>('preview_task', {
-        cronogramaPath: cronogramaPath,
-        ipFilter: ipFilter,
-      });
-      const data = JSON.parse(resultJson);
-      if (data.error) throw new Error(data.error);
-
-      setPreviewData(data);
+      setPreviewPage(await fetchPreviewPage(0, null, false));
       setStatus("preview");
     } catch (e: any) {
+      if (isCancelled(e)) {
+        handleReset();
+        return;
+      }
       setError(e.message || e.toString());
       setStatus("error");
     }
   };
 
+  // Las páginas siguientes y los cambios de orden se sirven del resultado ya calculado.
+  const handlePageRequest = async (offset: number, sortBy: string | null, sortDesc: boolean) => {
+    if (!cronogramaPath || pageLoading) return;
+    setPageLoading(true);
+    try {
+      setPreviewPage(await fetchPreviewPage(offset, sortBy, sortDesc));
+    } catch (e: any) {
+      // Una página cancelada deja visible la anterior.
+      if (isCancelled(e)) return;
+      setError(e.message || e.toString());
+      setStatus("error");
+    } finally {
+      setPageLoading(false);
+    }
+  };
+
   const handleExport = async () => {
     if (!cronogramaPath) return;
     const defaultPath = `Reporte_${task.key}_${new Date().toLocaleDateString().replace(/\//g, '-')}.xlsx`;
@@ -68,19 +158,29 @@ export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }
     if (outputPath) {
       setStatus('loading');
       setError(null);
+      const requestId = nextRequestId();
+      activeRequestId.current = requestId;
       try {
         // --- CAMBIO CLAVE: Usamos los nombres en camelCase ---
         const resultJson = await invoke<string>('export_task', {
           cronogramaPath: cronogramaPath,
           ipFilter: ipFilter,
           outputPath: outputPath,
+          requestId: requestId,
         });
         const data = JSON.parse(resultJson);
         if (data.error) throw new Error(data.error);
+        setExportResult({ path: data.path ?? outputPath, format: data.format ?? 'xlsx', requestedPath: outputPath });
         setStatus("success");
       } catch (e: any) {
+        if (isCancelled(e)) {
+          handleReset();
+          return;
+        }
         setError(e.message || e.toString());
         setStatus("error");
+      } finally {
+        if (activeRequestId.current === requestId) activeRequestId.current = null;
       }
     }
   };
@@ -124,6 +224,11 @@ export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }
         <button onClick={handleExport} disabled={!cronogramaPath || status === 'loading'} className="px-6 py-2 font-semibold text-white bg-green-600 rounded-lg hover:bg-green-700 disabled:opacity-50 disabled:cursor-not-allowed">
           Generar Reporte
         </button>
+        {(status === 'loading' || pageLoading) && (
+            <button onClick={handleCancel} className="px-6 py-2 font-semibold text-white bg-red-600 rounded-lg hover:bg-red-700">
+                Cancelar
+            </button>
+        )}
         {(status !== 'idle' && status !== 'loading') && (
             <button onClick={handleReset} className="px-6 py-2 font-semibold text-white bg-gray-500 rounded-lg hover:bg-gray-600">
                 Limpiar
@@ -132,14 +237,49 @@ export const TaskRunnerPanel: React.FC<TaskRunnerPanelProps> = ({ task, onBack }
       </div>
       <AnimatePresence>
         {status === 'error' && <motion.div className="mt-6 p-4 text-red-800 bg-red-100 border border-red-300 rounded-lg"><strong>Error:</strong> {error}</motion.div>}
-        {status === 'success' && <motion.div className="mt-6 p-4 text-green-800 bg-green-100 border border-green-300 rounded-lg">¡Éxito! El reporte ha sido generado.</motion.div>}
-        {status === 'preview' && previewData.length > 0 && (
+        {status === 'success' && (
+          <motion.div className="mt-6 p-4 text-green-800 bg-green-100 border border-green-300 rounded-lg">
+            <p>¡Éxito! El reporte ha sido generado.</p>
+            {exportResult && (
+              <>
+                <p className="mt-2 text-sm break-all">Archivo: {exportResult.path}</p>
+                <p className="text-sm">Formato: {FORMAT_LABELS[exportResult.format] ?? exportResult.format}</p>
+                {exportResult.path !== exportResult.requestedPath && (
+                  <p className="mt-2 text-sm font-semibold text-yellow-800">
+                    El resultado supera los límites de Excel: en lugar de {exportResult.requestedPath} se guardó
+                    el archivo de arriba, en formato {FORMAT_LABELS[exportResult.format] ?? exportResult.format}.
+                  </p>
+                )}
+              </>
+            )}
+          </motion.div>
+        )}
+        {status === 'preview' && previewPage && previewPage.rows.length > 0 && (
           <motion.div className="mt-8">
             <h3 className="font-semibold text-lg text-gray-800 dark:text-gray-200 mb-3">Vista Previa</h3>
-            <PreviewTable data={previewData} />
+            {previewPage.join_estimate && (
+              <p className="text-sm text-gray-500 dark:text-gray-400 mb-2">
+                Cruce estimado: {previewPage.join_estimate.rows.toLocaleString()} filas
+                {previewPage.join_estimate.strategy === 'chunked'
+                  ? ` (procesado por fechas en ${previewPage.join_estimate.chunks} tandas)`
+                  : ''}
+              </p>
+            )}
+            <PreviewTable
+              data={previewPage.rows}
+              maxRows={previewPage.limit}
+              totalRows={previewPage.total_rows}
+              totalRowsExact={previewPage.total_rows_exact}
+              offset={previewPage.offset}
+              sortBy={previewPage.sort_by}
+              sortDesc={previewPage.sort_desc}
+              loading={pageLoading}
+              onPageChange={(offset) => handlePageRequest(offset, previewPage.sort_by, previewPage.sort_desc)}
+              onSortChange={(sortBy, sortDesc) => handlePageRequest(0, sortBy, sortDesc)}
+            />
           </motion.div>
         )}
-        {status === 'preview' && previewData.length === 0 && (
+        {status === 'preview' && (!previewPage || previewPage.rows.length === 0) && (
           <motion.div className="mt-6 p-4 text-yellow-800 bg-yellow-100 border border-yellow-300 rounded-lg">
             La consulta no devolvió resultados con los filtros aplicados.
           </motion.div>
@@ -13,4 +13,20 @@ export interface AutomationTaskParams {
 export interface AutomationTaskPreview {
   message: string;
   filePath?: string;
-}
\ No newline at end of file
+}
+
+export interface TaskParamSpec {
+  default?: string;
+  choices?: string[];
+  description?: string;
+}
+
+// Una tarea del catálogo del backend (python main.py --list-tasks).
+export interface TaskCatalogEntry {
+  name: string;
+  display_name: string;
+  description: string;
+  inputs: Record<string, string[]>;
+  params: Record<string, TaskParamSpec>;
+  modes: string[];
+}
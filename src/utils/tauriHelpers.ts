@@ -3,7 +3,7 @@
 // --- ¡IMPORTACIÓN CORREGIDA SEGÚN LA DOCUMENTACIÓN! ---
 import {save} from '@tauri-apps/plugin-dialog';
 import {invoke} from '@tauri-apps/api/core';
-import type {AutomationTaskParams, AutomationTaskPreview} from '../types/TaskTypes';
+import type {AutomationTaskParams, AutomationTaskPreview, TaskCatalogEntry} from '../types/TaskTypes';
 
 /**
  * Abre el diálogo nativo del sistema para guardar un archivo.
@@ -39,4 +39,14 @@ export async function runAutomationTask(taskName: string, params: AutomationTask
         taskName,
         ...params
     });
-}
\ No newline at end of file
+}
+
+/**
+ * Pide al backend el catálogo de tareas disponibles, con sus parámetros y columnas obligatorias.
+ * El backend solo lee los metadatos del catálogo, sin cargar los módulos de las tareas.
+ * @returns Una promesa que se resuelve con la lista de tareas.
+ */
+export async function listAvailableTasks(): Promise<TaskCatalogEntry[]> {
+    const output = await invoke<string>('list_tasks');
+    return JSON.parse(output) as TaskCatalogEntry[];
+}